@@ -0,0 +1,38 @@
+'''
+Size and load time of the binary format against the text format.
+
+    python benchmarks/bench_binary_format.py [n_blocks]
+'''
+import os
+import sys
+import tempfile
+import time
+
+benchdir = os.path.dirname(__file__)
+sys.path.insert(0, os.path.abspath(os.path.join(benchdir, "../")))
+sys.path.insert(0, os.path.abspath(benchdir))
+
+from dcmfile_parser import DCMParser, read_binary
+from synthetic import write_dcm_file
+
+
+def timed(label, function):
+    start = time.perf_counter()
+    result = function()
+    print(f'{label:>22}: {time.perf_counter() - start:7.3f} s')
+    return result
+
+
+def run(n_blocks=50000):
+    with tempfile.TemporaryDirectory() as tmp:
+        text_path = write_dcm_file(os.path.join(tmp, 'bench.dcm'), n_blocks)
+        binary_path = os.path.join(tmp, 'bench.dcmb')
+        dcm_obj = timed('text parse', lambda: DCMParser(text_path).create_dcm_object())
+        timed('binary write', lambda: dcm_obj.write_binary(binary_path))
+        timed('binary load (arrays)', lambda: read_binary(binary_path))
+        timed('binary load (lists)', lambda: read_binary(binary_path, array_mode=False))
+        print(f'text {os.path.getsize(text_path) / 1e6:.1f} MB, binary {os.path.getsize(binary_path) / 1e6:.1f} MB')
+
+
+if __name__ == '__main__':
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 50000)
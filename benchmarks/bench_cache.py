@@ -0,0 +1,31 @@
+'''
+Cold parse against a warm load from the ParseCache.
+
+    python benchmarks/bench_cache.py [n_blocks]
+'''
+import os
+import sys
+import tempfile
+import time
+
+benchdir = os.path.dirname(__file__)
+sys.path.insert(0, os.path.abspath(os.path.join(benchdir, "../")))
+sys.path.insert(0, os.path.abspath(benchdir))
+
+from dcmfile_parser import DCMParser, ParseCache
+from synthetic import write_dcm_file
+
+
+def run(n_blocks=50000):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = write_dcm_file(os.path.join(tmp, 'bench.dcm'), n_blocks)
+        cache = ParseCache(os.path.join(tmp, 'cache'))
+        for label in ('cold', 'warm'):
+            start = time.perf_counter()
+            DCMParser(path, cache=cache).create_dcm_object()
+            elapsed = time.perf_counter() - start
+            print(f'{label}: {elapsed:7.3f} s for {n_blocks} labels')
+
+
+if __name__ == '__main__':
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 50000)
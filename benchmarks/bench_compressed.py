@@ -0,0 +1,56 @@
+'''
+Parsing gzip and xz compressed files directly against decompressing them to a temporary file first,
+time and peak traced memory.
+
+    python benchmarks/bench_compressed.py [n_blocks]
+'''
+import gzip
+import lzma
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+benchdir = os.path.dirname(__file__)
+sys.path.insert(0, os.path.abspath(os.path.join(benchdir, "../")))
+sys.path.insert(0, os.path.abspath(benchdir))
+
+from dcmfile_parser import DCMParser
+from synthetic import write_dcm_file
+
+
+def measure(label, func):
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    print(f'{label:>24}: {elapsed:7.3f} s, peak {peak / 1e6:7.1f} MB')
+
+
+def via_temp_file(path, module, tmp):
+    plain = os.path.join(tmp, 'decompressed.dcm')
+    with module.open(path, 'rb') as src, open(plain, 'wb') as dst:
+        shutil.copyfileobj(src, dst)
+    return DCMParser(plain).create_dcm_object()
+
+
+def run(n_blocks=20000):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = write_dcm_file(os.path.join(tmp, 'bench.dcm'), n_blocks)
+        print(f'{os.path.getsize(path) / 1e6:.1f} MB, {n_blocks} blocks')
+        measure('plain', lambda: DCMParser(path).create_dcm_object())
+        for name, module in (('gzip', gzip), ('xz', lzma)):
+            compressed = f'{path}.{name}'
+            with open(path, 'rb') as src, module.open(compressed, 'wb') as dst:
+                shutil.copyfileobj(src, dst)
+            measure(f'{name} direct', lambda: DCMParser(compressed).create_dcm_object())
+            measure(f'{name} via temp file', lambda: via_temp_file(compressed, module, tmp))
+
+
+if __name__ == '__main__':
+    run(*(int(arg) for arg in sys.argv[1:2]))
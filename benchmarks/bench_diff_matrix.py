@@ -0,0 +1,47 @@
+'''
+One baseline against many variants: diff_matrix against parsing every variant and calling diff_report,
+and the time of parsing the variants alone.
+
+    python benchmarks/bench_diff_matrix.py [n_blocks] [n_variants] [workers]
+'''
+import os
+import sys
+import tempfile
+import time
+
+benchdir = os.path.dirname(__file__)
+sys.path.insert(0, os.path.abspath(os.path.join(benchdir, "../")))
+sys.path.insert(0, os.path.abspath(benchdir))
+
+from dcmfile_parser import DCMParser, diff_matrix
+from synthetic import write_dcm_file
+
+
+def timed(label, func):
+    start = time.perf_counter()
+    result = func()
+    print(f'{label:>22}: {time.perf_counter() - start:7.3f} s')
+    return result
+
+
+def run(n_blocks=5000, n_variants=20, workers=1):
+    with tempfile.TemporaryDirectory() as tmp:
+        baseline_path = write_dcm_file(os.path.join(tmp, 'baseline.dcm'), n_blocks, seed=0)
+        ## seeds give other values for the same names
+        variants = [write_dcm_file(os.path.join(tmp, f'variant_{index}.dcm'), n_blocks, seed=index + 1)
+                    for index in range(n_variants)]
+        baseline = DCMParser(baseline_path).create_dcm_object()
+        print(f'{n_blocks} labels, {n_variants} variants, {workers} workers')
+        timed('parse variants only', lambda: [DCMParser(path).create_dcm_object() for path in variants])
+        timed('diff_report per variant', lambda: [baseline.diff_report(DCMParser(path).create_dcm_object())
+                                                  for path in variants])
+        timed('diff_matrix', lambda: diff_matrix(baseline, variants, workers=workers))
+        start = time.perf_counter()
+        variant_objects = [DCMParser(path).create_dcm_object() for path in variants]
+        parse_time = time.perf_counter() - start
+        timed('diff_matrix, parsed', lambda: diff_matrix(baseline, variant_objects))
+        print(f'{"(parse of the above)":>22}: {parse_time:7.3f} s')
+
+
+if __name__ == '__main__':
+    run(*(int(arg) for arg in sys.argv[1:4]))
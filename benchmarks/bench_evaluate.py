@@ -0,0 +1,60 @@
+'''
+Evaluation of a KENNFELD at many points: KENNFELD.evaluate against a lookup in a Python loop which rebuilds the
+grid from wert and size, as the simulation harness did.
+
+    python benchmarks/bench_evaluate.py [n_points]
+'''
+import os
+import sys
+import time
+from bisect import bisect_right
+
+import numpy as np
+
+benchdir = os.path.dirname(__file__)
+sys.path.insert(0, os.path.abspath(os.path.join(benchdir, "../")))
+
+from dcmfile_parser import KENNFELD
+
+
+def loop_lookup(param, x, y):
+    size_x, size_y = param.size
+    rows = [param.wert[i * size_x:(i + 1) * size_x] for i in range(size_y)]
+    results = []
+    for px, py in zip(x, y):
+        px = min(max(px, param.st_x[0]), param.st_x[-1])
+        py = min(max(py, param.st_y[0]), param.st_y[-1])
+        ix = min(max(bisect_right(param.st_x, px) - 1, 0), size_x - 2)
+        iy = min(max(bisect_right(param.st_y, py) - 1, 0), size_y - 2)
+        tx = (px - param.st_x[ix]) / (param.st_x[ix + 1] - param.st_x[ix])
+        ty = (py - param.st_y[iy]) / (param.st_y[iy + 1] - param.st_y[iy])
+        low = rows[iy][ix] + (rows[iy][ix + 1] - rows[iy][ix]) * tx
+        high = rows[iy + 1][ix] + (rows[iy + 1][ix + 1] - rows[iy + 1][ix]) * tx
+        results.append(low + (high - low) * ty)
+    return results
+
+
+def run(n_points=1_000_000):
+    rng = np.random.default_rng(0)
+    param = KENNFELD(name='map', size=[16, 12], st_x=list(np.linspace(0, 6000, 16)), st_y=list(np.linspace(0, 1, 12)),
+                     wert=list(rng.uniform(0, 100, 16 * 12)))
+    x = rng.uniform(-500, 6500, n_points)
+    y = rng.uniform(-0.1, 1.1, n_points)
+
+    start = time.perf_counter()
+    param.evaluate(x[:10], y[:10])
+    print(f'grid build + first call: {time.perf_counter() - start:7.4f} s')
+    start = time.perf_counter()
+    values = param.evaluate(x, y)
+    print(f'{"evaluate":>23}: {time.perf_counter() - start:7.4f} s for {n_points} points')
+
+    n_loop = min(n_points, 100_000)
+    start = time.perf_counter()
+    expected = loop_lookup(param, x[:n_loop].tolist(), y[:n_loop].tolist())
+    elapsed = time.perf_counter() - start
+    print(f'{"python loop":>23}: {elapsed * n_points / n_loop:7.4f} s for {n_points} points (from {n_loop})')
+    assert np.allclose(values[:n_loop], expected)
+
+
+if __name__ == '__main__':
+    run(*(int(arg) for arg in sys.argv[1:2]))
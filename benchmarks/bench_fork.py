@@ -0,0 +1,47 @@
+'''
+Memory of variants derived from one baseline: DCMObject.fork against deepcopy.
+
+    python benchmarks/bench_fork.py [n_blocks] [n_variants]
+'''
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from copy import deepcopy
+
+benchdir = os.path.dirname(__file__)
+sys.path.insert(0, os.path.abspath(os.path.join(benchdir, "../")))
+sys.path.insert(0, os.path.abspath(benchdir))
+
+from dcmfile_parser import DCMParser
+from synthetic import write_dcm_file
+
+
+def derive(baseline, n_variants, make_variant):
+    tracemalloc.start()
+    start = time.perf_counter()
+    variants = []
+    for index in range(n_variants):
+        variant = make_variant(baseline)
+        ## every variant changes a few labels
+        for name in list(variant._param_name_dict)[index:index + 5]:
+            variant.set_parameter_attribute(name, 'langname', f'variant {index}')
+        variants.append(variant)
+    elapsed = time.perf_counter() - start
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return variants, elapsed, memory
+
+
+def run(n_blocks=5000, n_variants=50):
+    with tempfile.TemporaryDirectory() as tmp:
+        baseline = DCMParser(write_dcm_file(os.path.join(tmp, 'baseline.dcm'), n_blocks)).create_dcm_object()
+        for label, make_variant in (('fork', lambda obj: obj.fork()), ('deepcopy', deepcopy)):
+            variants, elapsed, memory = derive(baseline, n_variants, make_variant)
+            print(f'{label:>8}: {elapsed:7.3f} s, {memory / 1e6:8.1f} MB for {n_variants} variants')
+            del variants
+
+
+if __name__ == '__main__':
+    run(*(int(arg) for arg in sys.argv[1:3]))
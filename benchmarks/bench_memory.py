@@ -0,0 +1,69 @@
+'''
+Memory per parameter of the slotted parameter classes compared with the previous layout,
+where every instance carried a __dict__ plus token_string and values_per_line.
+
+    python benchmarks/bench_memory.py
+'''
+import os
+import sys
+import tempfile
+import tracemalloc
+from dataclasses import dataclass
+
+benchdir = os.path.dirname(__file__)
+sys.path.insert(0, os.path.abspath(os.path.join(benchdir, "../")))
+sys.path.insert(0, os.path.abspath(benchdir))
+
+from dcmfile_parser import DCMParser, FESTWERT
+from synthetic import write_dcm_file
+
+
+@dataclass
+class DictFESTWERT:
+    name: str
+    langname: str = ''
+    funktion: str = ''
+    displayname: str = ''
+    einheit_w: str = ''
+    values_per_line: int = 6
+    wert: list = None
+    text: str = ''
+    var: str = None
+    token_string: str = 'FESTWERT '
+
+
+def bytes_per_object(factory, count):
+    names = [f'param_{i}' for i in range(count)]
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    objects = [factory(name) for name in names]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del objects
+    return (after - before) / count
+
+
+def bytes_per_parsed_param(n_blocks):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = write_dcm_file(os.path.join(tmp, 'bench.dcm'), n_blocks)
+        parser = DCMParser(path)
+        parser.file_raw_content
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        dcm_obj = parser.create_dcm_object()
+        del parser
+        after = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        return (after - before) / len(dcm_obj._param_name_dict)
+
+
+def run(count=50000):
+    dict_size = bytes_per_object(lambda name: DictFESTWERT(name, funktion='"Function"', einheit_w='"K"'), count)
+    slot_size = bytes_per_object(lambda name: FESTWERT(name, funktion='"Function"', einheit_w='"K"'), count)
+    print(f'FESTWERT with __dict__ : {dict_size:8.1f} bytes/param')
+    print(f'FESTWERT with __slots__: {slot_size:8.1f} bytes/param ({100 * (1 - slot_size / dict_size):.0f}% less)')
+    print(f'parsed synthetic file  : {bytes_per_parsed_param(20000):8.1f} bytes/param (incl. values)')
+
+
+if __name__ == '__main__':
+    run()
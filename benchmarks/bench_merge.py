@@ -0,0 +1,46 @@
+'''
+merge_layers against the chain of update_from / add_new_parameters_from calls on a base with overlays.
+
+    python benchmarks/bench_merge.py [n_blocks] [n_overlays]
+'''
+import os
+import sys
+import tempfile
+import time
+
+benchdir = os.path.dirname(__file__)
+sys.path.insert(0, os.path.abspath(os.path.join(benchdir, "../")))
+sys.path.insert(0, os.path.abspath(benchdir))
+
+from dcmfile_parser import DCMParser, merge_layers
+from synthetic import write_dcm_file
+
+
+def override_chain(base, overlays):
+    ## the per layer way: remove the overridden labels one by one, then add_new_parameters_from deep copies the rest
+    for overlay in overlays:
+        for name in overlay._param_name_dict:
+            base.remove_parameter_by_name(name)
+        base.add_new_parameters_from(overlay)
+    return base
+
+
+def run(n_blocks=20000, n_overlays=4):
+    with tempfile.TemporaryDirectory() as tmp:
+        ## overlays with a quarter of the labels of the base, same names as the synthetic names depend on the index
+        paths = [write_dcm_file(os.path.join(tmp, f'layer_{i}.dcm'), n_blocks if i == 0 else n_blocks // 4, seed=i)
+                 for i in range(n_overlays + 1)]
+        layers = [DCMParser(path).create_dcm_object() for path in paths]
+
+        start = time.perf_counter()
+        result = merge_layers(layers)
+        print(f'merge_layers  : {time.perf_counter() - start:7.3f} s, {len(result.provenance)} labels')
+
+        start = time.perf_counter()
+        merged = override_chain(layers[0], layers[1:])
+        print(f'override chain: {time.perf_counter() - start:7.3f} s, {len(merged._param_name_dict)} labels')
+        assert sorted(merged.iter_blocks()) == sorted(result.dcm_object.iter_blocks())
+
+
+if __name__ == '__main__':
+    run(*(int(arg) for arg in sys.argv[1:3]))
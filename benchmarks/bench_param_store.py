@@ -0,0 +1,52 @@
+'''
+Bulk deletion and sorted insertion on a large DCMObject, ParamStore against the plain lists it replaced.
+
+    python benchmarks/bench_param_store.py [n_blocks] [n_deleted]
+'''
+import os
+import sys
+import tempfile
+import time
+
+benchdir = os.path.dirname(__file__)
+sys.path.insert(0, os.path.abspath(os.path.join(benchdir, "../")))
+sys.path.insert(0, os.path.abspath(benchdir))
+
+from dcmfile_parser import DCMParser
+from synthetic import write_dcm_file
+
+
+def delete_from_lists(dcm_obj, names):
+    ## what _delete_elements_if_in_list did before: a linear search in the list per name
+    lists = {attr: list(getattr(dcm_obj, attr)) for attr in dcm_obj._param_attributes}
+    for name in names:
+        item, attr = dcm_obj._param_name_dict[name]
+        items = lists[attr]
+        for index, list_item in enumerate(items):
+            if list_item is item:
+                del items[index]
+                break
+
+
+def run(n_blocks=100000, n_deleted=10000):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = write_dcm_file(os.path.join(tmp, 'bench.dcm'), n_blocks)
+        dcm_obj = DCMParser(path).create_dcm_object()
+        names = list(dcm_obj._param_name_dict)[::n_blocks // n_deleted][:n_deleted]
+
+        start = time.perf_counter()
+        delete_from_lists(dcm_obj, names)
+        print(f'list deletion      : {time.perf_counter() - start:7.3f} s for {n_deleted} labels')
+
+        start = time.perf_counter()
+        dcm_obj._delete_elements_if_in_list(names, None)
+        print(f'ParamStore deletion: {time.perf_counter() - start:7.3f} s for {n_deleted} labels')
+
+        source = DCMParser(path).create_dcm_object()
+        start = time.perf_counter()
+        dcm_obj.add_new_parameters_from(source)
+        print(f'sorted re-insertion: {time.perf_counter() - start:7.3f} s for {n_deleted} labels')
+
+
+if __name__ == '__main__':
+    run(*(int(arg) for arg in sys.argv[1:3]))
@@ -0,0 +1,36 @@
+'''
+Scaling of parse_many over the number of worker processes.
+
+    python benchmarks/bench_parse_many.py [max_workers]
+'''
+import os
+import sys
+import tempfile
+import time
+
+benchdir = os.path.dirname(__file__)
+sys.path.insert(0, os.path.abspath(os.path.join(benchdir, "../")))
+sys.path.insert(0, os.path.abspath(benchdir))
+
+from dcmfile_parser import parse_many
+from synthetic import write_dcm_file
+
+
+def run(max_workers=None, n_files=32, n_blocks=3000):
+    max_workers = max_workers or os.cpu_count()
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = [write_dcm_file(os.path.join(tmp, f'variant_{i}.dcm'), n_blocks, seed=i) for i in range(n_files)]
+        serial_time = None
+        workers = 1
+        while workers <= max_workers:
+            start = time.perf_counter()
+            results = parse_many(paths, workers=workers)
+            elapsed = time.perf_counter() - start
+            assert all(result.ok for result in results)
+            serial_time = serial_time or elapsed
+            print(f'{workers:>3} workers: {elapsed:7.2f} s  speedup {serial_time / elapsed:5.2f}')
+            workers *= 2
+
+
+if __name__ == '__main__':
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else None)
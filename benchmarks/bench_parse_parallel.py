@@ -0,0 +1,39 @@
+'''
+Scaling of the intra-file parallel parse (DCMParser workers) on one large file.
+
+    python benchmarks/bench_parse_parallel.py [max_workers] [n_blocks]
+'''
+import os
+import sys
+import tempfile
+import time
+
+benchdir = os.path.dirname(__file__)
+sys.path.insert(0, os.path.abspath(os.path.join(benchdir, "../")))
+sys.path.insert(0, os.path.abspath(benchdir))
+
+from dcmfile_parser import DCMParser
+from synthetic import write_dcm_file
+
+
+def run(max_workers=None, n_blocks=100000):
+    max_workers = max_workers or os.cpu_count()
+    with tempfile.TemporaryDirectory() as tmp:
+        path = write_dcm_file(os.path.join(tmp, 'large.dcm'), n_blocks, seed=0)
+        start = time.perf_counter()
+        expected = str(DCMParser(path).create_dcm_object())
+        serial_time = time.perf_counter() - start
+        print(f'serial    : {serial_time:7.2f} s')
+        workers = 2
+        while workers <= max(max_workers, 2):
+            start = time.perf_counter()
+            dcm_obj = DCMParser(path, workers=workers).create_dcm_object()
+            elapsed = time.perf_counter() - start
+            assert str(dcm_obj) == expected
+            print(f'{workers:>3} workers: {elapsed:7.2f} s  speedup {serial_time / elapsed:5.2f}')
+            workers *= 2
+
+
+if __name__ == '__main__':
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else None,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 100000)
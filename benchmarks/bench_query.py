@@ -0,0 +1,40 @@
+'''
+Query times of DCMObject.query on a large object.
+
+    python benchmarks/bench_query.py [n_blocks]
+'''
+import os
+import sys
+import tempfile
+import time
+
+benchdir = os.path.dirname(__file__)
+sys.path.insert(0, os.path.abspath(os.path.join(benchdir, "../")))
+sys.path.insert(0, os.path.abspath(benchdir))
+
+from dcmfile_parser import DCMParser
+from synthetic import write_dcm_file
+
+queries = {
+    'prefix': dict(name='map_1234*'),
+    'range': dict(start='curve_500', end='curve_501'),
+    'funktion + type': dict(funktion='Function_7', param_type='KENNFELD'),
+    'unit + prefix': dict(unit='kPa', name='map_99*'),
+}
+
+
+def run(n_blocks=100000, repeat=100):
+    with tempfile.TemporaryDirectory() as tmp:
+        dcm_obj = DCMParser(write_dcm_file(os.path.join(tmp, 'bench.dcm'), n_blocks)).create_dcm_object()
+        start = time.perf_counter()
+        dcm_obj.query_names(name='')
+        print(f'{"index build":>16}: {(time.perf_counter() - start) * 1e3:8.3f} ms')
+        for label, query in queries.items():
+            start = time.perf_counter()
+            for _ in range(repeat):
+                names = dcm_obj.query_names(**query)
+            print(f'{label:>16}: {(time.perf_counter() - start) / repeat * 1e3:8.3f} ms, {len(names)} labels')
+
+
+if __name__ == '__main__':
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
@@ -0,0 +1,49 @@
+'''
+Incremental re-parse after editing a few labels of a large file, against a full parse.
+
+    python benchmarks/bench_reparse.py [n_blocks] [n_edits]
+'''
+import os
+import sys
+import tempfile
+import time
+
+benchdir = os.path.dirname(__file__)
+sys.path.insert(0, os.path.abspath(os.path.join(benchdir, "../")))
+sys.path.insert(0, os.path.abspath(benchdir))
+
+from dcmfile_parser import DCMParser
+from synthetic import generate_dcm_text
+
+
+def run(n_blocks=100000, n_edits=10):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'bench.dcm')
+        content = generate_dcm_text(n_blocks)
+        with open(path, 'w', encoding='ISO-8859-1') as f:
+            f.write(content)
+        print(f'{os.path.getsize(path) / 1e6:.1f} MB, {n_blocks} labels, {n_edits} edited')
+
+        start = time.perf_counter()
+        dcmfile_parser = DCMParser(path, incremental=True)
+        dcmfile_parser.create_dcm_object()
+        print(f'first parse : {time.perf_counter() - start:7.3f} s')
+
+        for index in range(0, n_blocks, n_blocks // n_edits)[:n_edits]:
+            content = content.replace(f'LANGNAME "Parameter {index}"', f'LANGNAME "Edited {index}"')
+            content = content.replace(f'LANGNAME "Curve {index}"', f'LANGNAME "Edited {index}"')
+            content = content.replace(f'LANGNAME "Map {index}"', f'LANGNAME "Edited {index}"')
+        with open(path, 'w', encoding='ISO-8859-1') as f:
+            f.write(content)
+
+        start = time.perf_counter()
+        result = dcmfile_parser.reparse()
+        print(f'reparse     : {time.perf_counter() - start:7.3f} s, {len(result.changed_names)} changed')
+
+        start = time.perf_counter()
+        DCMParser(path).create_dcm_object()
+        print(f'full parse  : {time.perf_counter() - start:7.3f} s')
+
+
+if __name__ == '__main__':
+    run(*(int(arg) for arg in sys.argv[1:3]))
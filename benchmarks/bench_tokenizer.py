@@ -0,0 +1,39 @@
+'''
+Shows that splitting a DCM file into blocks and creating the DCMObject scales linearly with file size.
+
+    python benchmarks/bench_tokenizer.py
+'''
+import os
+import sys
+import tempfile
+import time
+
+benchdir = os.path.dirname(__file__)
+sys.path.insert(0, os.path.abspath(os.path.join(benchdir, "../")))
+sys.path.insert(0, os.path.abspath(benchdir))
+
+from dcmfile_parser import DCMParser
+from synthetic import write_dcm_file
+
+
+def run(block_counts=(2000, 4000, 8000, 16000)):
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f'{"blocks":>8} {"MB":>8} {"split s":>9} {"parse s":>9} {"parse s/MB":>11}')
+        for n_blocks in block_counts:
+            path = write_dcm_file(os.path.join(tmp, f'bench_{n_blocks}.dcm'), n_blocks)
+            size_mb = os.path.getsize(path) / 1e6
+
+            parser = DCMParser(path)
+            _, _, rest_data = parser.get_comments_and_spec_version()
+            start = time.perf_counter()
+            parser.create_chunks(rest_data)
+            split_time = time.perf_counter() - start
+
+            start = time.perf_counter()
+            DCMParser(path).create_dcm_object()
+            parse_time = time.perf_counter() - start
+            print(f'{n_blocks:>8} {size_mb:>8.2f} {split_time:>9.3f} {parse_time:>9.3f} {parse_time / size_mb:>11.3f}')
+
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,29 @@
+'''
+Time to serialise a DCMObject with the compiled emitters and with the Jinja2 templates.
+
+    python benchmarks/bench_write.py
+'''
+import os
+import sys
+import tempfile
+import time
+
+benchdir = os.path.dirname(__file__)
+sys.path.insert(0, os.path.abspath(os.path.join(benchdir, "../")))
+sys.path.insert(0, os.path.abspath(benchdir))
+
+from dcmfile_parser import DCMParser
+from synthetic import write_dcm_file
+
+
+def run(n_blocks=20000):
+    with tempfile.TemporaryDirectory() as tmp:
+        dcm_obj = DCMParser(write_dcm_file(os.path.join(tmp, 'bench.dcm'), n_blocks)).create_dcm_object()
+        for backend in ('compiled', 'jinja2'):
+            start = time.perf_counter()
+            dcm_obj.to_string(backend)
+            print(f'{backend:>9}: {time.perf_counter() - start:7.3f} s for {n_blocks} labels')
+
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,46 @@
+'''
+Writing a large file after a change of one label: the source preserving write of DCMObject against the full
+render and a plain copy of the file.
+
+    python benchmarks/bench_write_preserving.py [n_blocks]
+'''
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+benchdir = os.path.dirname(__file__)
+sys.path.insert(0, os.path.abspath(os.path.join(benchdir, "../")))
+sys.path.insert(0, os.path.abspath(benchdir))
+
+from dcmfile_parser import DCMParser
+from synthetic import write_dcm_file
+
+
+def timed(label, func, repeat=3):
+    best = min(_elapsed(func) for _ in range(repeat))
+    print(f'{label:>14}: {best:7.3f} s')
+
+
+def _elapsed(func):
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
+
+
+def run(n_blocks=20000):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = write_dcm_file(os.path.join(tmp, 'source.dcm'), n_blocks)
+        out = os.path.join(tmp, 'out.dcm')
+        dcm_obj = DCMParser(path, keep_source=True).create_dcm_object()
+        name = next(iter(dcm_obj._param_name_dict))
+        dcm_obj.set_parameter_attribute(name, 'langname', '"changed"')
+        print(f'{os.path.getsize(path) / 1e6:.1f} MB, {n_blocks} blocks, one label changed')
+        timed('file copy', lambda: shutil.copyfile(path, out))
+        timed('preserving', lambda: dcm_obj.write(out, preserve_source=True))
+        timed('full render', lambda: dcm_obj.write(out, preserve_source=False))
+
+
+if __name__ == '__main__':
+    run(*(int(arg) for arg in sys.argv[1:2]))
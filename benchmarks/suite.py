@@ -0,0 +1,186 @@
+'''
+Benchmark suite for regressions: parse, write, update_from, diff_report, add_new_parameters_from and removal on
+synthetic files of every parameter type (synthetic.SyntheticSpec), time and peak memory per case, compared
+against a stored baseline.
+
+    python benchmarks/suite.py                                   # 1 and 10 MB, compare with baseline.json if there
+    python benchmarks/suite.py --sizes 1,10,100,500 --save       # store the results as the new baseline
+    python benchmarks/suite.py --threshold 0.25 --no-memory      # exit code 1 if a case is 25% slower
+
+Times are the best of --repeat runs, peak memory is traced in a separate run with tracemalloc.
+'''
+import argparse
+from dataclasses import replace
+import gc
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+
+benchdir = os.path.dirname(__file__)
+sys.path.insert(0, os.path.abspath(os.path.join(benchdir, "../")))
+sys.path.insert(0, os.path.abspath(benchdir))
+
+from dcmfile_parser import DCMParser, __version__
+from synthetic import SyntheticSpec, write_spec_file
+
+default_baseline = os.path.join(benchdir, 'baseline.json')
+
+
+class Files:
+    '''
+    The synthetic files of one size: the baseline, a variant with the same names and other values,
+    and a file with new names
+    '''
+    def __init__(self, tmp, size_mb, spec):
+        spec = spec.for_size(size_mb * 1e6)
+        self.base = write_spec_file(os.path.join(tmp, f'base_{size_mb}.dcm'), spec, seed=0)
+        self.variant = write_spec_file(os.path.join(tmp, f'variant_{size_mb}.dcm'), spec, seed=1)
+        self.new = write_spec_file(os.path.join(tmp, f'new_{size_mb}.dcm'),
+                                   replace(spec.scaled(0.1), prefix='new_'), seed=2)
+        self.out = os.path.join(tmp, f'out_{size_mb}.dcm')
+
+
+def parse(path):
+    return DCMParser(path).create_dcm_object()
+
+
+## every case returns (setup, run): setup is not timed, run gets its result
+def case_parse(files):
+    return lambda: files.base, parse
+
+
+def case_write(files):
+    return lambda: parse(files.base), lambda dcm_obj: dcm_obj.write(files.out, preserve_source=False)
+
+
+def case_update_from(files):
+    return lambda: (parse(files.base), parse(files.variant)), lambda objs: objs[0].update_from(objs[1])
+
+
+def case_diff_report(files):
+    return lambda: (parse(files.base), parse(files.variant)), lambda objs: objs[0].diff_report(objs[1])
+
+
+def case_add_new(files):
+    return (lambda: (parse(files.base), parse(files.new)),
+            lambda objs: objs[0].add_new_parameters_from(objs[1], share=False))
+
+
+def case_remove(files):
+    def run(dcm_obj):
+        for name in list(dcm_obj._param_name_dict)[::10]:
+            dcm_obj.remove_parameter_by_name(name)
+    return lambda: parse(files.base), run
+
+
+cases = {
+    'parse': case_parse,
+    'write': case_write,
+    'update_from': case_update_from,
+    'diff_report': case_diff_report,
+    'add_new_parameters_from': case_add_new,
+    'remove': case_remove,
+}
+
+
+def measure(make_case, files, repeat, memory):
+    setup, run = make_case(files)
+    times = []
+    for _ in range(repeat):
+        state = setup()
+        gc.collect()
+        start = time.perf_counter()
+        run(state)
+        times.append(time.perf_counter() - start)
+        del state
+    result = {'seconds': min(times)}
+    if memory:
+        state = setup()
+        gc.collect()
+        tracemalloc.start()
+        run(state)
+        result['peak_mb'] = tracemalloc.get_traced_memory()[1] / 1e6
+        tracemalloc.stop()
+        del state
+    return result
+
+
+## differences below these are noise, whatever the relative change
+min_deltas = {'seconds': 0.005, 'peak_mb': 1.0}
+
+
+def compare(results, baseline, threshold):
+    '''
+    Returns the regressions: (key, metric, baseline value, value) where value > baseline value * (1 + threshold)
+    '''
+    regressions = []
+    for key, result in results.items():
+        reference = baseline.get(key)
+        if reference is None:
+            continue
+        for metric, value in result.items():
+            if metric not in reference or value - reference[metric] < min_deltas.get(metric, 0):
+                continue
+            if value > reference[metric] * (1 + threshold):
+                regressions.append((key, metric, reference[metric], value))
+    return regressions
+
+
+def run(sizes, names, repeat=3, memory=True, spec=None):
+    spec = spec or SyntheticSpec()
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for size_mb in sizes:
+            files = Files(tmp, size_mb, spec)
+            print(f'{size_mb} MB: {os.path.getsize(files.base) / 1e6:.1f} MB file')
+            for name in names:
+                key = f'{name}@{size_mb}MB'
+                results[key] = result = measure(cases[name], files, repeat, memory)
+                peak = f", peak {result['peak_mb']:8.1f} MB" if 'peak_mb' in result else ''
+                print(f'  {name:>24}: {result["seconds"]:8.3f} s{peak}')
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', default='1,10', help='file sizes in MB, comma separated (1,10,100,500)')
+    parser.add_argument('--cases', default=','.join(cases), help='comma separated: ' + ', '.join(cases))
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--no-memory', action='store_true', help='skip the tracemalloc run')
+    parser.add_argument('--baseline', default=default_baseline)
+    parser.add_argument('--save', action='store_true', help='store the results as the baseline')
+    parser.add_argument('--threshold', type=float, default=0.2, help='allowed relative increase, 0.2 for 20%%')
+    args = parser.parse_args(argv)
+
+    sizes = [float(size) if '.' in size else int(size) for size in args.sizes.split(',')]
+    names = args.cases.split(',')
+    unknown = [name for name in names if name not in cases]
+    if unknown:
+        parser.error(f'unknown cases {unknown}')
+    results = run(sizes, names, args.repeat, not args.no_memory)
+
+    if args.save:
+        with open(args.baseline, 'w') as f:
+            json.dump({'version': __version__, 'python': platform.python_version(), 'machine': platform.machine(),
+                       'results': results}, f, indent=2)
+        print(f'baseline stored in {args.baseline}')
+        return 0
+    if not os.path.exists(args.baseline):
+        print(f'no baseline {args.baseline}, store one with --save')
+        return 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)['results']
+    regressions = compare(results, baseline, args.threshold)
+    for key, metric, reference, value in regressions:
+        print(f'REGRESSION {key} {metric}: {reference:.3f} -> {value:.3f} ({value / reference - 1:+.0%})')
+    if not regressions:
+        print(f'no regression above {args.threshold:.0%} against {args.baseline}')
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,204 @@
+'''
+Deterministic generator for synthetic DCM files, used by the benchmarks
+'''
+from dataclasses import dataclass, field, replace
+from typing import Dict, Tuple
+import random
+
+
+def festwert_block(rng, index):
+    return (f'FESTWERT param_{index}\n'
+            f'  LANGNAME "Parameter {index}"\n'
+            f'  FUNKTION "Function_{index % 50}"\n'
+            f'  EINHEIT_W "K"\n'
+            f'  WERT {rng.uniform(-100, 100):.4f}\n'
+            'END\n')
+
+
+def kennlinie_block(rng, index, points=8):
+    st_x = ' '.join(f'{x:.1f}' for x in range(points))
+    wert = ' '.join(f'{rng.uniform(0, 500):.3f}' for _ in range(points))
+    return (f'KENNLINIE curve_{index} {points}\n'
+            f'  LANGNAME "Curve {index}"\n'
+            f'  FUNKTION "Function_{index % 50}"\n'
+            f'  EINHEIT_X "min"\n'
+            f'  EINHEIT_W "K"\n'
+            f'  ST/X   {st_x}\n'
+            f'  WERT   {wert}\n'
+            'END\n')
+
+
+def kennfeld_block(rng, index, size_x=8, size_y=8):
+    lines = [f'KENNFELD map_{index} {size_x} {size_y}',
+             f'  LANGNAME "Map {index}"',
+             f'  FUNKTION "Function_{index % 50}"',
+             '  EINHEIT_X "K"',
+             '  EINHEIT_Y "m^2/s"',
+             '  EINHEIT_W "kPa"',
+             '  ST/X   ' + ' '.join(f'{x:.1f}' for x in range(size_x))]
+    for y in range(size_y):
+        lines.append(f'  ST/Y   {y}.5')
+        lines.append('  WERT   ' + ' '.join(f'{rng.uniform(0, 10):.3f}' for _ in range(size_x)))
+    lines.append('END')
+    return '\n'.join(lines) + '\n'
+
+
+def generate_dcm_text(n_blocks, seed=0):
+    '''
+    Returns the content of a DCM file with n_blocks parameters, FESTWERT, KENNLINIE and KENNFELD mixed
+    '''
+    rng = random.Random(seed)
+    parts = ['* synthetic DCM file\n', '\nKONSERVIERUNG_FORMAT 2.0\n\n']
+    makers = [festwert_block, festwert_block, kennlinie_block, kennfeld_block]
+    for index in range(n_blocks):
+        parts.append(makers[index % len(makers)](rng, index))
+        parts.append('\n')
+    return ''.join(parts)
+
+
+def write_dcm_file(path, n_blocks, seed=0):
+    with open(path, 'w', encoding='ISO-8859-1') as f:
+        f.write(generate_dcm_text(n_blocks, seed))
+    return path
+
+
+## configurable generator with every parameter type of DCMParser.all_param_classes, used by suite.py
+
+@dataclass
+class SyntheticSpec:
+    counts: Dict[str, int] = field(default_factory=lambda: dict(default_counts))   # parameter type -> number of blocks
+    curve_points: int = 16
+    map_size: Tuple[int, int] = (16, 12)          # points on x and y of the maps
+    block_size: int = 24                          # values of a FESTWERTEBLOCK
+    text_fraction: float = 0.2                    # FESTWERT with TEXT instead of WERT
+    var_fraction: float = 0.3                     # FESTWERT with a VAR line
+    comment_lines: int = 20
+    n_functions: int = 50
+    prefix: str = ''                              # prefix of all names, for files with new names
+
+    def scaled(self, factor):
+        return replace(self, counts={type: max(1, round(count * factor)) for type, count in self.counts.items()})
+
+    def for_size(self, target_bytes, seed=0):
+        '''
+        The spec with the counts scaled to give a file of about target_bytes
+        '''
+        sample = len(generate_spec_text(self, seed).encode('ISO-8859-1'))
+        return self.scaled(target_bytes / sample)
+
+
+default_counts = {
+    'FESTWERT': 400, 'FESTWERTEBLOCK': 60,
+    'KENNLINIE': 120, 'FESTKENNLINIE': 30, 'GRUPPENKENNLINIE': 30,
+    'KENNFELD': 80, 'FESTKENNFELD': 20, 'GRUPPENKENNFELD': 20,
+    'STUETZSTELLENVERTEILUNG': 20,
+}
+
+
+def _value_lines(keyword, values, per_line=6):
+    return [f'  {keyword}   ' + ' '.join(values[i:i + per_line]) for i in range(0, len(values), per_line)]
+
+
+def _header_lines(spec, type, name, index, size=''):
+    return [f'{type} {spec.prefix}{name} {size}'.rstrip(),
+            f'  LANGNAME "{type.title()} {index}"',
+            f'  FUNKTION "Function_{index % spec.n_functions}"',
+            f'  DISPLAYNAME {type.title()}_{index}']
+
+
+def _festwert(spec, rng, index):
+    lines = _header_lines(spec, 'FESTWERT', f'value_{index}', index)
+    if rng.random() < spec.text_fraction:
+        lines += ['  EINHEIT_W "-"', f'  TEXT "Setting_{rng.randrange(8)}"']
+        if rng.random() < spec.var_fraction:
+            lines.append(f'  VAR   Variant{rng.randrange(4)}="Setting_{rng.randrange(8)}"')
+    else:
+        lines += ['  EINHEIT_W "K"', f'  WERT {rng.uniform(-100, 100):.4f}']
+        if rng.random() < spec.var_fraction:
+            lines.append(f'  VAR   Variant{rng.randrange(4)}={rng.uniform(-100, 100):.4f}')
+    return lines
+
+
+def _festwerteblock(spec, rng, index):
+    lines = _header_lines(spec, 'FESTWERTEBLOCK', f'block_{index}', index, spec.block_size)
+    lines.append('  EINHEIT_W "K"')
+    return lines + _value_lines('WERT', [f'{rng.uniform(0, 100):.3f}' for _ in range(spec.block_size)])
+
+
+def _axis(rng, points):
+    start = rng.uniform(-50, 50)
+    return [f'{start + step * 2.5:.2f}' for step in range(points)]
+
+
+def _curve(type):
+    def make(spec, rng, index):
+        points = spec.curve_points
+        lines = _header_lines(spec, type, f'{type.lower()}_{index}', index, points)
+        lines += ['  EINHEIT_X "rpm"', '  EINHEIT_W "Nm"']
+        if type == 'GRUPPENKENNLINIE':
+            lines.append(f'*SSTX  {spec.prefix}stuetzstellenverteilung_{index % max(1, spec.counts.get("STUETZSTELLENVERTEILUNG", 1))}')
+        lines += _value_lines('ST/X', _axis(rng, points))
+        return lines + _value_lines('WERT', [f'{rng.uniform(0, 500):.3f}' for _ in range(points)])
+    return make
+
+
+def _map(type):
+    def make(spec, rng, index):
+        size_x, size_y = spec.map_size
+        lines = _header_lines(spec, type, f'{type.lower()}_{index}', index, f'{size_x} {size_y}')
+        lines += ['  EINHEIT_X "K"', '  EINHEIT_Y "m^2/s"', '  EINHEIT_W "kPa"']
+        lines += _value_lines('ST/X', _axis(rng, size_x))
+        for y in _axis(rng, size_y):
+            lines.append(f'  ST/Y   {y}')
+            lines += _value_lines('WERT', [f'{rng.uniform(0, 10):.3f}' for _ in range(size_x)])
+        return lines
+    return make
+
+
+def _distribution(spec, rng, index):
+    lines = _header_lines(spec, 'STUETZSTELLENVERTEILUNG', f'stuetzstellenverteilung_{index}', index, spec.curve_points)
+    lines.append('  EINHEIT_X "rpm"')
+    return lines + _value_lines('ST/X', _axis(rng, spec.curve_points))
+
+
+block_makers = {
+    'FESTWERT': _festwert,
+    'FESTWERTEBLOCK': _festwerteblock,
+    'KENNLINIE': _curve('KENNLINIE'),
+    'FESTKENNLINIE': _curve('FESTKENNLINIE'),
+    'GRUPPENKENNLINIE': _curve('GRUPPENKENNLINIE'),
+    'KENNFELD': _map('KENNFELD'),
+    'FESTKENNFELD': _map('FESTKENNFELD'),
+    'GRUPPENKENNFELD': _map('GRUPPENKENNFELD'),
+    'STUETZSTELLENVERTEILUNG': _distribution,
+}
+
+
+def iter_spec_text(spec, seed=0):
+    '''
+    Yields the content of a DCM file for spec in pieces, the blocks of all types interleaved as in real files.
+    The same spec and seed always give the same file, another seed gives the same names with other values
+    '''
+    rng = random.Random(seed)
+    header = [f'* synthetic DCM file, comment line {line}' for line in range(spec.comment_lines)]
+    yield '\n'.join(header) + '\n\nKONSERVIERUNG_FORMAT 2.0\n\n'
+    if spec.n_functions:
+        functions = [f'  FKT Function_{index} "1.{index}" "Synthetic function {index}"' for index in range(spec.n_functions)]
+        yield '\n'.join(['FUNKTIONEN', *functions, 'END']) + '\n\n'
+    total = max(spec.counts.values(), default=0)
+    for step in range(total):
+        for type, count in spec.counts.items():
+            ## spreads the blocks of each type evenly over the file
+            if step * count // total != (step + 1) * count // total:
+                yield '\n'.join(block_makers[type](spec, rng, step * count // total) + ['END']) + '\n\n'
+
+
+def generate_spec_text(spec, seed=0):
+    return ''.join(iter_spec_text(spec, seed))
+
+
+def write_spec_file(path, spec, seed=0):
+    with open(path, 'w', encoding='ISO-8859-1') as f:
+        for piece in iter_spec_text(spec, seed):
+            f.write(piece)
+    return path
@@ -1,3 +1,10 @@
 from dcmfile_parser.parse_dcm import DCMParser
 from dcmfile_parser.dcm_object import DCMObject
-from dcmfile_parser.attribute_classes import *
\ No newline at end of file
+from dcmfile_parser.attribute_classes import *
+from dcmfile_parser.batch import parse_many, ParseResult
+from dcmfile_parser.cache import ParseCache
+from dcmfile_parser.version import __version__
+from dcmfile_parser.binary_format import read_binary, write_binary, BinaryFormatError
+from dcmfile_parser.merge import merge_layers, MergePolicy, MergeResult, MergeConflictError
+from dcmfile_parser.profiling import ParseStats, PhaseStats
+from dcmfile_parser.diff_matrix import diff_matrix, DiffMatrix, PreparedBaseline, LabelStats
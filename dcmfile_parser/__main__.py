@@ -0,0 +1,4 @@
+import sys
+from dcmfile_parser.cli import main
+
+sys.exit(main())
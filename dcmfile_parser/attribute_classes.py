@@ -1,17 +1,70 @@
 import os
 import re
-from typing import List, Optional, Union
-from pathlib import Path as path
-from dataclasses import dataclass, field
-from jinja2 import Environment, FileSystemLoader
-from jinja2.exceptions import TemplateNotFound
-import logging
+from typing import ClassVar, List, Optional, Union
+from dataclasses import dataclass, field, fields
+import numpy as np
+from .emitters import emit
+from .diff_engine import compare_parameters
+from . import profiling
+from .interpolation import curve_grid, map_grid, evaluate_curve, evaluate_map
+from time import perf_counter
 
 # Load Jinja2 templates from a directory named 'templates'
 class Tempaltes():
     CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
     TEMPLATE_DIR = os.path.join(CURRENT_DIR, 'templates')
-    env = Environment(loader=FileSystemLoader(TEMPLATE_DIR))
+    _env = None
+    __slots__ = ()
+
+    @classmethod
+    def get_env(cls):
+        ## jinja2 is only imported when the template backend is used
+        if Tempaltes._env is None:
+            from jinja2 import Environment, FileSystemLoader
+            Tempaltes._env = Environment(loader=FileSystemLoader(cls.TEMPLATE_DIR))
+        return Tempaltes._env
+
+def add_slots(cls):
+    '''
+    Recreates a dataclass with __slots__ for its fields (dataclass(slots=True) needs python 3.10),
+    so the instances carry no __dict__. The names in the class attribute cache_slots get a slot without being
+    a field, they are left out of __init__, __eq__, asdict and the serialized forms
+    '''
+    inherited_slots = set()
+    for base in cls.__mro__[1:]:
+        inherited_slots.update(getattr(base, '__slots__', ()))
+    field_names = [f.name for f in fields(cls)]
+    cls_dict = dict(cls.__dict__)
+    cls_dict['__slots__'] = tuple(name for name in [*field_names, *cls.__dict__.get('cache_slots', ())]
+                                  if name not in inherited_slots)
+    for name in field_names:
+        cls_dict.pop(name, None)
+    cls_dict.pop('__dict__', None)
+    cls_dict.pop('__weakref__', None)
+    slotted_cls = type(cls)(cls.__name__, cls.__bases__, cls_dict)
+    slotted_cls.__qualname__ = cls.__qualname__
+    # zero argument super() in the methods refers to the class through a closure cell
+    for value in cls_dict.values():
+        for cell in getattr(value, '__closure__', None) or ():
+            try:
+                if cell.cell_contents is cls:
+                    cell.cell_contents = slotted_cls
+            except ValueError:  # empty cell
+                pass
+    return slotted_cls
+
+
+_copiers = {}   # class -> shallow copy function of its instances
+
+
+def _make_copier(cls):
+    ## one tuple assignment from the fields into the slots, as serialization.unpack_param does
+    names = [f.name for f in fields(cls) if f.init]
+    targets = ''.join(f'param.{name}, ' for name in names)
+    sources = ''.join(f'source.{name}, ' for name in names)
+    namespace = {'new': cls.__new__, 'cls': cls}
+    exec(f'def copy_param(source):\n    param = new(cls)\n    {targets}= {sources}\n    return param', namespace)
+    return namespace['copy_param']
 
 def format_value(value):
     if int(value) == value:
@@ -19,18 +72,41 @@ def format_value(value):
     else:
         return '{:.4f}'.format(value)
 
+def flatten_values(values):
+    '''
+    Values in file order, arrays of the array mode are flattened
+    '''
+    if isinstance(values, np.ndarray):
+        return values.ravel()
+    return values
+
+def values_to_array(tokens, shape=None):
+    '''
+    Bulk conversion of the value tokens (str or bytes) into a contiguous float64 array, used by the array mode.
+    Returns None if there are non numeric tokens, these stay in the list representation
+    '''
+    try:
+        values = np.array(tokens, dtype=np.float64)
+    except ValueError:
+        return None
+    if shape and values.size == int(np.prod(shape)):
+        values = values.reshape(shape)
+    return values
+
+@add_slots
 @dataclass
 class FUNKTIONEN:
     function: str
     version: str
     description: str
-    token_string: str = 'FUNKTIONEN'
+    token_string: ClassVar[str] = 'FUNKTIONEN'
     extract_regex = re.compile(r'\s*FKT\s+(\w+)\s+"([^"]*)"\s+"([^"]*)"')
 
     def __str__(self):
         func_str = f'  FKT {self.function} "{self.version}" "{self.description}"'
         return func_str
     
+@add_slots
 @dataclass
 class BaseParam(Tempaltes):
     name: str
@@ -38,18 +114,43 @@ class BaseParam(Tempaltes):
     funktion: str = ''
     displayname: str = ''
     einheit_w: str = ''
-    values_per_line : int = 6   
+    values_per_line: ClassVar[int] = 6
     
+    render_backends = ('compiled', 'jinja2')
+
     def __str__(self):
+        return self.render()
+
+    def __copy__(self):
+        ## the fields of the copy are the same objects, the cached grid of evaluate is not taken over
+        copier = _copiers.get(type(self))
+        if copier is None:
+            copier = _copiers[type(self)] = _make_copier(type(self))
+        return copier(self)
+
+    def render(self, backend='compiled'):
+        '''
+        compiled : precompiled emitter functions, the default
+        jinja2 : the templates in templates/
+        '''
+        if backend == 'compiled':
+            return emit(self)
+        if backend == 'jinja2':
+            return self.render_template()
+        raise ValueError(f'Unknown render backend {backend}, use one of {self.render_backends}')
+
+    def render_template(self):
+        from jinja2.exceptions import TemplateNotFound
+        env = self.get_env()
         try:
             # Try to get the template based on the class name
             template_name = self.__class__.__name__ + '.jinja2'
-            template = self.env.get_template(template_name)
+            template = env.get_template(template_name)
         except TemplateNotFound:
             # If not found, try to get the parent class's template
             template_name = self.__class__.__bases__[0].__name__ + '.jinja2'
-            template = self.env.get_template(template_name)       
-        return template.render(param=self,enumerate=enumerate,format_value=format_value)
+            template = env.get_template(template_name)       
+        return template.render(param=self,enumerate=enumerate,format_value=format_value,flat=flatten_values)
 
     def _relative_difference(self,a, b):
         if a == b == 0:
@@ -57,44 +158,32 @@ class BaseParam(Tempaltes):
         return abs(a - b) / max(abs(a), abs(b))
 
     def update_from_and_report_changes(self, other: "BaseParam",diff_mode=False):
-        attributes = ['wert', 'size', 'st_x', 'st_y']   ## only these attributes are updated
+        '''
+        Returns {attribute: (original values, updated values)}, for a changed number of values these are the complete
+        lists, else only the values outside the tolerance. DCMObject.update_from compares all parameters in one batch.
+        The value lists are replaced, not changed in place, so lists shared with another DCMObject keep their values.
+        DCMObject.update_parameter_and_report_changes also marks the parameter changed for its write
+        '''
         changes = {}
-
-        for attr in attributes:
-            if hasattr(self, attr) and hasattr(other, attr):
-                current_list = getattr(self, attr)
-                other_list = getattr(other, attr)
-                
-                # Ensure both lists have the same length, else there might be structural changes.
-                if len(current_list) != len(other_list):                    
-                    changes[attr] = (current_list, other_list)
-                    if diff_mode == False:
-                        setattr(self, attr, other_list)
-                    continue
-                
-                updated_list = []
-                for current_value, other_value in zip(current_list, other_list):
-                    # If the values are within the acceptable difference range, use the current value.
-                    if self._relative_difference(current_value, other_value) < 0.01 or abs(current_value - other_value) < 0.001:
-                        updated_list.append(current_value)
-                    else:  # Else, use the other's value and log the change
-                        updated_list.append(other_value)
-                        if attr not in changes:
-                            changes[attr] = ([], [])  # Initialize with empty lists
-                        changes[attr][0].append(current_value)
-                        changes[attr][1].append(other_value)
-                if diff_mode == False:
-                    setattr(self, attr, updated_list)
-
+        for change in compare_parameters([(self.name, self, other)], apply=not diff_mode):
+            changes[change.attribute] = (change.old, change.new)
         return changes
 
-
-
     def process_wert(self,arary_values):
         '''
-        Make wert into the required format
-        Consider Numpy array in future
+        Make wert into the required format, arrays of the array mode are kept as they are
         '''
+        if isinstance(arary_values, np.ndarray):
+            return arary_values
+        if profiling.active is not None:
+            start = perf_counter()
+            new_wert = self._process_wert(arary_values)
+            profiling.active.record('process_wert', perf_counter() - start, objects=len(new_wert),
+                                    type=type(self).__name__)
+            return new_wert
+        return self._process_wert(arary_values)
+
+    def _process_wert(self, arary_values):
         new_wert = []
         for x in arary_values:
             try:
@@ -105,25 +194,29 @@ class BaseParam(Tempaltes):
                 new_wert.append(x)  # add to log later
         return new_wert
     
-@dataclass 
+@add_slots
+@dataclass
 class ParamsWithWert(BaseParam):
     wert: List[Union[str, float, int]] = field(default_factory=list)
 
     def __post_init__(self):
         self.wert = self.process_wert(self.wert)
 
+@add_slots
 @dataclass
 class FESTWERT(ParamsWithWert):
     text: str = ''
     var: Optional[str] = None
-    token_string: str = 'FESTWERT '
+    token_string: ClassVar[str] = 'FESTWERT '
 
+@add_slots
 @dataclass
 class FESTWERTEBLOCK(ParamsWithWert):
     size: List[int] = field(default_factory=list)
     wert: List[float] = field(default_factory=list)
-    token_string: str = 'FESTWERTEBLOCK '
+    token_string: ClassVar[str] = 'FESTWERTEBLOCK '
 
+@add_slots
 @dataclass
 class ParamWithSTX(ParamsWithWert):
     st_x: List[Union[str, float, int]] = field(default_factory=list)
@@ -134,20 +227,41 @@ class ParamWithSTX(ParamsWithWert):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
 
+@add_slots
 @dataclass
 class KENNLINIE(ParamWithSTX):
     size:  List[int] = field(default_factory=list)
     einheit_x: str = ''
-    token_string: str = 'KENNLINIE '
+    token_string: ClassVar[str] = 'KENNLINIE '
+    cache_slots: ClassVar[tuple] = ('_grid',)   # the grid cached by evaluate
 
+    def evaluate(self, x, axis_x=None):
+        '''
+        Values of the curve at the points x (scalar or array), interpolated linearly and clamped to the ends of the axis.
+        axis_x : STUETZSTELLENVERTEILUNG or points used instead of st_x, e.g. the shared axis of a GRUPPENKENNLINIE.
+        The grid is built again when st_x or wert is replaced, not when its values are changed in place:
+        use DCMObject.get_parameter(name, writable=True) or DCMObject.mark_dirty(name) for that
+        '''
+        return evaluate_curve(self._get_grid(axis_x), x)
+
+    def _get_grid(self, axis_x=None):
+        sources = (self.st_x if axis_x is None else getattr(axis_x, 'st_x', axis_x), self.wert)
+        grid = getattr(self, '_grid', None)
+        if grid is None or not grid.built_from(sources):
+            grid = self._grid = curve_grid(sources, *sources)
+        return grid
+
+@add_slots
 @dataclass
 class FESTKENNLINIE(KENNLINIE):
-    token_string: str = 'FESTKENNLINIE '
+    token_string: ClassVar[str] = 'FESTKENNLINIE '
 
+@add_slots
 @dataclass
 class GRUPPENKENNLINIE(KENNLINIE):
-    token_string: str = 'GRUPPENKENNLINIE '
+    token_string: ClassVar[str] = 'GRUPPENKENNLINIE '
 
+@add_slots
 @dataclass
 class KENNFELD(ParamWithSTX):
     size : List[int] = field(default_factory=list)
@@ -155,23 +269,45 @@ class KENNFELD(ParamWithSTX):
     einheit_y: str = ''
     st_y: List[Union[str, float, int]] = field(default_factory=list)
     wert: List[Union[str, float, int]] = field(default_factory=lambda: [[0.]])
-    token_string: str = 'KENNFELD '
+    token_string: ClassVar[str] = 'KENNFELD '
     zipped_y_wert: List[tuple] = field(init=False)  # Add this line
+    cache_slots: ClassVar[tuple] = ('_grid',)   # the grid cached by evaluate
     
     def __post_init__(self):
         self.st_y = self.process_wert(self.st_y)
 
+    def evaluate(self, x, y, axis_x=None, axis_y=None):
+        '''
+        Values of the map at the points (x, y) (scalars or arrays of the same shape), bilinear interpolation,
+        points outside the axes are clamped to their ends.
+        axis_x, axis_y : STUETZSTELLENVERTEILUNG or points used instead of st_x / st_y, e.g. for a GRUPPENKENNFELD.
+        As for KENNLINIE.evaluate, the grid follows replaced but not in place changed st_x, st_y and wert
+        '''
+        return evaluate_map(self._get_grid(axis_x, axis_y), x, y)
+
+    def _get_grid(self, axis_x=None, axis_y=None):
+        sources = (self.st_x if axis_x is None else getattr(axis_x, 'st_x', axis_x),
+                   self.st_y if axis_y is None else getattr(axis_y, 'st_x', axis_y),
+                   self.wert)
+        grid = getattr(self, '_grid', None)
+        if grid is None or not grid.built_from(sources):
+            grid = self._grid = map_grid(sources, *sources)
+        return grid
+
+@add_slots
 @dataclass
 class FESTKENNFELD(KENNFELD):
-    token_string: str = 'FESTKENNFELD '
+    token_string: ClassVar[str] = 'FESTKENNFELD '
 
+@add_slots
 @dataclass
 class GRUPPENKENNFELD(KENNFELD):
-    token_string: str = 'GRUPPENKENNFELD '
+    token_string: ClassVar[str] = 'GRUPPENKENNFELD '
 
+@add_slots
 @dataclass
 class STUETZSTELLENVERTEILUNG(BaseParam):
     size:  List[int] = field(default_factory=list)
     einheit_x: str = ''
     st_x: List[float] = field(default_factory=list)
-    token_string: str = 'STUETZSTELLENVERTEILUNG '
+    token_string: ClassVar[str] = 'STUETZSTELLENVERTEILUNG '
@@ -0,0 +1,67 @@
+'''
+Parsing of many DCM files in a process pool
+'''
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Optional
+import os
+import pickle
+import time
+from .parse_dcm import DCMParser
+from .dcm_object import DCMObject
+from .serialization import pack_dcm_object, unpack_dcm_object
+
+
+@dataclass
+class ParseResult:
+    path: str
+    dcm_object: Optional[DCMObject] = None
+    error: Optional[BaseException] = None
+    elapsed: float = 0.
+
+    @property
+    def ok(self):
+        return self.error is None
+
+
+def _picklable_error(error):
+    try:
+        pickle.dumps(error)
+        return error
+    except Exception:
+        return RuntimeError(f'{type(error).__name__}: {error}')
+
+
+def _parse_packed(path, parser_options):
+    ## runs in the worker, the result goes back in the compact form
+    start = time.perf_counter()
+    try:
+        packed = pack_dcm_object(DCMParser(path, **parser_options).create_dcm_object())
+        return packed, None, time.perf_counter() - start
+    except Exception as e:
+        return None, _picklable_error(e), time.perf_counter() - start
+
+
+def parse_many(paths, workers=None, **parser_options):
+    '''
+    Parses the files in a process pool and returns one ParseResult per path, in the order of paths.
+    A file which fails to parse gives a ParseResult with error set, the others are still parsed.
+    workers : number of processes, default os.cpu_count(), 1 parses in this process
+    parser_options : passed to DCMParser, e.g. array_mode=True
+    '''
+    paths = [os.fspath(path) for path in paths]
+    workers = min(workers or os.cpu_count() or 1, max(len(paths), 1))
+    if workers <= 1:
+        outcomes = (_parse_packed(path, parser_options) for path in paths)
+        return [_to_result(path, outcome) for path, outcome in zip(paths, outcomes)]
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        outcomes = pool.map(_parse_packed, paths, [parser_options] * len(paths))
+        return [_to_result(path, outcome) for path, outcome in zip(paths, outcomes)]
+
+
+def _to_result(path, outcome):
+    packed, error, elapsed = outcome
+    if error is not None:
+        return ParseResult(path, error=error, elapsed=elapsed)
+    return ParseResult(path, dcm_object=unpack_dcm_object(packed), elapsed=elapsed)
@@ -0,0 +1,193 @@
+'''
+Binary form of a DCMObject for the hand-off between pipeline stages.
+
+    header    b'DCMB', format version, metadata length, offset of the numeric region   (little endian)
+    metadata  JSON: comments, format spec, functions, string table and one record per parameter,
+              text fields are indices into the string table, numeric values [offset, count(, shape)]
+              into the numeric region
+    numeric   wert / st_x / st_y of all parameters as one contiguous float64 region, 8 byte aligned
+
+read_binary memory maps the file, the numeric values are numpy views into the mapping and are not copied
+'''
+import json
+import math
+import mmap
+import struct
+import numpy as np
+from .attribute_classes import FUNKTIONEN
+from .dcm_object import DCMObject
+from .lazy_param import LazyParam
+from .serialization import packed_fields, unpack_param
+from .utils import gc_paused
+
+magic = b'DCMB'
+format_version = 1
+header_struct = struct.Struct('<4sIQQ')
+numeric_attrs = ('wert', 'st_x', 'st_y')
+value_dtype = np.dtype('<f8')
+## positions of the numeric fields and of wert / size in the packed fields of each class
+numeric_indices = {type_name: frozenset(index for index, name in enumerate(names) if name in numeric_attrs)
+                   for type_name, names in packed_fields.items()}
+wert_size_indices = {type_name: (names.index('wert'), names.index('size'))
+                     for type_name, names in packed_fields.items() if 'wert' in names and 'size' in names}
+
+
+class BinaryFormatError(ValueError):
+    pass
+
+
+class _StringTable:
+    def __init__(self):
+        self.strings = []
+        self.index = {}
+
+    def add(self, value):
+        if value not in self.index:
+            self.index[value] = len(self.strings)
+            self.strings.append(value)
+        return self.index[value]
+
+
+def _numeric_record(values, regions, offset):
+    ## returns the record of the values and the new offset in the numeric region, values which are no numbers stay in the metadata
+    try:
+        region = np.asarray(values, dtype=value_dtype).ravel()
+    except (ValueError, TypeError):
+        return {'v': list(values)}, offset
+    regions.append(region)
+    if isinstance(values, np.ndarray):
+        return [offset, len(region), list(values.shape)], offset + len(region)
+    return [offset, len(region)], offset + len(region)
+
+
+def _field_record(value, strings):
+    ## text fields become indices into the string table, lists and None are kept, other values are wrapped
+    if isinstance(value, str):
+        return strings.add(value)
+    if value is None or isinstance(value, list):
+        return value
+    return {'v': value}
+
+
+def write_binary(dcm_obj, fileobj):
+    '''
+    Writes dcm_obj into a binary file like object or a path
+    '''
+    if not hasattr(fileobj, 'write'):
+        with open(fileobj, 'wb') as f:
+            return write_binary(dcm_obj, f)
+
+    strings = _StringTable()
+    regions = []
+    offset = 0
+    params = {}
+    for attr in dcm_obj._param_attributes:
+        params[attr] = []
+        for param in getattr(dcm_obj, attr):
+            if isinstance(param, LazyParam):
+                param = param.materialize()
+            type_name = type(param).__name__
+            record = [type_name]
+            for name in packed_fields[type_name]:
+                value = getattr(param, name)
+                if name in numeric_attrs:
+                    value, offset = _numeric_record(value, regions, offset)
+                else:
+                    value = _field_record(value, strings)
+                record.append(value)
+            params[attr].append(record)
+
+    metadata = json.dumps({
+        'file_path': dcm_obj.filePath,
+        'comments': dcm_obj.comments,
+        'format_spec_version': dcm_obj.format_spec_version,
+        'functions': [[func.function, func.version, func.description] for func in dcm_obj.functions],
+        'strings': strings.strings,
+        'params': params,
+    }, separators=(',', ':')).encode('utf-8')
+    data_offset = header_struct.size + len(metadata)
+    padding = -data_offset % value_dtype.itemsize
+    fileobj.write(header_struct.pack(magic, format_version, len(metadata), data_offset + padding))
+    fileobj.write(metadata)
+    fileobj.write(b'\0' * padding)
+    for region in regions:
+        fileobj.write(memoryview(region).cast('B'))
+
+
+def read_binary(path, array_mode=True):
+    '''
+    Loads a DCMObject written by write_binary.
+    array_mode : numeric values are float64 arrays backed by the memory mapped file (copy on write, changes
+                 are not written back), False gives the lists of the text parser
+    '''
+    with open(path, 'rb') as f:
+        header = f.read(header_struct.size)
+        if len(header) < header_struct.size:
+            raise BinaryFormatError(f'{path} is no binary DCM file')
+        file_magic, version, metadata_length, data_offset = header_struct.unpack(header)
+        if file_magic != magic:
+            raise BinaryFormatError(f'{path} is no binary DCM file')
+        if version != format_version:
+            raise BinaryFormatError(f'{path} has format version {version}, supported is {format_version}')
+        with gc_paused():
+            metadata = json.loads(f.read(metadata_length).decode('utf-8'))
+        ## an empty file can not be mapped, the data offset is only past the end without numeric values
+        numeric = np.empty(0, dtype=value_dtype)
+        file_size = f.seek(0, 2)
+        if file_size > data_offset:
+            mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+            numeric = np.frombuffer(mapping, dtype=value_dtype, offset=data_offset,
+                                    count=(file_size - data_offset) // value_dtype.itemsize)
+
+    with gc_paused():
+        return _make_dcm_object(metadata, numeric, array_mode)
+
+
+def _load_numeric(record, numeric, array_mode):
+    if isinstance(record, dict):
+        return record['v']
+    offset, count, *shape = record
+    if not count:
+        return np.empty(shape[0], dtype=value_dtype) if shape else []
+    values = numeric[offset:offset + count]
+    if not array_mode:
+        ## same int / float values as BaseParam.process_wert gives the text parser
+        return [int(value) if value.is_integer() else value for value in values.tolist()]
+    if shape:
+        return values.reshape(shape[0])
+    return values
+
+
+def _shape_by_size(values, size):
+    ## wert read from a list keeps the shape the array mode of DCMParser gives it
+    shape = [int(x) for x in reversed(size)] if size else None
+    if isinstance(values, np.ndarray) and values.ndim == 1 and shape and values.size == math.prod(shape):
+        return values.reshape(shape)
+    return values
+
+
+def _make_dcm_object(metadata, numeric, array_mode):
+    strings = metadata['strings']
+    params = {}
+    for attr, records in metadata['params'].items():
+        params[attr] = []
+        for type_name, *values in records:
+            for index, value in enumerate(values):
+                if index in numeric_indices[type_name]:
+                    values[index] = _load_numeric(value, numeric, array_mode)
+                elif type(value) is int:
+                    values[index] = strings[value]
+                elif type(value) is dict:
+                    values[index] = value['v']
+            if array_mode and type_name in wert_size_indices:
+                wert_index, size_index = wert_size_indices[type_name]
+                values[wert_index] = _shape_by_size(values[wert_index], values[size_index])
+            params[attr].append(unpack_param((type_name, values)))
+
+    return DCMObject(
+        filePath = metadata['file_path'],
+        comments = metadata['comments'],
+        format_spec_version = metadata['format_spec_version'],
+        functions = [FUNKTIONEN(*func) for func in metadata['functions']],
+        **params
+    )
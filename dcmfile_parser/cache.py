@@ -0,0 +1,132 @@
+'''
+On disk cache of parsed DCM files. An entry is the library version, field layout and content hash followed by the
+packed DCMObject (see serialization.py), pickled into one file.
+Entries are keyed by path, size, mtime, parser options, library version and the hash of the packed field layout.
+The stored content hash is checked on every hit
+'''
+import hashlib
+import os
+import pickle
+import tempfile
+from .serialization import layout_hash, pack_dcm_object, unpack_dcm_object
+from .utils import gc_paused
+from .version import __version__
+
+entry_suffix = '.dcmcache'
+## entries of another version or field layout are not used
+entry_format = (__version__, layout_hash)
+
+
+def default_cache_dir():
+    return os.environ.get('DCMFILE_PARSER_CACHE') or os.path.join(os.path.expanduser('~'), '.cache', 'dcmfile_parser')
+
+
+def content_hash(path, chunk_size=1 << 20):
+    digest = hashlib.blake2b(digest_size=20)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ParseCache:
+    '''
+    cache_dir : directory of the entries, default $DCMFILE_PARSER_CACHE or ~/.cache/dcmfile_parser
+    max_bytes : the least recently used entries are removed when the entries together are larger
+    Several processes can share a directory, entries are written to a temporary file and renamed into place
+    '''
+    def __init__(self, cache_dir=None, max_bytes=1 << 30):
+        self.cache_dir = os.fspath(cache_dir or default_cache_dir())
+        self.max_bytes = max_bytes
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def key(self, path, parser_options=()):
+        stat = os.stat(path)
+        key_data = repr((os.path.abspath(path), stat.st_size, stat.st_mtime_ns, sorted(dict(parser_options).items()),
+                         entry_format))
+        return hashlib.blake2b(key_data.encode(), digest_size=20).hexdigest()
+
+    def entry_path(self, key):
+        return os.path.join(self.cache_dir, key + entry_suffix)
+
+    def load(self, key, digest):
+        '''
+        Returns the cached DCMObject, None if there is no valid entry for key and content hash
+        '''
+        entry_path = self.entry_path(key)
+        try:
+            with open(entry_path, 'rb') as f:
+                entry_format_stored, entry_digest = pickle.load(f)
+                if entry_format_stored != entry_format or entry_digest != digest:
+                    raise ValueError('stale entry')
+                with gc_paused():
+                    dcm_obj = unpack_dcm_object(pickle.load(f))
+        except FileNotFoundError:
+            return None
+        except Exception:   # stale, truncated or from an incompatible version
+            self._remove(entry_path)
+            return None
+        try:
+            os.utime(entry_path)   # access time for the eviction
+        except OSError:
+            pass
+        return dcm_obj
+
+    def store(self, key, digest, dcm_obj):
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump((entry_format, digest), f, protocol=pickle.HIGHEST_PROTOCOL)
+                pickle.dump(pack_dcm_object(dcm_obj), f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self.entry_path(key))
+        except BaseException:
+            self._remove(tmp_path)
+            raise
+        self.evict()
+
+    def create_dcm_object(self, parser):
+        '''
+        DCMParser.create_dcm_object through the cache
+        '''
+        key = self.key(parser.file, parser.cache_options())
+        digest = content_hash(parser.file)
+        dcm_obj = self.load(key, digest)
+        if dcm_obj is None:
+            dcm_obj = parser.parse_dcm_object()
+            self.store(key, digest, dcm_obj)
+        return dcm_obj
+
+    def entries(self):
+        '''
+        (modification time, size, path) of all entries, least recently used first
+        '''
+        entries = []
+        for entry in os.scandir(self.cache_dir):
+            if entry.name.endswith(entry_suffix):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:   # removed by another process
+                    continue
+                entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+        entries.sort()
+        return entries
+
+    def evict(self):
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        for _, size, entry_path in entries:
+            if total <= self.max_bytes:
+                break
+            self._remove(entry_path)
+            total -= size
+
+    def clear(self):
+        for _, _, entry_path in self.entries():
+            self._remove(entry_path)
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,261 @@
+'''
+Command line tool for the batch processing of DCM files: validate, diff, merge and normalise.
+The inputs are paths, glob patterns or manifest files, the files are processed in a process pool (--jobs) and a
+JSON summary with the time of every file is printed or written to --summary
+'''
+from concurrent.futures import ProcessPoolExecutor
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+from .batch import parse_many
+from .diff_matrix import diff_matrix, status_names, changed, structural, missing
+from .merge import merge_layers, MergePolicy, conflict_actions
+from .parse_dcm import DCMParser
+from .version import __version__
+
+compressed_suffixes = ('.gz', '.xz', '.bz2')
+
+
+class InputError(ValueError):
+    pass
+
+
+def read_manifest(path):
+    '''
+    Paths and glob patterns of a manifest file, one per line, relative to the directory of the manifest.
+    Empty lines and lines starting with # are skipped
+    '''
+    directory = os.path.dirname(path)
+    with open(path, 'r') as f:
+        lines = [line.strip() for line in f]
+    return [os.path.join(directory, line) for line in lines if line and not line.startswith('#')]
+
+
+def expand_inputs(patterns, manifests=()):
+    '''
+    Paths of the patterns and manifests in the given order, a glob pattern is expanded sorted, a path is
+    taken as it is (a missing file is reported by the command). A pattern which matches nothing raises InputError
+    '''
+    patterns = list(patterns)
+    for manifest in manifests:
+        patterns += read_manifest(manifest)
+    paths = []
+    for pattern in patterns:
+        if not glob.has_magic(pattern):
+            paths.append(pattern)
+            continue
+        matches = sorted(glob.glob(pattern, recursive=True))
+        if not matches:
+            raise InputError(f'No files match {pattern}')
+        paths += matches
+    if not paths:
+        raise InputError('No input files')
+    return paths
+
+
+def run_pool(task, items, jobs, *args):
+    ## task(item, *args) for every item, in a process pool of jobs processes (default os.cpu_count()), in order
+    jobs = min(jobs or os.cpu_count() or 1, max(len(items), 1))
+    if jobs <= 1:
+        return [task(item, *args) for item in items]
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        return list(pool.map(task, items, *[[arg] * len(items) for arg in args]))
+
+
+def _error_text(error):
+    return f'{type(error).__name__}: {error}'
+
+
+def _parameter_count(dcm_obj):
+    return len(dcm_obj._param_name_dict)
+
+
+def _validate_file(path, parser_options):
+    ## runs in a worker, only the record goes back
+    start = time.perf_counter()
+    record = {'path': path, 'ok': True, 'error': None}
+    try:
+        dcm_obj = DCMParser(path, **parser_options).create_dcm_object()
+        record['parameters'] = _parameter_count(dcm_obj)
+        record['functions'] = len(dcm_obj.functions)
+    except Exception as e:
+        record.update(ok=False, error=_error_text(e))
+    record['elapsed'] = time.perf_counter() - start
+    return record
+
+
+def normalised_path(path, output_dir):
+    '''
+    Path of the normalised file of path in output_dir (None: in place), the suffix of a compressed file is removed
+    '''
+    if output_dir is None:
+        return path
+    name = os.path.basename(path)
+    root, suffix = os.path.splitext(name)
+    if suffix in compressed_suffixes:
+        name = root
+    return os.path.join(output_dir, name)
+
+
+def _normalise_file(path, output_dir, parser_options):
+    ## runs in a worker: parse and render the whole file again
+    start = time.perf_counter()
+    target = normalised_path(path, output_dir)
+    record = {'path': path, 'output': target, 'ok': True, 'error': None}
+    try:
+        dcm_obj = DCMParser(path, **parser_options).create_dcm_object()
+        record['parameters'] = _parameter_count(dcm_obj)
+        dcm_obj.write(target, preserve_source=False)
+    except Exception as e:
+        record.update(ok=False, error=_error_text(e))
+    record['elapsed'] = time.perf_counter() - start
+    return record
+
+
+def command_validate(args, parser_options):
+    files = run_pool(_validate_file, expand_inputs(args.inputs, args.manifest), args.jobs, parser_options)
+    return {'files': files}
+
+
+def command_normalise(args, parser_options):
+    paths = expand_inputs(args.inputs, args.manifest)
+    if args.output_dir is None and not args.in_place:
+        raise InputError('normalise needs --output-dir or --in-place')
+    if args.output_dir is not None:
+        os.makedirs(args.output_dir, exist_ok=True)
+        targets = [normalised_path(path, args.output_dir) for path in paths]
+        if len(set(targets)) != len(targets):
+            raise InputError('Several inputs have the same file name, they would overwrite each other in --output-dir')
+    elif any(os.path.splitext(path)[1] in compressed_suffixes for path in paths):
+        raise InputError('Compressed files can not be normalised in place, use --output-dir')
+    return {'files': run_pool(_normalise_file, paths, args.jobs, args.output_dir, parser_options)}
+
+
+def command_diff(args, parser_options):
+    variants = expand_inputs(args.inputs, args.manifest)
+    try:
+        baseline = DCMParser(args.baseline, **parser_options).create_dcm_object()
+    except OSError:
+        raise
+    except Exception as e:
+        return {'baseline': args.baseline, 'error': _error_text(e), 'files': []}
+    matrix = diff_matrix(baseline, variants, workers=args.jobs, **parser_options)
+    files = []
+    for column, path in enumerate(matrix.variants):
+        error = matrix.errors[column]
+        record = {'path': path, 'ok': error is None, 'error': None if error is None else _error_text(error),
+                  'elapsed': matrix.elapsed[column]}
+        if error is None:
+            status = matrix.status[:, column]
+            record.update({status_names[code]: int((status == code).sum()) for code in (changed, structural, missing)})
+            record['added'] = len(matrix.added_names[column])
+            if args.labels:
+                record['labels'] = {status_names[code]: [matrix.labels[index]
+                                                         for index in (status == code).nonzero()[0]]
+                                    for code in (changed, structural, missing)}
+                record['labels']['added'] = matrix.added_names[column]
+        files.append(record)
+    return {'baseline': args.baseline, 'labels': len(matrix.labels), 'files': files}
+
+
+def command_merge(args, parser_options):
+    paths = expand_inputs(args.inputs, args.manifest)
+    policy = MergePolicy(add_new=not args.no_add_new, delete_missing=args.delete_missing,
+                         delete_names=args.delete or [], on_type_conflict=args.on_type_conflict)
+    ## the layers are parsed in parallel, then merged and written in this process
+    results = parse_many(paths, workers=args.jobs, **parser_options)
+    files = [{'path': result.path, 'ok': result.ok, 'error': None if result.ok else _error_text(result.error),
+              'elapsed': result.elapsed} for result in results]
+    summary = {'output': args.output, 'files': files}
+    if not all(result.ok for result in results):
+        return summary
+
+    start = time.perf_counter()
+    try:
+        merged = merge_layers([result.dcm_object for result in results], policy)
+        merged.dcm_object.write(args.output)
+    except Exception as e:   # a MergeConflictError or a layer which can not be merged or written
+        summary['error'] = _error_text(e)
+        return summary
+    counts = [0] * len(paths)
+    for layer_index in merged.provenance.values():
+        counts[layer_index] += 1
+    for record, count in zip(files, counts):
+        record['labels_taken'] = count
+    summary.update(parameters=len(merged.provenance), deleted=merged.deleted_names,
+                   merge_elapsed=time.perf_counter() - start)
+    return summary
+
+
+def build_argument_parser():
+    parser = argparse.ArgumentParser(prog='dcmfile-parser', description='Batch processing of DCM files')
+    parser.add_argument('--version', action='version', version=__version__)
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('-j', '--jobs', type=int, default=None,
+                        help='number of worker processes, default the number of CPUs, 1 runs in this process')
+    common.add_argument('--manifest', action='append', default=[],
+                        help='file with one path or glob pattern per line, relative to the manifest')
+    common.add_argument('--summary', help='write the JSON summary to this file instead of stdout')
+    common.add_argument('--array-mode', action='store_true', help='parse with DCMParser(array_mode=True)')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    validate = commands.add_parser('validate', parents=[common], help='parse the files and report the errors')
+    validate.add_argument('inputs', nargs='*', help='paths or glob patterns')
+    validate.set_defaults(run=command_validate)
+
+    diff = commands.add_parser('diff', parents=[common], help='compare variants with a baseline')
+    diff.add_argument('baseline')
+    diff.add_argument('inputs', nargs='*', help='paths or glob patterns of the variants')
+    diff.add_argument('--labels', action='store_true', help='list the changed, structural, missing and added labels')
+    diff.set_defaults(run=command_diff)
+
+    merge = commands.add_parser('merge', parents=[common],
+                                help='merge a base with overlays, later inputs have higher priority')
+    merge.add_argument('inputs', nargs='*', help='the base, then the overlays in increasing priority')
+    merge.add_argument('-o', '--output', required=True, help='path of the merged file')
+    merge.add_argument('--no-add-new', action='store_true', help='labels which are only in an overlay are not added')
+    merge.add_argument('--delete-missing', action='store_true', help='labels missing in an overlay are removed')
+    merge.add_argument('--delete', action='append', metavar='NAME', help='label removed from the result')
+    merge.add_argument('--on-type-conflict', choices=conflict_actions, default='override')
+    merge.set_defaults(run=command_merge)
+
+    normalise = commands.add_parser('normalise', aliases=['rewrite'], parents=[common],
+                                    help='parse the files and write them again in the format of DCMObject.write')
+    normalise.add_argument('inputs', nargs='*', help='paths or glob patterns')
+    target = normalise.add_mutually_exclusive_group()
+    target.add_argument('--output-dir', help='directory of the written files, named as the inputs')
+    target.add_argument('--in-place', action='store_true', help='overwrite the input files')
+    normalise.set_defaults(run=command_normalise)
+    return parser
+
+
+def main(argv=None):
+    '''
+    Runs the command of argv (default sys.argv[1:]) and returns the exit code:
+    0 if every file was processed, 1 if a file, the diff baseline or the merge failed (the summary has the error),
+    2 for invalid arguments or inputs
+    '''
+    parser = build_argument_parser()
+    args = parser.parse_args(argv)
+    if args.jobs is not None and args.jobs < 1:
+        parser.error('--jobs must be at least 1')
+    parser_options = {'array_mode': True} if args.array_mode else {}
+    start = time.perf_counter()
+    try:
+        summary = args.run(args, parser_options)
+    except (InputError, OSError) as e:
+        parser.error(str(e))
+    failed = sum(not record['ok'] for record in summary['files'])
+    summary = {'command': args.command, 'version': __version__, 'jobs': args.jobs or os.cpu_count() or 1,
+               'elapsed': time.perf_counter() - start, 'processed': len(summary['files']), 'failed': failed,
+               **summary}
+    text = json.dumps(summary, indent=2)
+    if args.summary:
+        with open(args.summary, 'w') as f:
+            f.write(text + '\n')
+    else:
+        sys.stdout.write(text + '\n')
+    return 1 if failed or summary.get('error') else 0
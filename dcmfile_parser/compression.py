@@ -0,0 +1,109 @@
+'''
+Compressed and streamed input of DCMParser. The format is detected from the magic bytes, the content is
+decompressed incrementally while the parser reads its lines, it is never held compressed and decompressed at once
+'''
+from contextlib import contextmanager, ExitStack
+import bz2
+import gzip
+import io
+import lzma
+
+magic_numbers = {
+    b'\x1f\x8b': 'gzip',
+    b'\xfd7zXZ\x00': 'xz',
+    b'BZh': 'bz2',
+}
+magic_size = max(map(len, magic_numbers))
+decompressors = {
+    'gzip': lambda fileobj: gzip.GzipFile(fileobj=fileobj, mode='rb'),
+    'xz': lambda fileobj: lzma.LZMAFile(fileobj, mode='rb'),
+    'bz2': lambda fileobj: bz2.BZ2File(fileobj, mode='rb'),
+}
+read_buffer_size = 1 << 16
+
+
+def is_stream(source):
+    return hasattr(source, 'read')
+
+
+def detect_compression(header):
+    '''
+    'gzip', 'xz', 'bz2' or None for the first bytes of a file
+    '''
+    for magic, compression in magic_numbers.items():
+        if header.startswith(magic):
+            return compression
+    return None
+
+
+def compression_of_file(path):
+    with open(path, 'rb') as f:
+        return detect_compression(f.read(magic_size))
+
+
+class _PrefixedReader(io.RawIOBase):
+    ## the bytes read from a stream to detect its format, followed by the rest of the stream
+    def __init__(self, prefix, stream):
+        self.prefix = prefix
+        self.stream = stream
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        if self.prefix:
+            size = min(len(buffer), len(self.prefix))
+            buffer[:size] = self.prefix[:size]
+            self.prefix = self.prefix[size:]
+            return size
+        data = self.stream.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+
+def _peek_stream(stream):
+    ## returns (header, stream to read from the start), without reading more than the magic from the source
+    if hasattr(stream, 'peek'):
+        return stream.peek(magic_size)[:magic_size], stream
+    header = b''
+    while len(header) < magic_size:
+        data = stream.read(magic_size - len(header))
+        if not data:
+            break
+        header += data
+    if isinstance(header, str):
+        raise TypeError('DCMParser needs a binary stream, open the file with "rb"')
+    return header, io.BufferedReader(_PrefixedReader(header, stream), read_buffer_size)
+
+
+@contextmanager
+def open_binary(source):
+    '''
+    Binary file object with the decompressed content of a path or a binary stream.
+    Only what is opened here is closed afterwards, a stream passed in stays open
+    '''
+    with ExitStack() as stack:
+        if is_stream(source):
+            header, raw = _peek_stream(source)
+        else:
+            raw = stack.enter_context(open(source, 'rb', buffering=read_buffer_size))
+            header = raw.peek(magic_size)[:magic_size]
+        compression = detect_compression(header)
+        if compression is None:
+            yield raw
+        else:
+            yield stack.enter_context(decompressors[compression](raw))
+
+
+@contextmanager
+def open_text(source, encoding='ISO-8859-1'):
+    '''
+    Text file object over open_binary, newlines are translated as by open()
+    '''
+    with open_binary(source) as binary:
+        text = io.TextIOWrapper(binary, encoding=encoding)
+        try:
+            yield text
+        finally:
+            ## the wrapper would close the binary file object, which may be the stream of the caller
+            text.detach()
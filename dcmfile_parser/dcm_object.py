@@ -1,8 +1,16 @@
 from dataclasses import dataclass
 from typing import List, Union, Optional
 from .attribute_classes import FUNKTIONEN, FESTWERT, FESTWERTEBLOCK, KENNLINIE, FESTKENNLINIE, GRUPPENKENNLINIE
-from .attribute_classes import KENNFELD,FESTKENNFELD, GRUPPENKENNFELD, STUETZSTELLENVERTEILUNG 
-from copy import deepcopy
+from .attribute_classes import KENNFELD,FESTKENNFELD, GRUPPENKENNFELD, STUETZSTELLENVERTEILUNG, BaseParam
+from copy import copy, deepcopy
+from .diff_engine import ChangeSet, compare_parameters
+from .query import ParamIndex
+from .param_store import ParamStore
+from .lazy_param import LazyParam
+from .source_map import replacing, write_pieces
+import io
+import os
+from time import perf_counter
 
 
 @dataclass
@@ -27,92 +35,255 @@ class DCMObject():
                         'characteristic_map', 'characteristic_map_fixed','characteristic_map_group',
                         'distribution']
         self._param_name_dict = {}
+        self._index = None   # ParamIndex, built by the first query
+        self._unindexed_names = set()   # names handed out writable or marked dirty, indexed again by the next query
+        self._owned_names = None   # names whose parameter objects are not shared with another DCMObject, None for all
+        self._source = None   # SourceMap of the parsed file, set by DCMParser(keep_source=True)
+        self._dirty_names = set()   # names changed in place since the parse, their blocks are rendered by write
+        self.stats = None   # ParseStats of DCMParser(stats=...), records the render and write phases
         for attr in self._param_attributes:
-            items = getattr(self, attr, [])
+            items = self._store(attr)
             for item in items:
                 if hasattr(item, "name"):
                     self._param_name_dict[item.name] = (item, attr)
-        self.sort_parameters_by_name()
+
+    def _store(self, attr):
+        ## the parameters of a type are kept in a ParamStore, a list assigned to the attribute is converted
+        items = getattr(self, attr, None)
+        if not isinstance(items, ParamStore):
+            items = ParamStore(items or [])
+            setattr(self, attr, items)
+        return items
+
+    ## Sharing between DCMObjects (fork, add_new_parameters_from, merge_layers, DCMParser.reparse): every object
+    ## gets its own parameter objects, made by share_parameter, which hold the same value lists. Assigning an
+    ## attribute of a parameter (p.langname = ..., p.wert = [...], BaseParam.update_from_and_report_changes,
+    ## update_from, set_parameter_attribute) therefore changes only one object. Value lists changed in place
+    ## (p.wert[0] = x) are protected only when the parameter was taken with get_parameter(name, writable=True),
+    ## which copies the shared lists first. _owned_names holds the names whose lists are not shared
+
+    def _is_shared(self, name):
+        return self._owned_names is not None and name not in self._owned_names
+
+    def _mark_shared(self, names):
+        if self._owned_names is None:
+            self._owned_names = set(self._param_name_dict)
+        self._owned_names.difference_update(names)
+
+    def _replace_parameter(self, name, item):
+        _, attr_name = self._param_name_dict[name]
+        self._store(attr_name).add(item)
+        self._param_name_dict[name] = (item, attr_name)
+        if self._index is not None:
+            self._index.add(name, item)
+
+    def get_parameter(self, name, writable=False):
+        '''
+        The parameter of name. writable : the value lists of a parameter shared with another DCMObject (fork,
+        add_new_parameters_from, merge_layers) are copied first, so they can be changed in place
+        without changing the other objects
+        '''
+        if writable:
+            self._dirty_names.add(name)
+            self._unindexed_names.add(name)
+            return _without_grid(self._unshare(name))
+        return self._param_name_dict[name][0]
+
+    def mark_dirty(self, name):
+        '''
+        Marks a parameter changed in place without get_parameter(name, writable=True), write renders its block
+        '''
+        if name not in self._param_name_dict:
+            raise KeyError(name)
+        self._dirty_names.add(name)
+        self._unindexed_names.add(name)
+        _without_grid(self._param_name_dict[name][0])
+
+    def set_parameter_attribute(self, name, attr, value):
+        '''
+        setattr on the parameter of name, which write renders and the query indexes follow
+        '''
+        self._dirty_names.add(name)
+        item = self._param_name_dict[name][0]
+        setattr(item, attr, value)
+        if self._index is not None:
+            self._index.add(name, item)
+
+    def _unshare(self, name):
+        ## the parameter of name with value lists of its own
+        item, _ = self._param_name_dict[name]
+        if not self._is_shared(name):
+            return item
+        if isinstance(item, LazyParam):
+            item = item.materialize()
+        item = deepcopy(item)
+        self._replace_parameter(name, item)
+        self._owned_names.add(name)
+        return item
+
+    def _writable_for_update(self, name, current_param):
+        ## update_from replaces value lists instead of changing them in place, a shared parameter needs no copy
+        self._dirty_names.add(name)
+        return current_param
+
+    def fork(self):
+        '''
+        A new DCMObject whose parameters share the value lists with this one, see share_parameter.
+        Costs one small parameter object per name instead of a copy of the values
+        '''
+        forked = DCMObject(
+            filePath = self.filePath,
+            comments = self.comments,
+            format_spec_version = self.format_spec_version,
+            functions = list(self.functions),
+            **{attr: [] for attr in self._param_attributes}
+        )
+        for attr in self._param_attributes:
+            setattr(forked, attr, self._store(attr).fork(share_parameter))
+        forked._param_name_dict = {name: (getattr(forked, attr).get(name), attr)
+                                   for name, (_, attr) in self._param_name_dict.items()}
+        self._owned_names = set()
+        forked._owned_names = set()
+        forked._source = self._source
+        forked._dirty_names = set(self._dirty_names)
+        forked.stats = self.stats
+        return forked
 
     def sort_parameters_by_name(self):
-        """Sorts all parameter lists alphabetically by name."""
+        """Sorts all parameter lists alphabetically by name, the ParamStores always are."""
         for attr in self._param_attributes:
-            items = getattr(self, attr, [])
-            items.sort(key=lambda item: getattr(item, "name", ""))
+            self._store(attr)
 
 
     def remove_parameter_by_name(self, name):
         if name in self._param_name_dict:
             item, attr_name = self._param_name_dict[name]
             
-            # Remove the item from the appropriate list
-            attr_list = getattr(self, attr_name)
-            attr_list.remove(item)
+            # Remove the item from the store of its type, if it is still the one under this name
+            store = self._store(attr_name)
+            if store.get(name) is item:
+                store.pop(name)
 
             # Delete the entry from the dictionary
             del self._param_name_dict[name]
+            if self._index is not None:
+                self._index.remove(name)
+            if self._owned_names is not None:
+                self._owned_names.discard(name)
             return True
         else:
             return False
 
     def __str__(self):
-        str_repr = [
-            f"{self.comments}\n"
-            f"\nKONSERVIERUNG_FORMAT {self.format_spec_version}\n"
-        ] 
+        return self.to_string()
+
+    def to_string(self, backend='compiled'):
+        '''
+        backend : 'compiled' emitter functions or 'jinja2' templates, see BaseParam.render
+        '''
+        return "\n".join(self.iter_blocks(backend))
+
+    def iter_blocks(self, backend='compiled'):
+        '''
+        Yields the rendered header, FUNKTIONEN and parameter blocks one by one, joined by newlines they give the file content
+        '''
+        yield (f"{self.comments}\n"
+               f"\nKONSERVIERUNG_FORMAT {self.format_spec_version}\n")
         if len (self.functions)>0:
-            str_repr += ['FUNKTIONEN']
-            str_repr += [str(func)  for func in self.functions]        
-            str_repr += ['END\n']
-        str_repr += [str(param) + '\n' for param in self.parameters]
-        str_repr += [str(block) + '\n' for block in self.parameter_block]
-        str_repr += [str(curve) + '\n' for curve in self.characteristic_curve]
-        str_repr += [str(curve) + '\n'  for curve in self.characteristic_curve_fixed]
-        str_repr += [str(curve) + '\n'  for curve in self.characteristic_curve_group]
-        str_repr += [str(map) + '\n'  for map in self.characteristic_map]
-        str_repr += [str(map) + '\n' for map in self.characteristic_map_fixed]
-        str_repr += [str(map) + '\n' for map in self.characteristic_map_group]
-        str_repr += [str(dist) + '\n' for dist in self.distribution]
-        return "\n".join(str_repr)
+            yield 'FUNKTIONEN'
+            for func in self.functions:
+                yield str(func)
+            yield 'END\n'
+        stats = self.stats
+        for attr in self._param_attributes:
+            for param in getattr(self, attr):
+                if stats is None:
+                    yield param.render(backend) + '\n'
+                    continue
+                start = perf_counter()
+                block = param.render(backend) + '\n'
+                stats.record('render', perf_counter() - start, len(block), 1, type(param).__name__)
+                yield block
+
+    def write_to(self, fileobj, backend='compiled', buffer_size=1 << 16, encoding='ISO-8859-1'):
+        '''
+        Streams the content block by block into a text or binary file like object (open files, gzip/lzma
+        files, sys.stdout, socket.makefile(...)) without building the whole string.
+        Blocks are collected until buffer_size characters are pending, binary targets get them encoded with encoding
+        '''
+        if self.stats is not None:
+            with self.stats.operation('write') as measurement:
+                measurement.bytes = self._write_blocks(fileobj, backend, buffer_size, encoding)
+            return
+        self._write_blocks(fileobj, backend, buffer_size, encoding)
+
+    def _write_blocks(self, fileobj, backend, buffer_size, encoding):
+        ## returns the number of characters written
+        binary = _is_binary_file(fileobj)
+        written = 0
+        pending = []
+        pending_size = 0
+        for index, block in enumerate(self.iter_blocks(backend)):
+            if index:
+                pending.append('\n')
+                pending_size += 1
+            pending.append(block)
+            pending_size += len(block)
+            if pending_size >= buffer_size:
+                _write_pending(fileobj, pending, binary, encoding)
+                written += pending_size
+                pending = []
+                pending_size = 0
+        _write_pending(fileobj, pending, binary, encoding)
+        return written + pending_size
 
 
     def update_from(self, other: "DCMObject",  delete_list=[], logger=None):
-        self._calc_diff_or_do_update(other,delete_list,logger,diff_mode=False)
+        '''
+        Takes over the values of other which are outside the tolerance (1% relative, 0.001 absolute) and deletes
+        the parameters missing in other or listed in delete_list. Returns the ChangeSet
+        '''
+        return self._calc_diff_or_do_update(other,delete_list,logger,diff_mode=False)
 
     def diff_report(self, other: "DCMObject",  delete_list=[], logger=None):
-        self._calc_diff_or_do_update(other,delete_list,logger,diff_mode=True)
+        return self._calc_diff_or_do_update(other,delete_list,logger,diff_mode=True)
+
+    def update_parameter_and_report_changes(self, name, other: "BaseParam", diff_mode=False):
+        '''
+        BaseParam.update_from_and_report_changes for the parameter of name, which write renders
+        '''
+        changes = {}
+        for change in compare_parameters([(name, self._param_name_dict[name][0], other)], apply=not diff_mode,
+                                         writable=self._writable_for_update):
+            changes[change.attribute] = (change.old, change.new)
+        return changes
 
 
     def _calc_diff_or_do_update(self, other: "DCMObject",  delete_list=[], logger=None, diff_mode=False):
-        updated_names = []
-        
-        # Determine the set of names from the current (self) object and the other object
-        self_names = set(self._param_name_dict.keys())
-        other_names = set(other._param_name_dict.keys())
-
-        # Find out what's common, missing or extra
-        common_names = self_names.intersection(other_names)
-        missing_names = self_names - other_names 
-
-        # Update the attributes that are common
-        for name in common_names:
-            self_param, _ = self._param_name_dict[name]
-            other_param, _ = other._param_name_dict[name]
-            if hasattr(self_param, 'update_from_and_report_changes') and hasattr(other_param, 'update_from_and_report_changes'):
-                attributes_changed = self_param.update_from_and_report_changes(other_param,diff_mode = diff_mode)
-                if attributes_changed:
-                    for attribute, (original_value, updated_value) in attributes_changed.items():
-                        if logger:
-                            logger.info(f"Name: {name}, Attribute: {attribute}, Old: {original_value}, New: {updated_value}")
-                    updated_names.append(name)
+        # Find out what's common and missing, in the order of self
+        other_names = other._param_name_dict
+        common_names = [name for name in self._param_name_dict if name in other_names]
+        missing_names = [name for name in self._param_name_dict if name not in other_names]
+
+        # Compare (and update) all common parameters in one batch
+        pairs = [(name, self._param_name_dict[name][0], other_names[name][0]) for name in common_names]
+        change_set = ChangeSet(changes=compare_parameters(pairs, apply=not diff_mode, writable=self._writable_for_update),
+                               missing_names=missing_names)
+        if logger:
+            for change in change_set.changes:
+                logger.info(f"Name: {change.name}, Attribute: {change.attribute}, Old: {change.old}, New: {change.new}")
 
         # Handle missing names (parameters that are in self but not in other)
-        self._delete_elements_if_in_list(missing_names,logger)
-        self._delete_elements_if_in_list(delete_list,logger,'becuase it was from a higher prio DCM.')
+        change_set.deleted_names += self._delete_elements_if_in_list(missing_names,logger)
+        change_set.deleted_names += self._delete_elements_if_in_list(delete_list,logger,'becuase it was from a higher prio DCM.')
 
-        return updated_names, list(missing_names)
+        return change_set
 
-    def add_new_parameters_from(self, other: "DCMObject", logger=None):
+    def add_new_parameters_from(self, other: "DCMObject", logger=None, share=True):
+        '''
+        Adds the parameters of other whose names are not in self. share : the value lists are shared with other
+        (see share_parameter), False deep copies the parameters
+        '''
         added_names = []
         # Identify the new parameters that are in the other object but not in self
         new_names = set(other._param_name_dict.keys()) - set(self._param_name_dict.keys())
@@ -121,37 +292,186 @@ class DCMObject():
             if name in other._param_name_dict:
                 item, attr_name = other._param_name_dict[name]
                 
-                # Copy the item to the appropriate list in self
-                attr_list = getattr(self, attr_name)
-
-                copied_item = deepcopy(item)
-                attr_list.append(copied_item)
+                # Add the item to the store of its type in self, at its position by name
+                copied_item = share_parameter(item) if share else deepcopy(item)
+                self._store(attr_name).add(copied_item)
 
                 # Add the entry to the dictionary
                 self._param_name_dict[name] = (copied_item, attr_name)
+                if self._index is not None:
+                    self._index.add(name, copied_item)
                 added_names.append(name)
 
                 # Optionally, log the additions
                 if logger:
                     logger.info(f"Added parameter with Name: {name}")
 
+        if share and added_names:
+            self._mark_shared(added_names)
+            other._mark_shared(added_names)
         return added_names  # Return the names of the parameters that wer
 
     def _delete_elements_if_in_list(self,list_of_names,logger,extra_messag=''):
-        for name in list_of_names:
-            if self.remove_parameter_by_name(name):     
-                if logger:
-                    logger.info(f"Name: {name} was deleted {extra_messag}")
+        deleted_names = []
+        names_by_attr = {}
+        for name in dict.fromkeys(list_of_names):
+            entry = self._param_name_dict.pop(name, None)
+            if entry is None:
+                continue
+            item, attr_name = entry
+            if self._store(attr_name).get(name) is item:
+                names_by_attr.setdefault(attr_name, []).append(name)
+            if self._index is not None:
+                self._index.remove(name)
+            if self._owned_names is not None:
+                self._owned_names.discard(name)
+            deleted_names.append(name)
+            if logger:
+                logger.info(f"Name: {name} was deleted {extra_messag}")
+        # one bulk removal per type
+        for attr_name, names in names_by_attr.items():
+            self._store(attr_name).remove_names(names)
+        return deleted_names
 
-    def write(self,new_pathname_for_file=None):
+    def write(self,new_pathname_for_file=None, backend='compiled', preserve_source=False):
+        '''
+        preserve_source : copy the blocks of unchanged parameters verbatim from the parsed file and render only
+        changed, added and removed ones. Needs DCMParser(keep_source=True) and an unchanged source file.
+        Writing over the source file loads the LazyParams of a lazy object first, the file they point to is replaced.
+        A parameter changed in place counts as changed only through get_parameter(name, writable=True),
+        set_parameter_attribute, update_from or mark_dirty, any other change is not written
+        '''
         if not(new_pathname_for_file):
             new_pathname_for_file = self.filePath
-            
-        with open (new_pathname_for_file, 'w') as fdcm:
-            fdcm.write(self.__str__())
+
+        source = self._source
+        if preserve_source:
+            if source is None or not source.is_current():
+                raise ValueError('The source file of the DCMObject was not kept or has changed since the parse')
+            if os.path.exists(new_pathname_for_file) and os.path.samefile(new_pathname_for_file, source.path):
+                for item, _ in self._param_name_dict.values():
+                    if isinstance(item, LazyParam):
+                        item.materialize()
+            if self.stats is None:
+                write_pieces(self._source_pieces(backend), source.path, new_pathname_for_file)
+                return
+            with self.stats.operation('write') as measurement:
+                write_pieces(self._source_pieces(backend), source.path, new_pathname_for_file)
+                measurement.bytes = os.path.getsize(new_pathname_for_file)
+            return
+
+        ## written next to the target and moved into place, the blocks of a lazy object are still read from filePath
+        with replacing(new_pathname_for_file) as tmp_path, open(tmp_path, 'w', encoding='ISO-8859-1', newline='') as fdcm:
+            self.write_to(fdcm, backend)
+
+    def _source_pieces(self, backend):
+        ## ('copy', offset, length) for the unchanged parts of the source file, ('text', str) for the rendered ones
+        source = self._source
+        names = self._param_name_dict
+        dirty = self._dirty_names
+        if self.comments == source.comments and self.format_spec_version == source.format_spec_version:
+            yield ('copy', 0, source.header_end)
+        else:
+            yield ('text', f"{self.comments}\n\nKONSERVIERUNG_FORMAT {self.format_spec_version}\n")
+        functions = [(func.function, func.version, func.description) for func in self.functions]
+        functions_text = '\n'.join(['FUNKTIONEN', *map(str, self.functions), 'END']) + '\n'
+        if source.function_span is None and functions:
+            yield ('text', '\n' + functions_text)
+
+        spans = [(offset, length, name) for name, offset, length in source.blocks]
+        if source.function_span:
+            spans.append((*source.function_span, None))
+        spans.sort()
+        position = source.header_end
+        written = set()
+        for offset, length, name in spans:
+            if offset > position:
+                yield ('copy', position, offset - position)
+            position = offset + length
+            if name is None:
+                if functions == source.functions:
+                    yield ('copy', offset, length)
+                elif functions:
+                    yield ('text', functions_text)
+                continue
+            current = names.get(name)
+            if current is None or name in written:
+                continue
+            written.add(name)
+            if current[0] is source.items.get(name) and name not in dirty:
+                yield ('copy', offset, length)
+            else:
+                yield ('text', current[0].render(backend) + '\n')
+        if source.size > position:
+            yield ('copy', position, source.size - position)
+        for attr in self._param_attributes:
+            for param in getattr(self, attr):
+                if param.name not in written:
+                    yield ('text', '\n' + param.render(backend) + '\n')
+
+    def write_binary(self, path_or_fileobj):
+        '''
+        Writes the binary form of binary_format.py, loaded again with read_binary
+        '''
+        from .binary_format import write_binary
+        write_binary(self, path_or_fileobj)
 
     def cleanup_parameters(self):
         """Removes all parameters from the DCMObject."""
         for attr in self._param_attributes:
-            setattr(self, attr, [])  # Set the attribute list to an empty list
+            setattr(self, attr, ParamStore())  # Set the attribute to an empty store
         self._param_name_dict.clear()  # Clear the dictionary
+        self._index = None
+        self._owned_names = None
+
+    def query(self, name=None, start=None, end=None, funktion=None, param_type=None, unit=None):
+        '''
+        Parameters matching all given criteria, sorted by name.
+        name : exact name or glob pattern, e.g. "InjCtl_*" (a prefix query on the sorted names)
+        start / end : name range, end excluded
+        funktion, unit : with or without the quotes of the file, unit matches einheit_w, einheit_x or einheit_y
+        param_type : class or class name, e.g. "KENNFELD", or a list of them (subclasses are separate types)
+        The indexes are built by the first query and kept up to date by the methods of DCMObject
+        '''
+        return [self._param_name_dict[name][0] for name in self.query_names(name, start, end, funktion, param_type, unit)]
+
+    def query_names(self, name=None, start=None, end=None, funktion=None, param_type=None, unit=None):
+        if self._index is None:
+            self._index = ParamIndex(self._param_name_dict)
+        elif self._unindexed_names:
+            names = self._param_name_dict
+            for dirty in self._unindexed_names & names.keys():
+                self._index.add(dirty, names[dirty][0])
+        self._unindexed_names.clear()
+        return self._index.query(name, start, end, funktion, param_type, unit)
+
+
+def share_parameter(item):
+    '''
+    A new parameter object with the attributes of item, the value lists are the same objects
+    '''
+    return copy(item)
+
+
+def _without_grid(item):
+    ## the values of item may be changed in place, the grid evaluate built from them is dropped
+    param = item._param if isinstance(item, LazyParam) else item
+    if isinstance(param, (KENNLINIE, KENNFELD)):
+        param._grid = None
+    return item
+
+
+def _is_binary_file(fileobj):
+    if isinstance(fileobj, io.TextIOBase):
+        return False
+    if isinstance(fileobj, (io.RawIOBase, io.BufferedIOBase)):
+        return True
+    mode = getattr(fileobj, 'mode', '')
+    return isinstance(mode, str) and 'b' in mode
+
+
+def _write_pending(fileobj, pending, binary, encoding):
+    if not pending:
+        return
+    data = ''.join(pending)
+    fileobj.write(data.encode(encoding) if binary else data)
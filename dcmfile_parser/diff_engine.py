@@ -0,0 +1,189 @@
+'''
+Batch comparison of parameters, used by DCMObject.update_from and DCMObject.diff_report.
+The values of all compared parameters are packed into flat float64 arrays per attribute and
+checked against the update rule with array operations
+'''
+from dataclasses import dataclass, field
+from itertools import chain
+from typing import Any, List, Optional
+import numpy as np
+
+compared_attributes = ('wert', 'size', 'st_x', 'st_y')   ## only these attributes are updated
+
+
+def values_within_tolerance(current, other):
+    '''
+    Vectorised update rule, relative difference below 1% or absolute difference below 0.001
+    '''
+    difference = np.abs(current - other)
+    largest = np.maximum(np.abs(current), np.abs(other))
+    relative = np.divide(difference, largest, out=np.zeros_like(difference), where=largest != 0)
+    return (relative < 0.01) | (difference < 0.001)
+
+
+def value_within_tolerance(current, other):
+    '''
+    Update rule for a single pair of values, values which are no numbers only match if they are equal
+    '''
+    if current == other:
+        return True
+    try:
+        difference = abs(current - other)
+        largest = max(abs(current), abs(other))
+    except TypeError:
+        return False
+    return difference / largest < 0.01 or difference < 0.001
+
+
+@dataclass
+class ParamChange:
+    name: str
+    attribute: str
+    indices: Optional[List[int]]   # None if the number of values changed
+    old: List[Any]
+    new: List[Any]
+
+    def as_dict(self):
+        return {'name': self.name, 'attribute': self.attribute, 'indices': self.indices,
+                'old': _as_list(self.old), 'new': _as_list(self.new)}
+
+
+@dataclass
+class ChangeSet:
+    changes: List[ParamChange] = field(default_factory=list)
+    missing_names: List[str] = field(default_factory=list)   # in the updated object but not in the other one
+    deleted_names: List[str] = field(default_factory=list)
+
+    @property
+    def updated_names(self):
+        return list(dict.fromkeys(change.name for change in self.changes))
+
+    def by_name(self):
+        changes_by_name = {}
+        for change in self.changes:
+            changes_by_name.setdefault(change.name, {})[change.attribute] = change
+        return changes_by_name
+
+    def as_records(self):
+        return [change.as_dict() for change in self.changes]
+
+
+def _flat(values):
+    if isinstance(values, np.ndarray):
+        return values.ravel()
+    return values
+
+
+def _as_list(values):
+    if isinstance(values, np.ndarray):
+        return values.ravel().tolist()
+    return list(values)
+
+
+def _pick(values, indices):
+    if isinstance(values, np.ndarray):
+        return values.ravel()[indices].tolist()
+    if len(indices) == len(values):
+        return list(values)
+    return list(map(values.__getitem__, indices))
+
+
+def _updated_values(current, other, indices):
+    if isinstance(current, np.ndarray):
+        updated = current.astype(np.float64, copy=True)
+        updated.flat[indices] = _pick(other, indices)
+        return updated
+    updated = list(current)
+    other = _flat(other)
+    for index in indices:
+        updated[index] = other[index]
+    return updated
+
+
+def compare_parameters(pairs, apply=False, writable=None):
+    '''
+    pairs : (name, current_param, other_param) tuples
+    apply : write the values of other into current where they are outside the tolerance,
+            values within the tolerance keep the current value
+    writable : called as writable(name, current_param) before an update, returns the object to write to
+               (DCMObject marks it changed). Value lists are never changed in place, they are replaced
+    Returns the ParamChange list, in the order of pairs and attributes
+    '''
+    changes = []
+    for attr in compared_attributes:
+        changes += _compare_attribute(pairs, attr, apply, writable)
+    order = {name: position for position, (name, _, _) in enumerate(pairs)}
+    changes.sort(key=lambda change: order[change.name])
+    return changes
+
+
+def _compare_attribute(pairs, attr, apply, writable=None):
+    changes = []
+    packed = []   # (name, current_param, current, other, flat current, flat other) with the same number of values
+    for name, current_param, other_param in pairs:
+        try:
+            current = getattr(current_param, attr)
+            other = getattr(other_param, attr)
+        except AttributeError:
+            continue
+        if current is other or (type(current) is list and type(other) is list and current == other):
+            continue
+        current_flat = _flat(current)
+        other_flat = _flat(other)
+        if len(current_flat) != len(other_flat):
+            # structural change, the other values are taken over completely
+            changes.append(ParamChange(name, attr, None, current, other))
+            if apply:
+                setattr(writable(name, current_param) if writable else current_param, attr, other)
+        elif len(current_flat):
+            packed.append((name, current_param, current, other, current_flat, other_flat))
+
+    if not packed:
+        return changes
+    try:
+        changed_per_entry = _changed_indices_packed(packed)
+    except (ValueError, TypeError):   # values which are no numbers, compared one by one
+        changed_per_entry = _changed_indices_one_by_one(packed)
+
+    for (name, current_param, current, other, _, _), indices in zip(packed, changed_per_entry):
+        if not indices:
+            continue
+        changes.append(ParamChange(name, attr, indices, _pick(current, indices), _pick(other, indices)))
+        if apply:
+            setattr(writable(name, current_param) if writable else current_param, attr,
+                    _updated_values(current, other, indices))
+    return changes
+
+
+def _changed_indices_packed(packed):
+    lengths = np.fromiter((len(entry[4]) for entry in packed), dtype=np.int64, count=len(packed))
+    total = int(lengths.sum())
+    current_values = np.fromiter(chain.from_iterable(entry[4] for entry in packed), dtype=np.float64, count=total)
+    other_values = np.fromiter(chain.from_iterable(entry[5] for entry in packed), dtype=np.float64, count=total)
+
+    changed = np.flatnonzero(~values_within_tolerance(current_values, other_values))
+    changed_per_entry = [None] * len(packed)
+    if len(changed) == 0:
+        return changed_per_entry
+    offsets = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+    entries = np.searchsorted(offsets, changed, side='right') - 1
+    local_indices = (changed - offsets[entries]).tolist()
+    boundaries = np.flatnonzero(np.diff(entries)) + 1
+    starts = [0] + boundaries.tolist()
+    ends = starts[1:] + [len(changed)]
+    for entry, start, end in zip(entries[starts].tolist(), starts, ends):
+        changed_per_entry[entry] = local_indices[start:end]
+    return changed_per_entry
+
+
+def _changed_indices_one_by_one(packed):
+    changed_per_entry = []
+    for _, _, _, _, current_flat, other_flat in packed:
+        try:
+            current_values = np.asarray(current_flat, dtype=np.float64)
+            other_values = np.asarray(other_flat, dtype=np.float64)
+            changed_per_entry.append(np.flatnonzero(~values_within_tolerance(current_values, other_values)).tolist())
+        except (ValueError, TypeError):
+            changed_per_entry.append([index for index, (current_value, other_value) in enumerate(zip(current_flat, other_flat))
+                                      if not value_within_tolerance(current_value, other_value)])
+    return changed_per_entry
@@ -0,0 +1,262 @@
+'''
+Comparison of one baseline with many variants. The values of the baseline are packed into float64 arrays once,
+every variant is then parsed and compared against them with array operations (in worker processes for paths),
+only a row of the label x variant matrix goes back. The tolerance is the update rule of update_from
+'''
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from itertools import chain
+from typing import List, Optional
+import os
+import time
+import numpy as np
+from .batch import _picklable_error
+from .dcm_object import DCMObject
+from .diff_engine import compared_attributes, values_within_tolerance, value_within_tolerance
+from .parse_dcm import DCMParser
+
+## status of a label in a variant
+unchanged, changed, structural, missing = range(4)
+status_names = ('unchanged', 'changed', 'structural', 'missing')
+
+
+def _flat(values):
+    if isinstance(values, np.ndarray):
+        return values.ravel()
+    return values
+
+
+class _PackedAttribute:
+    ## the values of one attribute of all baseline labels, concatenated in label order
+    def __init__(self, items, attr):
+        self.attr = attr
+        lengths = []
+        self.text_values = {}   # label index -> values which are no numbers, compared one by one
+        numeric = []
+        for index, item in enumerate(items):
+            values = getattr(item, attr, None)
+            if values is None:
+                lengths.append(-1)
+                continue
+            values = _flat(values)
+            try:
+                numeric.append(np.asarray(values, dtype=np.float64))
+                lengths.append(len(values))
+            except (ValueError, TypeError):
+                self.text_values[index] = list(values)
+                lengths.append(-1)
+        self.lengths = np.array(lengths, dtype=np.int64)
+        self.values = np.concatenate(numeric) if numeric else np.empty(0)
+        ## label index of every value, to select the values of the labels a variant has with the same length
+        compared = np.maximum(self.lengths, 0)
+        self.value_labels = np.repeat(np.arange(len(items)), compared)
+        self.offsets = np.concatenate(([0], np.cumsum(compared)[:-1])).tolist()
+        self.length_list = self.lengths.tolist()
+
+
+class PreparedBaseline:
+    '''
+    The names and packed values of a baseline DCMObject, compare() gives the matrix row of a variant
+    '''
+    def __init__(self, baseline: DCMObject):
+        self.labels = list(baseline._param_name_dict)
+        self.label_index = {name: index for index, name in enumerate(self.labels)}
+        items = [baseline._param_name_dict[name][0] for name in self.labels]
+        self.attributes = [_PackedAttribute(items, attr) for attr in compared_attributes]
+
+    def compare(self, variant: DCMObject):
+        '''
+        Returns (status, deviation, changed value counts, added names) of variant, the arrays in label order
+        '''
+        n_labels = len(self.labels)
+        status = np.zeros(n_labels, dtype=np.int8)
+        deviation = np.zeros(n_labels)
+        changed_values = np.zeros(n_labels, dtype=np.int64)
+        variant_names = variant._param_name_dict
+        entries = [variant_names.get(name) for name in self.labels]
+        items = [entry[0] if entry is not None else None for entry in entries]
+        for attribute in self.attributes:
+            self._compare_attribute(attribute, items, status, deviation, changed_values)
+        for index, item in enumerate(items):
+            if item is None:
+                status[index] = missing
+        added_names = [name for name in variant_names if name not in self.label_index]
+        return status, deviation, changed_values, added_names
+
+    def _compare_attribute(self, attribute, items, status, deviation, changed_values):
+        attr = attribute.attr
+        lengths = attribute.length_list
+        selected = np.zeros(len(items), dtype=bool)
+        chunks = []
+        for index, item in enumerate(items):
+            if item is None:
+                continue
+            values = getattr(item, attr, None)
+            length = lengths[index]
+            if length < 0:
+                text_values = attribute.text_values.get(index)
+                if text_values is not None and values is not None:
+                    self._compare_text(index, text_values, list(_flat(values)), status, changed_values)
+                continue
+            if values is None:
+                continue
+            values = _flat(values)
+            if len(values) != length:
+                status[index] = structural
+                continue
+            if length:
+                selected[index] = True
+                chunks.append(values)
+        if not chunks:
+            return
+
+        base_mask = selected[attribute.value_labels]
+        base_values = attribute.values if base_mask.all() else attribute.values[base_mask]
+        try:
+            variant_values = np.fromiter(chain.from_iterable(chunks), dtype=np.float64, count=len(base_values))
+        except (ValueError, TypeError):   # a variant with values which are no numbers, compared label by label
+            for index in np.flatnonzero(selected).tolist():
+                offset = attribute.offsets[index]
+                base = attribute.values[offset:offset + lengths[index]].tolist()
+                self._compare_text(index, base, list(_flat(getattr(items[index], attr))), status, changed_values)
+            return
+
+        labels = np.flatnonzero(selected)
+        starts = np.concatenate(([0], np.cumsum(attribute.lengths[labels])[:-1]))
+        difference = np.abs(base_values - variant_values)
+        outside = ~values_within_tolerance(base_values, variant_values)
+        counts = np.add.reduceat(outside.astype(np.int64), starts)
+        changed_values[labels] += counts
+        deviation[labels] = np.maximum(deviation[labels], np.maximum.reduceat(difference, starts))
+        changed_labels = labels[counts > 0]
+        ## another size with the same number of values is a change of the structure as well
+        status[changed_labels] = np.maximum(status[changed_labels], structural if attr == 'size' else changed)
+
+    @staticmethod
+    def _compare_text(index, base, values, status, changed_values):
+        ## values which are no numbers only match if they are equal
+        if len(base) != len(values):
+            status[index] = structural
+            return
+        count = sum(not value_within_tolerance(a, b) for a, b in zip(base, values))
+        if count:
+            changed_values[index] += count
+            status[index] = max(status[index], changed)
+
+
+@dataclass
+class LabelStats:
+    name: str
+    changed: int           # variants with values outside the tolerance
+    structural: int        # variants with another number of values
+    missing: int           # variants without the label
+    max_deviation: float   # largest absolute difference over all variants
+    mean_deviation: float  # mean of the largest absolute difference of the variants which changed the label
+
+
+@dataclass
+class DiffMatrix:
+    labels: List[str]
+    variants: List[str]
+    status: np.ndarray             # int8, labels x variants, unchanged / changed / structural / missing
+    deviation: np.ndarray          # largest absolute difference of the values, labels x variants
+    changed_values: np.ndarray     # number of values outside the tolerance, labels x variants
+    added_names: List[List[str]]   # per variant, labels which are not in the baseline
+    errors: List[Optional[BaseException]] = field(default_factory=list)   # per variant, the parse error
+    elapsed: List[float] = field(default_factory=list)                    # per variant, parse and compare time
+
+    def label_stats(self):
+        changed_mask = self.status == changed
+        counts = [np.count_nonzero(self.status == code, axis=1) for code in (changed, structural, missing)]
+        changed_deviation = np.where(changed_mask, self.deviation, 0.)
+        n_changed = counts[0]
+        mean = np.divide(changed_deviation.sum(axis=1), n_changed, out=np.zeros(len(self.labels)), where=n_changed > 0)
+        max_deviation = self.deviation.max(axis=1) if self.variants else np.zeros(len(self.labels))
+        return [LabelStats(name, *values) for name, *values in zip(
+            self.labels, counts[0].tolist(), counts[1].tolist(), counts[2].tolist(),
+            max_deviation.tolist(), mean.tolist())]
+
+    def changed_labels(self, variant):
+        '''
+        Labels which differ from the baseline in variant (index or path): changed, structural or missing
+        '''
+        column = variant if isinstance(variant, int) else self.variants.index(variant)
+        return [self.labels[index] for index in np.flatnonzero(self.status[:, column]).tolist()]
+
+    def as_records(self):
+        ## one record per label and variant which differs from the baseline
+        records = []
+        for label_index, variant_index in zip(*np.nonzero(self.status)):
+            records.append({'label': self.labels[label_index], 'variant': self.variants[variant_index],
+                            'status': status_names[self.status[label_index, variant_index]],
+                            'changed_values': int(self.changed_values[label_index, variant_index]),
+                            'deviation': float(self.deviation[label_index, variant_index])})
+        return records
+
+
+_worker_baseline = None
+
+
+def _init_worker(prepared):
+    global _worker_baseline
+    _worker_baseline = prepared
+
+
+def _parse_and_compare(path, parser_options, prepared=None):
+    ## runs in a worker, only the matrix row goes back
+    start = time.perf_counter()
+    try:
+        variant = DCMParser(path, **parser_options).create_dcm_object()
+        row = (prepared or _worker_baseline).compare(variant)
+        return row, None, time.perf_counter() - start
+    except Exception as e:
+        return None, _picklable_error(e), time.perf_counter() - start
+
+
+def diff_matrix(baseline, variants, workers=None, **parser_options):
+    '''
+    Compares the baseline (DCMObject or path) with every variant (DCMObjects or paths) and returns a DiffMatrix
+    with one column per variant, in the order of variants. The baseline is prepared once, the variant paths are
+    parsed and compared in workers processes (default os.cpu_count(), 1 for this process), one at a time
+    in memory per process. A variant which fails to parse has its error set and a column of missing labels.
+    parser_options : passed to DCMParser
+    '''
+    if not isinstance(baseline, DCMObject):
+        baseline = DCMParser(os.fspath(baseline), **parser_options).create_dcm_object()
+    prepared = PreparedBaseline(baseline)
+    variants = list(variants)
+    names = [variant.filePath if isinstance(variant, DCMObject) else os.fspath(variant) for variant in variants]
+    paths = [name for variant, name in zip(variants, names) if not isinstance(variant, DCMObject)]
+    workers = min(workers or os.cpu_count() or 1, max(len(paths), 1))
+
+    def outcomes():
+        parsed = iter(())
+        pool = None
+        if workers > 1 and paths:
+            pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(prepared,))
+            parsed = pool.map(_parse_and_compare, paths, [parser_options] * len(paths))
+        try:
+            for variant, name in zip(variants, names):
+                if isinstance(variant, DCMObject):
+                    start = time.perf_counter()
+                    yield prepared.compare(variant), None, time.perf_counter() - start
+                elif pool is not None:
+                    yield next(parsed)
+                else:
+                    yield _parse_and_compare(name, parser_options, prepared)
+        finally:
+            if pool is not None:
+                pool.shutdown()
+
+    n_labels = len(prepared.labels)
+    status = np.full((n_labels, len(variants)), missing, dtype=np.int8)
+    deviation = np.zeros((n_labels, len(variants)))
+    changed_values = np.zeros((n_labels, len(variants)), dtype=np.int64)
+    added_names, errors, elapsed = [], [], []
+    for column, (row, error, seconds) in enumerate(outcomes()):
+        if row is not None:
+            status[:, column], deviation[:, column], changed_values[:, column], added = row
+        added_names.append(added if row is not None else [])
+        errors.append(error)
+        elapsed.append(seconds)
+    return DiffMatrix(prepared.labels, names, status, deviation, changed_values, added_names, errors, elapsed)
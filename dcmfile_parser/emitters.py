@@ -0,0 +1,125 @@
+'''
+Compiled emitters, one function per template in templates/.
+The output is byte identical to the Jinja2 templates, values are formatted row by row without a template engine
+'''
+
+
+def format_values(values):
+    '''
+    format_value for a row of values
+    '''
+    return [('%.0f' if int(value) == value else '%.4f') % value for value in values]
+
+
+def _item(values, index):
+    # a missing item renders as an empty string in the templates
+    try:
+        return values[index]
+    except (IndexError, TypeError, KeyError):
+        return ''
+
+
+def _to_int(value):
+    # jinja2 int filter
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        try:
+            return int(float(value))
+        except (TypeError, ValueError):
+            return 0
+
+
+def _optional_lines(param, lines, attrs):
+    for keyword, attr, quote in attrs:
+        value = getattr(param, attr, '')
+        if value:
+            lines.append(f'  {keyword} {quote}{value}{quote}')
+
+
+def _rows(keyword, values, values_per_line, template):
+    return [template.format(keyword, '   '.join(format_values(values[i:i + values_per_line])))
+            for i in range(0, len(values), values_per_line)]
+
+
+def emit_festwert(param):
+    lines = [f'{param.token_string}{param.name}']
+    _optional_lines(param, lines, (('LANGNAME', 'langname', ''), ('FUNKTION', 'funktion', ''),
+                                   ('DISPLAYNAME', 'displayname', ''), ('EINHEIT_W', 'einheit_w', ''),
+                                   ('VAR', 'var', '')))
+    if param.text:
+        lines.append(f'  TEXT   {param.text}')
+    else:
+        lines.append(f'  WERT {format_values(param.wert[:1])[0]}')
+    lines.append('END')
+    return '\n'.join(lines)
+
+
+def emit_festwerteblock(param):
+    lines = [f'{param.token_string}{param.name} {_item(param.size, 0)}']
+    _optional_lines(param, lines, (('LANGNAME', 'langname', ''), ('FUNKTION', 'funktion', ''),
+                                   ('DISPLAYNAME', 'displayname', ''), ('EINHEIT_W', 'einheit_w', '"')))
+    lines += _rows('WERT', param.wert, param.values_per_line, '  {}    {}    ')
+    lines.append('END')
+    return '\n'.join(lines)
+
+
+def emit_kennlinie(param):
+    lines = [f'KENNLINIE {param.name} {_item(param.size, 0)} {_item(param.size, 1)}']
+    _optional_lines(param, lines, (('LANGNAME', 'langname', '"'), ('FUNKTION', 'funktion', ''),
+                                   ('DISPLAYNAME', 'displayname', ''), ('EINHEIT_X', 'einheit_x', '"'),
+                                   ('EINHEIT_Y', 'einheit_y', '"'), ('EINHEIT_W', 'einheit_w', '"')))
+    lines += _rows('ST/X', param.st_x, param.values_per_line, '  {}   {}   ')
+    lines += _rows('WERT', param.wert, param.values_per_line, '  {}   {}   ')
+    lines.append('END')
+    return '\n'.join(lines)
+
+
+def emit_kennfeld(param):
+    values_per_line = param.values_per_line
+    lines = [f'KENNFELD {param.name} {_item(param.size, 0)} {_item(param.size, 1)}']
+    _optional_lines(param, lines, (('LANGNAME', 'langname', '"'), ('FUNKTION', 'funktion', ''),
+                                   ('DISPLAYNAME', 'displayname', ''), ('EINHEIT_X', 'einheit_x', '"'),
+                                   ('EINHEIT_Y', 'einheit_y', '"'), ('EINHEIT_W', 'einheit_w', '"')))
+    lines += _rows('ST/X', param.st_x, values_per_line, '  {}   {}')
+    size0 = _to_int(_item(param.size, 0))
+    wert = param.wert
+    if hasattr(wert, 'ravel'):
+        wert = wert.ravel()
+    for index, st_y in enumerate(param.st_y):
+        lines.append('  ST/Y   %.5g' % st_y)
+        start_index = index * size0
+        lines += _rows('WERT', wert[start_index:start_index + size0], values_per_line, '  {}   {}')
+    lines.append('')
+    lines.append('END')
+    return '\n'.join(lines)
+
+
+def emit_stuetzstellenverteilung(param):
+    lines = [f'STUETZSTELLENVERTEILUNG {param.name} {_item(param.size, 0)} {_item(param.size, 1)}']
+    _optional_lines(param, lines, (('LANGNAME', 'langname', '"'), ('FUNKTION', 'funktion', ''),
+                                   ('DISPLAYNAME', 'displayname', ''), ('EINHEIT_X', 'einheit_x', '"')))
+    lines += _rows('ST/X', param.st_x, param.values_per_line, '  {}   {}   ')
+    lines.append('END')
+    return '\n'.join(lines)
+
+
+## keyed by template name, classes without an own template use the one of their parent class
+emitters = {
+    'FESTWERT': emit_festwert,
+    'FESTWERTEBLOCK': emit_festwerteblock,
+    'KENNLINIE': emit_kennlinie,
+    'KENNFELD': emit_kennfeld,
+    'STUETZSTELLENVERTEILUNG': emit_stuetzstellenverteilung,
+}
+
+
+def get_emitter(param_class):
+    emitter = emitters.get(param_class.__name__) or emitters.get(param_class.__bases__[0].__name__)
+    if emitter is None:
+        raise ValueError(f'No emitter for {param_class.__name__}')
+    return emitter
+
+
+def emit(param):
+    return get_emitter(type(param))(param)
@@ -0,0 +1,134 @@
+'''
+Vectorised evaluation of curves and maps: linear interpolation between the axis points, query points outside
+the axis are clamped to its first or last point, as the lookup of the ECU does.
+The axes and values are converted once into a grid which the parameter keeps until they are replaced
+'''
+import numpy as np
+
+
+max_lookup_size = 1 << 16
+chunk_size = 1 << 14   # points evaluated at once by evaluate_map
+
+
+class AxisLookup:
+    """
+    Cell index of points on an axis. A table over equal buckets no wider than the narrowest cell gives the cell
+    of a bucket start, a point is then at most one cell further, so the lookup is a few array operations
+    instead of a binary search per point. Axes with very uneven cells use np.searchsorted
+    """
+    __slots__ = ('points', 'scale', 'table')
+
+    def __init__(self, points):
+        self.points = points
+        self.scale = self.table = None
+        span = points[-1] - points[0]
+        size = int(np.ceil(span / np.diff(points).min())) + 1
+        if size <= max_lookup_size:
+            self.scale = size / span
+            starts = points[0] + np.arange(size + 1) / self.scale
+            self.table = np.clip(np.searchsorted(points, starts, side='right') - 1, 0, points.size - 2)
+
+    def cells(self, values):
+        ## index of the lower axis point of the cell and the position in the cell (0 to 1) of every clamped value
+        points = self.points
+        values = np.clip(values, points[0], points[-1])
+        if self.table is None:
+            index = np.searchsorted(points, values, side='right') - 1
+        else:
+            index = self.table[np.minimum(((values - points[0]) * self.scale).astype(np.intp), self.table.size - 1)]
+            ## corrects the bucket of a value rounded across an axis point
+            index += values >= points[np.minimum(index + 1, points.size - 1)]
+            index -= values < points[index]
+        index = np.clip(index, 0, points.size - 2)
+        lower = points[index]
+        return index, (values - lower) / (points[index + 1] - lower)
+
+
+class Grid:
+    __slots__ = ('sources', 'x', 'y', 'values', 'x_lookup', 'y_lookup')
+
+    def __init__(self, sources, x, y, values):
+        self.sources = sources   # the axis and value objects the grid was built from
+        self.x = x
+        self.y = y
+        self.values = values
+        self.x_lookup = AxisLookup(x) if y is not None else None
+        self.y_lookup = AxisLookup(y) if y is not None else None
+
+    def built_from(self, sources):
+        return len(sources) == len(self.sources) and all(a is b for a, b in zip(sources, self.sources))
+
+
+def axis_values(axis):
+    ## st_x of a parameter or a STUETZSTELLENVERTEILUNG, as a strictly increasing float64 array
+    values = getattr(axis, 'st_x', axis)
+    try:
+        values = np.asarray(values, dtype=np.float64).ravel()
+    except (ValueError, TypeError):
+        raise ValueError('The axis has non numeric points') from None
+    if values.size == 0:
+        raise ValueError('The axis has no points')
+    if values.size > 1 and not np.all(np.diff(values) > 0):
+        raise ValueError('The axis points are not strictly increasing')
+    return values
+
+
+def table_values(wert, shape):
+    try:
+        values = np.asarray(wert, dtype=np.float64)
+    except (ValueError, TypeError):
+        raise ValueError('The values are not numeric') from None
+    if values.size != int(np.prod(shape)):
+        raise ValueError(f'{values.size} values do not fit the axes of {shape[::-1]} points')
+    return values.reshape(shape)
+
+
+def curve_grid(sources, axis_x, wert):
+    x = axis_values(axis_x)
+    return Grid(sources, x, None, table_values(wert, (x.size,)))
+
+
+def map_grid(sources, axis_x, axis_y, wert):
+    x = axis_values(axis_x)
+    y = axis_values(axis_y)
+    values = table_values(wert, (y.size, x.size))
+    ## an axis of one point gets a second one, so every query point has a cell of two by two points
+    if x.size == 1:
+        x = np.array([x[0], x[0] + 1.0])
+        values = np.repeat(values, 2, axis=1)
+    if y.size == 1:
+        y = np.array([y[0], y[0] + 1.0])
+        values = np.repeat(values, 2, axis=0)
+    return Grid(sources, x, y, np.ascontiguousarray(values))
+
+
+def evaluate_curve(grid, x):
+    ## np.interp clamps to the first and last value
+    return np.interp(x, grid.x, grid.values)
+
+
+def evaluate_map(grid, x, y):
+    x, y = np.broadcast_arrays(np.asarray(x, dtype=np.float64), np.asarray(y, dtype=np.float64))
+    if x.size <= chunk_size:
+        result = _evaluate_map_points(grid, x, y)
+        return result[()] if result.ndim == 0 else result
+    ## the temporaries of a chunk stay in the cache, for large arrays this is about twice as fast
+    shape = x.shape
+    x, y = x.ravel(), y.ravel()
+    result = np.empty(x.size)
+    for start in range(0, x.size, chunk_size):
+        end = start + chunk_size
+        result[start:end] = _evaluate_map_points(grid, x[start:end], y[start:end])
+    return result.reshape(shape)
+
+
+def _evaluate_map_points(grid, x, y):
+    ix, tx = grid.x_lookup.cells(x)
+    iy, ty = grid.y_lookup.cells(y)
+    flat = grid.values.ravel()
+    columns = grid.x.size
+    lower = iy * columns + ix
+    upper = lower + columns
+    v00, v01 = flat[lower], flat[lower + 1]
+    v10, v11 = flat[upper], flat[upper + 1]
+    return (v00 + (v01 - v00) * tx) * (1 - ty) + (v10 + (v11 - v10) * tx) * ty
@@ -0,0 +1,58 @@
+from copy import copy, deepcopy
+
+
+class LazyParam():
+    '''
+    Placeholder for a parameter of a lazily loaded DCMObject.
+    The block is parsed by the loader on first access of any attribute other than the name, then cached
+    '''
+    __slots__ = ('name', 'type', 'offset', 'length', '_loader', '_param')
+
+    def __init__(self, name, type, offset, length, loader):
+        object.__setattr__(self, 'name', name)
+        object.__setattr__(self, 'type', type)
+        object.__setattr__(self, 'offset', offset)
+        object.__setattr__(self, 'length', length)
+        object.__setattr__(self, '_loader', loader)
+        object.__setattr__(self, '_param', None)
+
+    @property
+    def is_loaded(self):
+        return self._param is not None
+
+    def materialize(self):
+        if self._param is None:
+            object.__setattr__(self, '_param', self._loader(self.type, self.offset, self.length))
+        return self._param
+
+    def __getattr__(self, attr):
+        return getattr(self.materialize(), attr)
+
+    def __setattr__(self, attr, value):
+        setattr(self.materialize(), attr, value)
+        if attr == 'name':
+            object.__setattr__(self, 'name', value)
+
+    def __str__(self):
+        return str(self.materialize())
+
+    def __repr__(self):
+        if self._param is None:
+            return f'LazyParam({self.type} {self.name}, offset={self.offset}, length={self.length})'
+        return repr(self._param)
+
+    def __eq__(self, other):
+        if isinstance(other, LazyParam):
+            other = other.materialize()
+        return self.materialize() == other
+
+    __hash__ = None
+
+    def __copy__(self):
+        ## a placeholder which is not loaded yet gets its own, a loaded one the shallow copy of its parameter
+        if self._param is None:
+            return LazyParam(self.name, self.type, self.offset, self.length, self._loader)
+        return copy(self._param)
+
+    def __deepcopy__(self, memo):
+        return deepcopy(self.materialize(), memo)
@@ -0,0 +1,116 @@
+'''
+Merging of a base DCMObject with higher priority overlays in one pass over the name indices.
+The parameters of the merged object share their value lists with the layers (see dcm_object.share_parameter)
+'''
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+import os
+from .dcm_object import DCMObject, share_parameter
+from .parse_dcm import DCMParser
+
+conflict_actions = ('override', 'keep', 'error')
+
+
+class MergeConflictError(ValueError):
+    pass
+
+
+@dataclass
+class MergePolicy:
+    add_new: bool = True              # labels which are only in an overlay are added
+    delete_missing: bool = False      # labels missing in an overlay are removed, as update_from does
+    delete_names: List[str] = field(default_factory=list)   # removed from the result, as the delete_list of update_from
+    on_type_conflict: str = 'override'   # an overlay has the label as another parameter type: override, keep or error
+
+    def __post_init__(self):
+        if self.on_type_conflict not in conflict_actions:
+            raise ValueError(f'Unknown on_type_conflict {self.on_type_conflict}, use one of {conflict_actions}')
+
+
+@dataclass
+class MergeResult:
+    dcm_object: DCMObject
+    provenance: Dict[str, int]        # label -> index of the layer it was taken from
+    layer_names: List[str]            # path or filePath of every layer
+    deleted_names: List[str] = field(default_factory=list)
+
+    def source_of(self, name):
+        return self.layer_names[self.provenance[name]]
+
+
+def _as_dcm_object(layer, parser_options):
+    if isinstance(layer, DCMObject):
+        return layer
+    return DCMParser(os.fspath(layer), **parser_options).create_dcm_object()
+
+
+def merge_layers(layers, policy: Optional[MergePolicy] = None, **parser_options):
+    '''
+    layers : DCMObjects or paths, the base first and then the overlays in increasing priority
+    parser_options : passed to DCMParser for the layers given as paths
+    A label of a higher layer replaces the label of the lower layers completely.
+    Comments, format version and file path are taken from the base, functions of the overlays are added by name.
+    Returns a MergeResult, the parameters of the merged object share their value lists with the layers
+    '''
+    policy = policy or MergePolicy()
+    layers = [_as_dcm_object(layer, parser_options) for layer in layers]
+    if not layers:
+        raise ValueError('merge_layers needs at least one layer')
+
+    winners = {}   # name -> (item, attr, layer index)
+    deleted_names = []
+    for layer_index, layer in enumerate(layers):
+        names = layer._param_name_dict
+        if layer_index and policy.delete_missing:
+            missing = [name for name in winners if name not in names]
+            for name in missing:
+                del winners[name]
+            deleted_names += missing
+        for name, (item, attr) in names.items():
+            current = winners.get(name)
+            if current is None:
+                if layer_index == 0 or policy.add_new:
+                    winners[name] = (item, attr, layer_index)
+                continue
+            if current[1] != attr:
+                if policy.on_type_conflict == 'keep':
+                    continue
+                if policy.on_type_conflict == 'error':
+                    raise MergeConflictError(f'{name} is a {type(current[0]).__name__} in layer {current[2]} '
+                                             f'and a {type(item).__name__} in layer {layer_index}')
+            winners[name] = (item, attr, layer_index)
+
+    for name in policy.delete_names:
+        if winners.pop(name, None) is not None:
+            deleted_names.append(name)
+
+    base = layers[0]
+    params = {attr: [] for attr in base._param_attributes}
+    provenance = {}
+    for name, (item, attr, layer_index) in winners.items():
+        params[attr].append(share_parameter(item))
+        provenance[name] = layer_index
+
+    functions = list(base.functions)
+    function_names = {func.function for func in functions}
+    for layer in layers[1:]:
+        for func in layer.functions:
+            if func.function not in function_names:
+                function_names.add(func.function)
+                functions.append(func)
+
+    merged = DCMObject(
+        filePath = base.filePath,
+        comments = base.comments,
+        format_spec_version = base.format_spec_version,
+        functions = functions,
+        **params
+    )
+    ## the shared value lists are copied by get_parameter(name, writable=True) of the merged object and of the layers
+    merged._owned_names = set()
+    names_by_layer = {}
+    for name, layer_index in provenance.items():
+        names_by_layer.setdefault(layer_index, []).append(name)
+    for layer_index, names in names_by_layer.items():
+        layers[layer_index]._mark_shared(names)
+    return MergeResult(merged, provenance, [layer.filePath for layer in layers], deleted_names)
@@ -0,0 +1,170 @@
+'''
+Name keyed container of the parameters of one type, always in alphabetical order.
+Names are kept in a list of sorted chunks, so insert and delete only move the items of one chunk.
+Reading works as with the plain lists DCMObject had before: iteration, len, indexing, slicing, == with a list
+'''
+from bisect import bisect_left, insort
+from itertools import chain
+
+chunk_size = 512   # a chunk is split at twice this size
+
+
+def name_of(item):
+    return getattr(item, 'name', '')
+
+
+class ParamStore:
+    __slots__ = ('_items', '_chunks', '_maxes')
+
+    def __init__(self, items=()):
+        self._items = {}
+        for item in items:
+            self._items[name_of(item)] = item   # a name appearing twice keeps the last parameter
+        self._build(sorted(self._items))
+
+    def _build(self, sorted_names):
+        self._chunks = [sorted_names[i:i + chunk_size] for i in range(0, len(sorted_names), chunk_size)]
+        self._maxes = [chunk[-1] for chunk in self._chunks]
+
+    ## name keyed access
+
+    def get(self, name, default=None):
+        return self._items.get(name, default)
+
+    def fork(self, copy_item=None):
+        '''
+        A new store with the same parameter objects, or with copy_item(item) of each, without sorting again
+        '''
+        forked = ParamStore()
+        forked._items = dict(self._items) if copy_item is None else {name: copy_item(item)
+                                                                      for name, item in self._items.items()}
+        forked._chunks = [list(chunk) for chunk in self._chunks]
+        forked._maxes = list(self._maxes)
+        return forked
+
+    def names(self):
+        return list(chain.from_iterable(self._chunks))
+
+    def add(self, item):
+        '''
+        Inserts item at its position by name, an item of the same name is replaced
+        '''
+        name = name_of(item)
+        if name in self._items:
+            self._items[name] = item
+            return
+        self._items[name] = item
+        if not self._chunks:
+            self._chunks.append([name])
+            self._maxes.append(name)
+            return
+        position = min(bisect_left(self._maxes, name), len(self._maxes) - 1)
+        chunk = self._chunks[position]
+        insort(chunk, name)
+        self._maxes[position] = chunk[-1]
+        if len(chunk) > 2 * chunk_size:
+            self._chunks[position:position + 1] = [chunk[:chunk_size], chunk[chunk_size:]]
+            self._maxes[position:position + 1] = [chunk[chunk_size - 1], chunk[-1]]
+
+    def pop(self, name, *default):
+        if name not in self._items:
+            if default:
+                return default[0]
+            raise KeyError(name)
+        item = self._items.pop(name)
+        position = bisect_left(self._maxes, name)
+        chunk = self._chunks[position]
+        del chunk[bisect_left(chunk, name)]
+        if chunk:
+            self._maxes[position] = chunk[-1]
+        else:
+            del self._chunks[position]
+            del self._maxes[position]
+        return item
+
+    def remove_names(self, names):
+        '''
+        Bulk removal, returns the removed names. A few names are popped one by one,
+        many are removed in one pass over all names
+        '''
+        names = [name for name in dict.fromkeys(names) if name in self._items]
+        if len(names) * 64 < len(self._items):
+            for name in names:
+                self.pop(name)
+            return names
+        for name in names:
+            del self._items[name]
+        if names:
+            items = self._items
+            self._build([name for name in chain.from_iterable(self._chunks) if name in items])
+        return names
+
+    ## list interface
+
+    def __len__(self):
+        return len(self._items)
+
+    def __iter__(self):
+        items = self._items
+        return (items[name] for chunk in self._chunks for name in chunk)
+
+    def __reversed__(self):
+        items = self._items
+        return (items[name] for chunk in reversed(self._chunks) for name in reversed(chunk))
+
+    def __contains__(self, item):
+        return self._items.get(name_of(item)) is item
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return list(self)[index]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('ParamStore index out of range')
+        for chunk in self._chunks:
+            if index < len(chunk):
+                return self._items[chunk[index]]
+            index -= len(chunk)
+
+    def __delitem__(self, index):
+        self.pop(name_of(self[index]))
+
+    def __eq__(self, other):
+        if isinstance(other, (ParamStore, list, tuple)):
+            return list(self) == list(other)
+        return NotImplemented
+
+    def __repr__(self):
+        return f'ParamStore({list(self)!r})'
+
+    def append(self, item):
+        self.add(item)
+
+    def extend(self, items):
+        for item in items:
+            self.add(item)
+
+    def remove(self, item):
+        if item not in self:
+            raise ValueError(f'{name_of(item)} is not in the ParamStore')
+        self.pop(name_of(item))
+
+    def clear(self):
+        self._items.clear()
+        self._build([])
+
+    def index(self, item):
+        name = name_of(item)
+        if self._items.get(name) is not item:
+            raise ValueError(f'{name} is not in the ParamStore')
+        position = bisect_left(self._maxes, name)
+        return sum(map(len, self._chunks[:position])) + bisect_left(self._chunks[position], name)
+
+    def sort(self, key=None, reverse=False):
+        ## the items are always sorted by name
+        if key is not None or reverse:
+            raise ValueError('A ParamStore is always sorted by name')
+
+    def copy(self):
+        return list(self)
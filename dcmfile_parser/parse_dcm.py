@@ -2,8 +2,30 @@ from dataclasses import dataclass
 from typing import List, Union, Optional
 from .attribute_classes import FUNKTIONEN, FESTWERT, FESTWERTEBLOCK, KENNLINIE, FESTKENNLINIE, GRUPPENKENNLINIE
 from .attribute_classes import KENNFELD,FESTKENNFELD, GRUPPENKENNFELD, STUETZSTELLENVERTEILUNG 
-from .dcm_object import DCMObject
+from .attribute_classes import values_to_array
+from .dcm_object import DCMObject, share_parameter
+from .lazy_param import LazyParam
+from .serialization import pack_param, unpack_param
+from .source_map import SourceMap
+from .profiling import as_stats, phase
+from .compression import compression_of_file, is_stream, open_text
+from time import perf_counter
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from itertools import chain
+import hashlib
+import mmap
+import os
 import re
+import sys
+
+@dataclass
+class ReparseResult:
+    dcm_object: DCMObject
+    added_names: List[str]
+    changed_names: List[str]
+    removed_names: List[str]
+
 
 class DCMParser():    
     format_spec_string = 'KONSERVIERUNG_FORMAT'
@@ -33,43 +55,433 @@ class DCMParser():
     }
     multi_line_attrs_keywords = '|'.join(possible_multi_line_attrs.keys())
     multi_line_attrs_keywords_pattern = re.compile(rf'({multi_line_attrs_keywords})\s+(.*?)\s*$', re.IGNORECASE)
+    ## same patterns for the byte level parse path
+    single_line_attrs_keywords_pattern_bytes = re.compile(single_line_attrs_keywords_pattern.pattern.encode('ascii'))
+    multi_line_attrs_keywords_pattern_bytes = re.compile(multi_line_attrs_keywords_pattern.pattern.encode('ascii'), re.IGNORECASE)
+
+    param_class_by_type = {cls.token_string.strip(): cls for cls in all_param_classes}
+    ## a block starts with one of these keywords at the start of a line and ends with the next line starting with END
+    block_start_keywords = [FUNKTIONEN.token_string] + [cls.token_string for cls in all_param_classes]
+    block_start_pattern = re.compile('|'.join(map(re.escape, block_start_keywords)))
+    block_start_pattern_bytes = re.compile(b'|'.join(re.escape(keyword.encode('ascii')) for keyword in block_start_keywords))
+    block_end_string = 'END'
+    ## every line which can open or close a block, for the pre-scans of the parallel and incremental parse.
+    ## Anchored on the newline, a MULTILINE ^ makes the regex engine try every position
+    block_boundary_line = rb'(?:(' + block_start_pattern_bytes.pattern + rb')|END)'
+    block_boundary_pattern = re.compile(rb'\n' + block_boundary_line)
+    first_block_boundary_pattern = re.compile(block_boundary_line)
+    name_and_size_patterns = {type: re.compile(rf'^{re.escape(type)}\s+([a-zA-Z0-9_\.]+)(?:\s+(\d+)(?:\s+(\d+))?)?')
+                                for type in param_class_by_type}
+    name_and_size_patterns_bytes = {type: re.compile(pattern.pattern.encode('ascii'))
+                                for type, pattern in name_and_size_patterns.items()}
+
 
+    array_attrs = ('wert', 'st_x', 'st_y')
+    ## these strings repeat across many parameters, interned they are stored once
+    interned_attrs = ('funktion', 'einheit_w', 'einheit_x', 'einheit_y')
 
-    def __init__(self,dcm_file,):
-        self.file = dcm_file
+    ## these modes read the file by byte offsets, which a compressed file or a stream does not have
+    random_access_options = ('lazy', 'use_mmap', 'workers', 'incremental', 'keep_source')
+
+    def __init__(self,dcm_file, lazy=False, use_mmap=False, array_mode=False, workers=None, cache=None,
+                 incremental=False, keep_source=False, stats=None):
+        '''
+        dcm_file : path of a plain, gzip, xz or bz2 compressed file (detected from the magic bytes), or a binary
+                   stream (e.g. sys.stdin.buffer, a socket or HTTP response). Compressed files and streams are
+                   decompressed and parsed incrementally, a stream can be parsed once
+        lazy : create_dcm_object only indexes the blocks, parameters are parsed on first access
+        use_mmap : create_dcm_object tokenises the memory mapped file as bytes, only names, units
+                   and text fields are decoded and the file content is never copied as a whole
+        array_mode : wert, st_x and st_y are stored as float64 numpy arrays, wert is shaped by size
+        workers : create_dcm_object parses the blocks in this many processes
+        cache : ParseCache, create_dcm_object loads a cached result of an unchanged file instead of parsing it
+        incremental : create_dcm_object keeps a content hash per block, reparse only parses new or changed blocks
+        keep_source : the DCMObject gets the byte spans of its blocks, DCMObject.write copies unchanged blocks verbatim
+        stats : True or a ParseStats, time, calls, bytes and objects are recorded per phase and parameter type.
+                The DCMObject gets the same ParseStats for its writes
+        '''
+        self.source = dcm_file
+        self.file = (getattr(dcm_file, 'name', None) or '<stream>') if is_stream(dcm_file) else dcm_file
+        self.compression = None if is_stream(dcm_file) else compression_of_file(dcm_file)
+        self.streamed = is_stream(dcm_file) or self.compression is not None
+        self.lazy = lazy
+        self.use_mmap = use_mmap
+        self.array_mode = array_mode
+        self.workers = workers
+        self.cache = cache
+        self.incremental = incremental
+        self.keep_source = keep_source
+        self.stats = as_stats(stats)
+        self.block_hashes = {}        # block digest -> parameter as parsed by the last parse, for the incremental mode
+        self.last_param_names = {}    # name -> parameter as parsed by the last parse
+        self._file_raw_content = None
+        if self.streamed:
+            options = [name for name in self.random_access_options
+                       if ((getattr(self, name) or 0) > 1 if name == 'workers' else getattr(self, name))]
+            if cache is not None and is_stream(dcm_file):
+                options.append('cache')
+            if options:
+                source = f'a {self.compression} compressed file' if self.compression else 'a stream'
+                raise ValueError(f'{", ".join(options)} can not be used with {source}')
 
-        with open(self.file, "r", encoding="ISO-8859-1") as f:
-            content = f.read()
-        self.file_raw_content = content
+    @property
+    def file_raw_content(self):
+        ## the file is only read completely when needed, iter_parameters streams it instead
+        if self._file_raw_content is None:
+            with open_text(self.source) as f:
+                self._file_raw_content = f.read()
+        return self._file_raw_content
+
+    @file_raw_content.setter
+    def file_raw_content(self, content):
+        self._file_raw_content = content
+
+    def iter_parameters(self):
+        '''
+        Reads the file incrementally and yields one parameter object (or FUNKTIONEN entry) per block
+        as soon as its END line is seen. Only the current block is held in memory.
+        comments and format_spec_version are available once the first item was yielded
+        '''
+        with open_text(self.source) as f:
+            for type, block_lines in self.iter_blocks(self.iter_data_lines(f)):
+                if type == FUNKTIONEN.token_string:
+                    yield from self.create_functions_from_lines(block_lines)
+                else:
+                    obj = self.create_param(block_lines, type)
+                    if obj is not None:
+                        yield obj
+
+    def iter_data_lines(self, lines):
+        '''
+        Consumes the comment header up to the format spec line and yields the lines below it
+        '''
+        header = []
+        lines = iter(lines)
+        for line in lines:
+            if line.startswith(self.format_spec_string):
+                format_line = line.split()
+                self.comments = ''.join(header).strip()
+                self.format_spec_version = format_line[1] if len(format_line) > 1 else None
+                break
+            header.append(line)
+        else:
+            raise ValueError(f"{self.format_spec_string} line not found")
+
+        for line in lines:
+            yield line.rstrip('\n')
 
     def create_dcm_object(self):
+        if self.stats is None:
+            dcm_obj = self._create_dcm_object()
+        else:
+            with self.stats.operation('parse', 0 if is_stream(self.source) else os.path.getsize(self.file)) as measurement:
+                dcm_obj = self._create_dcm_object()
+                measurement.objects = len(dcm_obj._param_name_dict)
+            dcm_obj.stats = self.stats
+        if self.keep_source:
+            dcm_obj._source = self.create_source_map(dcm_obj)
+        return dcm_obj
+
+    def _create_dcm_object(self):
+        if self.lazy:
+            return self.create_lazy_dcm_object()
+        if self.incremental:
+            return self.reparse().dcm_object
+        if self.cache is not None:
+            return self.cache.create_dcm_object(self)
+        return self.parse_dcm_object()
+
+    def create_source_map(self, dcm_obj):
+        '''
+        SourceMap of the file dcm_obj was parsed from, found by a scan of the block boundaries
+        '''
+        stat = os.stat(self.file)
+        function_span = None
+        blocks = []
+        with open(self.file, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            comments, format_spec = self.read_header(mm)
+            header_end = mm.tell()
+            for type, offset, length in self.find_block_spans(mm, header_end):
+                if type == FUNKTIONEN.token_string:
+                    function_span = function_span or (offset, length)
+                    continue
+                line_end = mm.find(b'\n', offset, offset + length)
+                first_line = mm[offset:line_end if line_end != -1 else offset + length]
+                name, _ = self.get_name_size_from_first_line_bytes(first_line, type)
+                blocks.append((name, offset, length))
+        return SourceMap(
+            path = os.path.abspath(self.file),
+            size = stat.st_size,
+            mtime_ns = stat.st_mtime_ns,
+            header_end = header_end,
+            comments = comments,
+            format_spec_version = format_spec,
+            functions = [(func.function, func.version, func.description) for func in dcm_obj.functions],
+            function_span = function_span,
+            blocks = blocks,
+            items = {name: item for name, (item, _) in dcm_obj._param_name_dict.items()},
+        )
+
+    def cache_options(self):
+        ## the options which change the parsed result
+        return {'array_mode': self.array_mode}
+
+    def parse_dcm_object(self):
+        if self.streamed:
+            return self.create_streamed_dcm_object()
+        if self.workers and self.workers > 1:
+            return self.create_parallel_dcm_object()
+        if self.use_mmap:
+            return self.create_mmap_dcm_object()
+        stats = self.stats
         ## get comments , format_spec
-        comments,format_spec, rest_data = self.get_comments_and_spec_version()    
-        function_chunk = self.chunks_for_type(rest_data,FUNKTIONEN.token_string)
-        self.all_functions = self.create_functions(function_chunk)
-        ## make the chunks based on END
-        self.raw_data_chunks_dict = self.create_chunks(rest_data)
+        with phase(stats, 'header') as measurement:
+            comments,format_spec, rest_data = self.get_comments_and_spec_version()    
+            measurement.bytes = len(self.file_raw_content) - len(rest_data)
+        ## make the chunks based on END, all types in a single pass
+        with phase(stats, 'chunks', len(rest_data)) as measurement:
+            self.raw_data_chunks_dict = self.create_chunks(rest_data)
+            measurement.objects = sum(map(len, self.raw_data_chunks_dict.values()))
+        function_chunk = self.raw_data_chunks_dict.pop(FUNKTIONEN.token_string)
+        with phase(stats, 'functions') as measurement:
+            self.all_functions = self.create_functions(function_chunk)
+            measurement.objects = len(self.all_functions)
         self.processed_data = {}        
         for key,value in self.raw_data_chunks_dict.items():
             self.processed_data[key] = self.process_param_chunk(value,key)
         
+        with phase(stats, 'objects') as measurement:
+            dcm_obj = self.make_dcm_object(comments, format_spec, self.all_functions, self.processed_data)
+            measurement.objects = len(dcm_obj._param_name_dict)
+        return dcm_obj
 
+    def create_streamed_dcm_object(self):
+        '''
+        Parses the blocks while the (decompressed) lines arrive, only the current block is held as text
+        '''
+        functions = []
+        params_by_type = {type: [] for type in self.param_class_by_type}
+        with open_text(self.source) as f:
+            for type, block_lines in self.iter_blocks(self.iter_data_lines(f)):
+                if type == FUNKTIONEN.token_string:
+                    if not functions:
+                        functions = self.create_functions_from_lines(block_lines)
+                    continue
+                obj = self.create_param(block_lines, type)
+                if obj is not None:
+                    params_by_type[type].append(obj)
+        self.all_functions = functions
+        return self.make_dcm_object(self.comments, self.format_spec_version, functions, params_by_type)
+
+    def reparse(self):
+        '''
+        Incremental parse: the blocks are found and hashed in one scan over the memory mapped file, only blocks whose
+        content hash is unknown from the last parse are parsed. The parser keeps the parameters as parsed, the
+        DCMObject gets parameter objects of its own which share their value lists with them (see
+        dcm_object.share_parameter), so changes made to a result are not seen by the next one.
+        Returns a ReparseResult with the names added, changed and removed since the last parse
+        '''
+        block_hashes = {}
+        functions = []
+        params_by_type = {type: [] for type in self.param_class_by_type}
+        with open(self.file, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            comments, format_spec = self.read_header(mm)
+            for type, offset, length in self.find_block_spans(mm, mm.tell()):
+                block = mm[offset:offset + length]
+                if type == FUNKTIONEN.token_string:
+                    if not functions:
+                        functions = self.create_functions_from_lines(block.decode('ISO-8859-1').splitlines())
+                    continue
+                digest = hashlib.blake2b(block, digest_size=16).digest()
+                param = self.block_hashes.get(digest) or block_hashes.get(digest)
+                if param is None:
+                    param = self.create_param(block.splitlines(), type)
+                    if param is None:
+                        continue
+                block_hashes[digest] = param
+                params_by_type[type].append(param)
+
+        self.all_functions = functions
+        param_names = {param.name: param for params in params_by_type.values() for param in params}
+        dcm_obj = self.make_dcm_object(comments, format_spec, functions,
+                                       {type: [share_parameter(param) for param in params]
+                                        for type, params in params_by_type.items()})
+        ## the value lists are shared with the parsed parameters, get_parameter(name, writable=True) copies them
+        dcm_obj._mark_shared(dcm_obj._param_name_dict)
+        previous_names = self.last_param_names
+        result = ReparseResult(
+            dcm_object = dcm_obj,
+            added_names = [name for name in param_names if name not in previous_names],
+            changed_names = [name for name, item in param_names.items()
+                             if name in previous_names and previous_names[name] is not item],
+            removed_names = [name for name in previous_names if name not in param_names],
+        )
+        self.block_hashes = block_hashes
+        self.last_param_names = param_names
+        return result
+
+    def create_lazy_dcm_object(self):
+        '''
+        Builds the name -> (type, byte offset, length) index in one scan and returns a DCMObject
+        holding LazyParam placeholders, which parse their block on first access
+        '''
+        self.block_index = {}
+        self.all_functions = []
+        params_by_type = {type: [] for type in self.param_class_by_type}
+        with open(self.file, 'rb') as f:
+            stat = os.fstat(f.fileno())
+            ## the placeholders refuse to load from a changed file, their offsets would point to other bytes
+            loader = partial(self.load_lazy_block, (stat.st_size, stat.st_mtime_ns))
+            comments, format_spec = self.read_header(f)
+            for type, first_line, offset, length in self.iter_block_spans(f):
+                if type == FUNKTIONEN.token_string:
+                    if not self.all_functions:
+                        self.all_functions = self.create_functions_from_lines(self.load_block_lines(offset, length))
+                    continue
+                name, _ = self.get_name_size_from_first_line(first_line.decode('ISO-8859-1'), type)
+                self.block_index[name] = (type, offset, length)
+                params_by_type[type].append(LazyParam(name, type, offset, length, loader))
+
+        return self.make_dcm_object(comments, format_spec, self.all_functions, params_by_type)
+
+    def create_mmap_dcm_object(self):
+        self.all_functions = []
+        params_by_type = {type: [] for type in self.param_class_by_type}
+        with open(self.file, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            comments, format_spec = self.read_header(mm)
+            for type, _, offset, length in self.iter_block_spans(mm):
+                lines = mm[offset:offset + length].splitlines()
+                if type == FUNKTIONEN.token_string:
+                    if not self.all_functions:
+                        self.all_functions = self.create_functions_from_lines([line.decode('ISO-8859-1') for line in lines])
+                    continue
+                obj = self.create_param(lines, type)
+                if obj is not None:
+                    params_by_type[type].append(obj)
+
+        return self.make_dcm_object(comments, format_spec, self.all_functions, params_by_type)
+
+    def create_parallel_dcm_object(self, batches_per_worker=4):
+        '''
+        Finds the block boundaries in a pre-scan and parses batches of blocks in worker processes.
+        The result has the same order and _param_name_dict as a serial parse
+        '''
+        self.all_functions = []
+        params_by_type = {type: [] for type in self.param_class_by_type}
+        with open(self.file, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            comments, format_spec = self.read_header(mm)
+            spans = self.find_block_spans(mm, mm.tell())
+
+        function_spans = [span for span in spans if span[0] == FUNKTIONEN.token_string]
+        if function_spans:
+            self.all_functions = self.create_functions_from_lines(self.load_block_lines(*function_spans[0][1:]))
+        spans = [span for span in spans if span[0] != FUNKTIONEN.token_string]
+        if not spans:
+            return self.make_dcm_object(comments, format_spec, self.all_functions, params_by_type)
+
+        n_batches = max(1, min(len(spans), self.workers * batches_per_worker))
+        batch_size = -(-len(spans) // n_batches)
+        batches = [spans[i:i + batch_size] for i in range(0, len(spans), batch_size)]
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            options = [(self.file, self.array_mode)] * len(batches)
+            for batch, packed_params in zip(batches, pool.map(_parse_block_batch, options, batches)):
+                for (type, _, _), packed in zip(batch, packed_params):
+                    if packed is not None:
+                        params_by_type[type].append(self.intern_strings(unpack_param(packed)))
+
+        return self.make_dcm_object(comments, format_spec, self.all_functions, params_by_type)
+
+    def find_block_spans(self, data, start=0):
+        '''
+        Pre-scan of the block boundaries with a regex over the bytes (or mmap), same state machine as iter_block_spans.
+        Returns a list of (type, byte offset, length)
+        '''
+        spans = []
+        block_type = None
+        ## (line start, keyword group, match end) of every boundary line, the line at start has no newline before it
+        first_match = self.first_block_boundary_pattern.match(data, start)
+        boundaries = [(start, first_match.group(1), first_match.end())] if first_match else []
+        boundaries = chain(boundaries, ((match.start() + 1, match.group(1), match.end())
+                                        for match in self.block_boundary_pattern.finditer(data, start)))
+        for line_start, keyword, match_end in boundaries:
+            if block_type is None:
+                if keyword:
+                    block_type = keyword.strip().decode('ascii')
+                    block_offset = line_start
+            elif keyword is None:
+                line_end = data.find(b'\n', match_end)
+                block_end = len(data) if line_end == -1 else line_end + 1
+                spans.append((block_type, block_offset, block_end - block_offset))
+                block_type = None
+        return spans
+
+    def make_dcm_object(self, comments, format_spec, functions, params_by_type):
         return DCMObject(
             filePath = self.file,
             comments = comments,
             format_spec_version = format_spec,    # KONSERVIERUNG_FORMAT,
-            functions = self.all_functions,
-            parameters = self.processed_data['FESTWERT'],
-            parameter_block = self.processed_data['FESTWERTEBLOCK'],
-            characteristic_curve = self.processed_data['KENNLINIE'],
-            characteristic_curve_fixed = self.processed_data['FESTKENNLINIE'],
-            characteristic_curve_group = self.processed_data['GRUPPENKENNLINIE'],
-            characteristic_map = self.processed_data['KENNFELD'],
-            characteristic_map_fixed = self.processed_data['FESTKENNFELD'],
-            characteristic_map_group = self.processed_data['GRUPPENKENNFELD'],
-            distribution = self.processed_data['STUETZSTELLENVERTEILUNG']
+            functions = functions,
+            parameters = params_by_type['FESTWERT'],
+            parameter_block = params_by_type['FESTWERTEBLOCK'],
+            characteristic_curve = params_by_type['KENNLINIE'],
+            characteristic_curve_fixed = params_by_type['FESTKENNLINIE'],
+            characteristic_curve_group = params_by_type['GRUPPENKENNLINIE'],
+            characteristic_map = params_by_type['KENNFELD'],
+            characteristic_map_fixed = params_by_type['FESTKENNFELD'],
+            characteristic_map_group = params_by_type['GRUPPENKENNFELD'],
+            distribution = params_by_type['STUETZSTELLENVERTEILUNG']
          )
-            
+
+    def read_header(self, f):
+        '''
+        Reads the comment header of a binary file object up to and including the format spec line
+        '''
+        header = []
+        format_spec_bytes = self.format_spec_string.encode('ascii')
+        for line in iter(f.readline, b''):
+            if line.startswith(format_spec_bytes):
+                format_line = line.split()
+                format_value = format_line[1].decode('ISO-8859-1') if len(format_line) > 1 else None
+                comments = b''.join(header).decode('ISO-8859-1').replace('\r\n', '\n').strip()
+                return comments, format_value
+            header.append(line)
+        raise ValueError(f"{self.format_spec_string} line not found")
+
+    def iter_block_spans(self, f):
+        '''
+        Same state machine as iter_blocks on a binary file object, nothing but the keywords is decoded.
+        Yields (type, first_line, byte offset, length) for every block
+        '''
+        offset = f.tell()
+        block_type = None
+        match_block_start = self.block_start_pattern_bytes.match
+        block_end = self.block_end_string.encode('ascii')
+        for line in iter(f.readline, b''):
+            if block_type is None:
+                match = match_block_start(line)
+                if match:
+                    block_type = match.group(0).strip().decode('ascii')
+                    block_offset = offset
+                    first_line = line
+            elif line.startswith(block_end):
+                yield block_type, first_line, block_offset, offset + len(line) - block_offset
+                block_type = None
+            offset += len(line)
+
+    def load_block_lines(self, offset, length):
+        with open(self.file, 'rb') as f:
+            f.seek(offset)
+            return f.read(length).decode('ISO-8859-1').splitlines()
+
+    def load_block(self, type, offset, length):
+        return self.create_param(self.load_block_lines(offset, length), type)
+
+    def load_lazy_block(self, file_state, type, offset, length):
+        stat = os.stat(self.file)
+        if (stat.st_size, stat.st_mtime_ns) != file_state:
+            raise ValueError(f'{self.file} has changed since the lazy parse, the block can not be loaded')
+        return self.load_block(type, offset, length)
+
     def get_comments_and_spec_version(self):
         dcm_content = self.file_raw_content
         # Finding the line that starts with "KONSERVIERUNG_FORMAT" using regex
@@ -93,11 +505,31 @@ class DCMParser():
         return comments, format_value, data
 
     def create_chunks(self,data):
-        all_dict = {}
-        for item_class in self.all_param_classes:
-            all_dict[item_class.token_string.strip()] = self.chunks_for_type(data,item_class.token_string)
+        all_dict = {keyword.strip(): [] for keyword in self.block_start_keywords}
+        for type, block_lines in self.iter_blocks(data.splitlines()):
+            all_dict[type].append('\n'.join(block_lines))
         return all_dict
 
+    def iter_blocks(self, lines):
+        '''
+        Line oriented state machine, splits the data into typed blocks in one pass.
+        Yields (type, block_lines) as soon as the END line of a block is seen
+        '''
+        block_type = None
+        block_lines = []
+        match_block_start = self.block_start_pattern.match
+        for line in lines:
+            if block_type is None:
+                match = match_block_start(line)
+                if match:
+                    block_type = match.group(0).strip()
+                    block_lines = [line]
+            else:
+                block_lines.append(line)
+                if line.startswith(self.block_end_string):
+                    yield block_type, block_lines
+                    block_type = None
+
     def chunks_for_type(self,data,type):        
         # This pattern matches the starting keyword, followed by any content (including newline),
         # up until the next 'END' that's at the start of a line.
@@ -112,60 +544,115 @@ class DCMParser():
         '''
         each line can be parsed as seperate objects
         '''
-        all_objects = []
         if len(in_str) > 0:
-            content = in_str[0].splitlines()
-            for line in content[1:-1]: # 1st and last line are KEYWORDS
-                match  = FUNKTIONEN.extract_regex.match(line)
-                if match:
-                    function_type = match.group(1)
-                    version = match.group(2)
-                    description = match.group(3)
-                    # print(f'Function Type: {function_type}, Version: {version}, Description: {description}')
-                    curr_obj = FUNKTIONEN(function = function_type,
-                                            version = version,
-                                            description = description
-                                    )
-                    all_objects.append(curr_obj)        
-                else :
-                    raise Exception(f'Malformed inupt for FUNKTIONEN :{line}')
+            return self.create_functions_from_lines(in_str[0].splitlines())
+        return []
+
+    def create_functions_from_lines(self, content):
+        all_objects = []
+        for line in content[1:-1]: # 1st and last line are KEYWORDS
+            match  = FUNKTIONEN.extract_regex.match(line)
+            if match:
+                function_type = match.group(1)
+                version = match.group(2)
+                description = match.group(3)
+                # print(f'Function Type: {function_type}, Version: {version}, Description: {description}')
+                curr_obj = FUNKTIONEN(function = function_type,
+                                        version = version,
+                                        description = description
+                                )
+                all_objects.append(curr_obj)        
+            else :
+                raise Exception(f'Malformed inupt for FUNKTIONEN :{line}')
         return all_objects
     
     def process_param_chunk(self, chunk_liststr, type):
         processed_chunks = []  # List to store processed data chunks
         
         for ele in chunk_liststr:
-            lines = ele.splitlines()
-            name, size = self.get_name_size_from_first_line(lines[0], type)  
-
-            extracted_values, extracted_multi_line_values = self.give_param_attributes(lines[1:-1])
-
-            # Combine single line and multi-line attributes
-            combined_attributes = {**extracted_values}
-            for key, value in extracted_multi_line_values.items():
-                # Convert the lists to appropriate types if needed (for example, float)
-                if value:
-                    if key == 'text':  # Handle the text attribute differently
-                        combined_attributes[key] = value[0]  # Assuming there's only one text value
-                    else:
-                        try:
-                            combined_attributes[key] = list(map(float, value))
-                        except ValueError:  # Handle non-numeric values
-                            combined_attributes[key] = value  
-
-            # Adding name and size if present
-            combined_attributes['name'] = name
-            if size:
-                combined_attributes['size'] = [int(x) for x in size]  # Convert to int or other type as required
-
-            # Dynamically create an object based on the type
-            param_class = next((cls for cls in self.all_param_classes if cls.token_string.strip() == type), None)
-            if param_class:
-                obj = param_class(**combined_attributes)
+            obj = self.create_param(ele.splitlines(), type)
+            if obj is not None:
                 processed_chunks.append(obj)
             
         return processed_chunks
 
+    def create_param(self, lines, type):
+        '''
+        Creates the parameter object for the lines of one block, first and last line are KEYWORDS.
+        The lines can be str or bytes
+        '''
+        if self.stats is not None:
+            return self.create_param_profiled(lines, type)
+        return self.build_param(type, *self.param_attributes(lines, type))
+
+    def create_param_profiled(self, lines, type):
+        ## create_param with the attributes and construction phases recorded
+        start = perf_counter()
+        attributes = self.param_attributes(lines, type)
+        middle = perf_counter()
+        obj = self.build_param(type, *attributes)
+        end = perf_counter()
+        self.stats.record('attributes', middle - start, sum(map(len, lines)) + len(lines), type=type)
+        self.stats.record('construction', end - middle, objects=obj is not None, type=type)
+        return obj
+
+    def param_attributes(self, lines, type):
+        '''
+        name, size and the keyword arguments of the parameter class for the lines of one block
+        '''
+        if isinstance(lines[0], bytes):
+            name, size = self.get_name_size_from_first_line_bytes(lines[0], type)
+            extracted_values, extracted_multi_line_values = self.give_param_attributes_bytes(lines[1:-1])
+        else:
+            name, size = self.get_name_size_from_first_line(lines[0], type)  
+            extracted_values, extracted_multi_line_values = self.give_param_attributes(lines[1:-1])
+
+        # Combine single line and multi-line attributes
+        combined_attributes = {**extracted_values}
+        for key, value in extracted_multi_line_values.items():
+            if value and self.array_mode and key in self.array_attrs:
+                shape = [int(x) for x in reversed(size)] if (size and key == 'wert') else None
+                values = values_to_array(value, shape)
+                if values is not None:
+                    combined_attributes[key] = values
+                    continue
+            # Convert the lists to appropriate types if needed (for example, float)
+            if value:
+                if key == 'text':  # Handle the text attribute differently
+                    combined_attributes[key] = value[0]  # Assuming there's only one text value
+                else:
+                    try:
+                        combined_attributes[key] = list(map(float, value))
+                    except ValueError:  # Handle non-numeric values
+                        combined_attributes[key] = [x.decode('ISO-8859-1') if isinstance(x, bytes) else x for x in value]
+
+        for key in self.interned_attrs:
+            if key in combined_attributes:
+                combined_attributes[key] = sys.intern(combined_attributes[key])
+
+        return name, size, combined_attributes
+
+    def intern_strings(self, param):
+        ## strings unpickled from a worker are new objects, interned again they are stored once per process
+        param.name = sys.intern(param.name)
+        for attr in self.interned_attrs:
+            value = getattr(param, attr, None)
+            if isinstance(value, str):
+                setattr(param, attr, sys.intern(value))
+        return param
+
+    def build_param(self, type, name, size, combined_attributes):
+        # Adding name and size if present
+        combined_attributes['name'] = name
+        if size:
+            combined_attributes['size'] = [int(x) for x in size]  # Convert to int or other type as required
+
+        # Dynamically create an object based on the type
+        param_class = self.param_class_by_type.get(type)
+        if param_class:
+            return param_class(**combined_attributes)
+        return None
+
     def give_param_attributes(self, lines):
         # Dictionaries to hold the extracted values
         extracted_single_line_values = {}
@@ -191,8 +678,37 @@ class DCMParser():
 
         return extracted_single_line_values, extracted_multi_line_values
 
+    def give_param_attributes_bytes(self, lines):
+        '''
+        give_param_attributes for bytes lines, values stay bytes until they are converted to float
+        '''
+        extracted_single_line_values = {}
+        extracted_multi_line_values = {key: [] for key in self.possible_multi_line_attrs.values()}
+
+        for line in lines:
+            single_match = self.single_line_attrs_keywords_pattern_bytes.search(line)
+            if single_match:
+                var_name = self.single_line_attrs[single_match.group(1).decode('ascii').upper()]
+                extracted_single_line_values[var_name] = single_match.group(2).decode('ISO-8859-1')
+                continue
+
+            multi_match = self.multi_line_attrs_keywords_pattern_bytes.search(line)
+            if multi_match:
+                var_name = self.possible_multi_line_attrs[multi_match.group(1).decode('ascii').upper()]
+                extracted_multi_line_values[var_name].extend(multi_match.group(2).split())
+
+        return extracted_single_line_values, extracted_multi_line_values
+
+    def get_name_size_from_first_line_bytes(self, line, type):
+        match = self.name_and_size_patterns_bytes[type].match(line)
+        name = match.group(1).decode('ISO-8859-1')
+        size = [x for x in match.group(2, 3) if x is not None] or None
+        return name, size
+
     def get_name_size_from_first_line (self,line,type):
-        name_and_size_pattern= re.compile(rf'^{re.escape(type)}\s+([a-zA-Z0-9_\.]+)(?:\s+(\d+)(?:\s+(\d+))?)?')
+        name_and_size_pattern = self.name_and_size_patterns.get(type)
+        if name_and_size_pattern is None:
+            name_and_size_pattern= re.compile(rf'^{re.escape(type)}\s+([a-zA-Z0-9_\.]+)(?:\s+(\d+)(?:\s+(\d+))?)?')
         match = name_and_size_pattern.match(line)
         size = None
         if match:
@@ -205,3 +721,19 @@ class DCMParser():
             if size1:
                 size = [size1]  ## this can be None for things that are size 1
         return name,size       
+
+
+def _parse_block_batch(options, spans):
+    ## runs in a worker of create_parallel_dcm_object, parameters go back in the compact form
+    dcm_file, array_mode = options
+    parser = DCMParser(dcm_file, array_mode=array_mode)
+    start = spans[0][1]
+    end = spans[-1][1] + spans[-1][2]
+    with open(dcm_file, 'rb') as f:
+        f.seek(start)
+        data = f.read(end - start)
+    packed_params = []
+    for type, offset, length in spans:
+        obj = parser.create_param(data[offset - start:offset - start + length].splitlines(), type)
+        packed_params.append(None if obj is None else pack_param(obj))
+    return packed_params
@@ -0,0 +1,127 @@
+'''
+Opt-in instrumentation of parse and write: wall time, calls, bytes and objects per phase and per parameter type.
+Without a ParseStats the parser and DCMObject only check for None at the phase boundaries
+'''
+from contextlib import contextmanager
+from dataclasses import dataclass, field, asdict
+from time import perf_counter
+from typing import Callable, Dict, Optional
+
+## the ParseStats collecting process_wert times while a parse runs, process_wert has no reference to the parser
+active = None
+
+
+@dataclass
+class PhaseStats:
+    seconds: float = 0.0
+    calls: int = 0
+    bytes: int = 0
+    objects: int = 0
+
+    def add(self, seconds, nbytes=0, objects=0):
+        self.seconds += seconds
+        self.calls += 1
+        self.bytes += nbytes
+        self.objects += objects
+
+
+class _Measurement:
+    __slots__ = ('bytes', 'objects')
+
+    def __init__(self, nbytes=0, objects=0):
+        self.bytes = nbytes
+        self.objects = objects
+
+
+class _NoMeasurement:
+    ## yielded by phase when profiling is off, bytes and objects set on it are dropped
+    __slots__ = ()
+
+    def __setattr__(self, name, value):
+        pass
+
+
+_no_measurement = _NoMeasurement()
+
+
+@dataclass
+class ParseStats:
+    '''
+    Phases of the parse: header, chunks, functions, attributes (name, size and attribute lines of a block),
+    construction (the parameter object, process_wert included), process_wert, objects (the DCMObject) and parse
+    for the whole create_dcm_object. Of the write: render per parameter and write for the whole output.
+    callback(operation, stats) is called when a parse or write has finished, e.g. for a metrics exporter
+    '''
+    callback: Optional[Callable[[str, "ParseStats"], None]] = None
+    phases: Dict[str, PhaseStats] = field(default_factory=dict)
+    by_type: Dict[str, Dict[str, PhaseStats]] = field(default_factory=dict)   # phase -> parameter type -> stats
+
+    def record(self, phase, seconds, nbytes=0, objects=0, type=None):
+        stats = self.phases.get(phase)
+        if stats is None:
+            stats = self.phases[phase] = PhaseStats()
+        stats.add(seconds, nbytes, objects)
+        if type is not None:
+            types = self.by_type.setdefault(phase, {})
+            stats = types.get(type)
+            if stats is None:
+                stats = types[type] = PhaseStats()
+            stats.add(seconds, nbytes, objects)
+
+    @contextmanager
+    def operation(self, name, nbytes=0):
+        '''
+        Times a whole parse or write as the phase name, the callback gets the stats afterwards
+        '''
+        global active
+        previous, active = active, self
+        measurement = _Measurement(nbytes)
+        start = perf_counter()
+        try:
+            yield measurement
+        finally:
+            active = previous
+        self.record(name, perf_counter() - start, measurement.bytes, measurement.objects)
+        if self.callback is not None:
+            self.callback(name, self)
+
+    def as_dict(self):
+        return {
+            'phases': {name: asdict(stats) for name, stats in self.phases.items()},
+            'by_type': {phase: {type: asdict(stats) for type, stats in types.items()}
+                        for phase, types in self.by_type.items()},
+        }
+
+    def reset(self):
+        self.phases.clear()
+        self.by_type.clear()
+
+    def report(self):
+        lines = [f'{"phase":<28}{"seconds":>10}{"calls":>10}{"bytes":>14}{"objects":>10}']
+        for name, stats in sorted(self.phases.items(), key=lambda item: -item[1].seconds):
+            lines.append(f'{name:<28}{stats.seconds:>10.4f}{stats.calls:>10}{stats.bytes:>14}{stats.objects:>10}')
+            for type, type_stats in sorted(self.by_type.get(name, {}).items(), key=lambda item: -item[1].seconds):
+                lines.append(f'  {type:<26}{type_stats.seconds:>10.4f}{type_stats.calls:>10}'
+                             f'{type_stats.bytes:>14}{type_stats.objects:>10}')
+        return '\n'.join(lines)
+
+
+@contextmanager
+def phase(stats, name, nbytes=0, type=None):
+    '''
+    Times the block as phase name if stats is a ParseStats, bytes and objects can be set on the yielded measurement
+    '''
+    if stats is None:
+        yield _no_measurement
+        return
+    measurement = _Measurement(nbytes)
+    start = perf_counter()
+    yield measurement
+    stats.record(name, perf_counter() - start, measurement.bytes, measurement.objects, type)
+
+
+def as_stats(stats):
+    ## the stats argument of DCMParser: None / False, True for a new ParseStats, or a ParseStats to add to
+    if stats is True:
+        return ParseStats()
+    return stats or None
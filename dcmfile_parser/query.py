@@ -0,0 +1,172 @@
+'''
+Indexes for the queries of DCMObject.query: a sorted name list for prefix and range queries and
+secondary indexes on funktion, parameter class and unit. DCMObject keeps the index up to date in its
+mutation methods once it is built. The funktion and unit indexes are built by the first query using them,
+the other queries do not load the LazyParams of a lazy DCMObject
+'''
+from bisect import bisect_left, bisect_right, insort
+from fnmatch import fnmatchcase
+import re
+from .lazy_param import LazyParam
+from .utils import gc_paused
+
+unit_attrs = ('einheit_w', 'einheit_x', 'einheit_y')
+glob_special = re.compile(r'[*?\[]')
+
+
+def normalize(value):
+    ## funktion and units are stored with the quotes of the file
+    return value.strip().strip('"') if isinstance(value, str) else value
+
+
+class _Normalized(dict):
+    ## memo of normalize, funktion and unit values repeat across many parameters
+    __slots__ = ()
+
+    def __missing__(self, value):
+        self[value] = normalized = normalize(value)
+        return normalized
+
+
+def type_name_of(item):
+    ## the block keyword of a LazyParam is the class name of the parameter it loads
+    return item.type if isinstance(item, LazyParam) else type(item).__name__
+
+
+class ParamIndex:
+    __slots__ = ('items', 'attributes_indexed', 'sorted_names', 'index_keys', 'by_funktion', 'by_type', 'by_unit',
+                 'normalized')
+
+    def __init__(self, param_name_dict=None):
+        self.items = {} if param_name_dict is None else param_name_dict   # the live name -> (item, attr) dict
+        self.attributes_indexed = False   # by_funktion and by_unit are built
+        self.sorted_names = []
+        self.index_keys = {}   # name -> the (index, key) entries made for it, a later change of funktion is not seen
+        self.by_funktion = {}
+        self.by_type = {}
+        self.by_unit = {}
+        self.normalized = _Normalized()
+        if param_name_dict:
+            with gc_paused():
+                for name, (item, _) in param_name_dict.items():
+                    self._add_secondary(name, item)
+                self.sorted_names = sorted(self.index_keys)
+
+    def _keys(self, item):
+        keys = [(self.by_type, type_name_of(item))]
+        if self.attributes_indexed:
+            keys += self._attribute_keys(item)
+        return keys
+
+    def _attribute_keys(self, item):
+        normalized = self.normalized
+        keys = [(self.by_funktion, normalized[getattr(item, 'funktion', '')])]
+        for attr in unit_attrs:
+            unit = normalized[getattr(item, attr, '')]
+            if unit:
+                keys.append((self.by_unit, unit))
+        return keys
+
+    def _add_secondary(self, name, item):
+        keys = self._keys(item)
+        self.index_keys[name] = keys
+        for index, key in keys:
+            index.setdefault(key, set()).add(name)
+
+    def index_attributes(self):
+        '''
+        Builds the funktion and unit indexes, which loads the LazyParams
+        '''
+        if self.attributes_indexed:
+            return
+        self.attributes_indexed = True
+        with gc_paused():
+            for name in self.sorted_names:
+                keys = self._attribute_keys(self.items[name][0])
+                self.index_keys[name] += keys
+                for index, key in keys:
+                    index.setdefault(key, set()).add(name)
+
+    def add(self, name, item):
+        if name in self.index_keys:
+            self.remove(name)
+        insort(self.sorted_names, name)
+        self._add_secondary(name, item)
+
+    def remove(self, name):
+        keys = self.index_keys.pop(name, None)
+        if keys is None:
+            return
+        position = bisect_left(self.sorted_names, name)
+        if position < len(self.sorted_names) and self.sorted_names[position] == name:
+            del self.sorted_names[position]
+        for index, key in keys:
+            names = index.get(key)
+            if names is not None:
+                names.discard(name)
+                if not names:
+                    del index[key]
+
+    def names_in_range(self, start=None, end=None):
+        '''
+        Names with start <= name < end, in sorted order
+        '''
+        low = 0 if start is None else bisect_left(self.sorted_names, start)
+        high = len(self.sorted_names) if end is None else bisect_left(self.sorted_names, end)
+        return self.sorted_names[low:high]
+
+    def names_with_prefix(self, prefix):
+        low = bisect_left(self.sorted_names, prefix)
+        high = bisect_right(self.sorted_names, prefix + '\U0010ffff')
+        return self.sorted_names[low:high]
+
+    def names_matching(self, pattern):
+        '''
+        Names matching a glob pattern, the literal part before the first wildcard is a prefix query
+        '''
+        special = glob_special.search(pattern)
+        if special is None:
+            return [pattern] if pattern in self.index_keys else []
+        candidates = self.names_with_prefix(pattern[:special.start()])
+        if pattern[special.start():] == '*':
+            return candidates
+        return [name for name in candidates if fnmatchcase(name, pattern)]
+
+    def query(self, name=None, start=None, end=None, funktion=None, param_type=None, unit=None):
+        '''
+        Names of the parameters matching all given criteria, in sorted order.
+        name : exact name or glob pattern (InjCtl_*), start / end : name range, end excluded
+        funktion, unit : compared without the quotes of the file, param_type : class name or class, or a list of them
+        '''
+        ordered = None
+        if name is not None:
+            ordered = self.names_matching(name)
+        if start is not None or end is not None:
+            in_range = self.names_in_range(start, end)
+            ordered = in_range if ordered is None else [n for n in ordered if (start is None or n >= start)
+                                                        and (end is None or n < end)]
+
+        selections = []
+        if funktion is not None or unit is not None:
+            self.index_attributes()
+        if funktion is not None:
+            selections.append(self.by_funktion.get(normalize(funktion), set()))
+        if param_type is not None:
+            types = param_type if isinstance(param_type, (list, tuple, set)) else [param_type]
+            type_selections = [self.by_type.get(t if isinstance(t, str) else t.__name__, set()) for t in types]
+            selections.append(type_selections[0] if len(type_selections) == 1 else set().union(*type_selections))
+        if unit is not None:
+            selections.append(self.by_unit.get(normalize(unit), set()))
+
+        if not selections:
+            return list(self.sorted_names) if ordered is None else ordered
+        ## set intersections iterate the smaller set, the large index sets are never copied
+        selections.sort(key=len)
+        selected = selections[0]
+        for selection in selections[1:]:
+            selected = selected & selection
+        if ordered is None:
+            return sorted(selected)
+        if len(ordered) < len(selected):
+            return [n for n in ordered if n in selected]
+        return sorted(selected.intersection(ordered))
@@ -0,0 +1,57 @@
+'''
+Compact form of a DCMObject made of tuples and lists only, cheap to pickle between processes.
+Parameters are restored without running __init__ / __post_init__ again, the values are already processed
+'''
+from dataclasses import fields
+import hashlib
+from .attribute_classes import FUNKTIONEN, FESTWERT, FESTWERTEBLOCK, KENNLINIE, FESTKENNLINIE, GRUPPENKENNLINIE
+from .attribute_classes import KENNFELD, FESTKENNFELD, GRUPPENKENNFELD, STUETZSTELLENVERTEILUNG
+from .dcm_object import DCMObject
+from .lazy_param import LazyParam
+
+param_classes = {cls.__name__: cls for cls in [FESTWERT, FESTWERTEBLOCK, KENNLINIE, FESTKENNLINIE, GRUPPENKENNLINIE,
+                                               KENNFELD, FESTKENNFELD, GRUPPENKENNFELD, STUETZSTELLENVERTEILUNG]}
+## the init fields of every class, in the order of the packed values
+packed_fields = {name: tuple(f.name for f in fields(cls) if f.init) for name, cls in param_classes.items()}
+## changes with any change of the packed fields, stored data of another layout can not be unpacked
+layout_hash = hashlib.blake2b(repr(sorted(packed_fields.items())).encode(), digest_size=8).hexdigest()
+
+
+def _make_unpacker(cls, field_names):
+    ## one tuple assignment into the slots, generated per class as a loop over the slot descriptors is much slower
+    targets = ''.join(f'param.{name}, ' for name in field_names)
+    namespace = {'new': cls.__new__, 'cls': cls}
+    exec(f'def unpack(values):\n    param = new(cls)\n    {targets}= values\n    return param', namespace)
+    return namespace['unpack']
+
+
+unpackers = {name: _make_unpacker(cls, packed_fields[name]) for name, cls in param_classes.items()}
+
+
+def pack_param(param):
+    if isinstance(param, LazyParam):
+        param = param.materialize()
+    type_name = type(param).__name__
+    return type_name, tuple(getattr(param, name) for name in packed_fields[type_name])
+
+
+def unpack_param(packed):
+    type_name, values = packed
+    return unpackers[type_name](values)
+
+
+def pack_dcm_object(dcm_obj):
+    functions = [(func.function, func.version, func.description) for func in dcm_obj.functions]
+    params = {attr: [pack_param(param) for param in getattr(dcm_obj, attr)] for attr in dcm_obj._param_attributes}
+    return dcm_obj.filePath, dcm_obj.comments, dcm_obj.format_spec_version, functions, params
+
+
+def unpack_dcm_object(packed):
+    file_path, comments, format_spec_version, functions, params = packed
+    return DCMObject(
+        filePath = file_path,
+        comments = comments,
+        format_spec_version = format_spec_version,
+        functions = [FUNKTIONEN(*func) for func in functions],
+        **{attr: [unpack_param(param) for param in packed_params] for attr, packed_params in params.items()}
+    )
@@ -0,0 +1,111 @@
+'''
+Byte spans of the blocks of a parsed file, used by DCMObject.write to copy unchanged blocks verbatim
+from the source file and to render only changed, added or removed ones
+'''
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+import os
+import shutil
+
+copy_chunk_size = 1 << 20
+
+
+@dataclass
+class SourceMap:
+    path: str
+    size: int
+    mtime_ns: int
+    header_end: int                              # byte offset after the format spec line
+    comments: str
+    format_spec_version: str
+    functions: List[Tuple[str, str, str]]
+    function_span: Optional[Tuple[int, int]]     # (offset, length) of the FUNKTIONEN block
+    blocks: List[Tuple[str, int, int]]           # (name, offset, length) of the parameter blocks in file order
+    items: Dict[str, Any] = field(repr=False)    # name -> the parameter object parsed from the block
+
+    def is_current(self):
+        '''
+        False if the source file was changed or removed after the parse
+        '''
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return False
+        return stat.st_size == self.size and stat.st_mtime_ns == self.mtime_ns
+
+
+def copy_range(src, dst, offset, length):
+    '''
+    Copies length bytes at offset of the binary file src to the current position of the unbuffered binary file dst,
+    in the kernel with copy_file_range where it is available
+    '''
+    copy_file_range = getattr(os, 'copy_file_range', None)
+    if copy_file_range is not None:
+        try:
+            while length:
+                copied = copy_file_range(src.fileno(), dst.fileno(), length, offset)
+                if not copied:
+                    break
+                offset += copied
+                length -= copied
+            if not length:
+                return
+        except OSError:   # e.g. not supported between these file systems, the rest is copied below
+            pass
+    src.seek(offset)
+    while length:
+        chunk = src.read(min(length, copy_chunk_size))
+        if not chunk:
+            raise ValueError(f'{src.name} is shorter than its source map')
+        dst.write(chunk)
+        length -= len(chunk)
+
+
+@contextmanager
+def replacing(path):
+    '''
+    Yields a temporary path next to path, which is moved into place when the block completes and removed if it fails.
+    The target is not touched before, so it can be a file the content is read from while writing
+    '''
+    tmp_path = f'{path}.tmp{os.getpid()}'
+    try:
+        yield tmp_path
+        if os.path.exists(path):
+            shutil.copymode(path, tmp_path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except FileNotFoundError:
+            pass
+        raise
+
+
+def write_pieces(pieces, source_path, path, encoding='ISO-8859-1'):
+    '''
+    pieces : ('copy', offset, length) ranges of the source file and ('text', str) rendered content, in output order.
+    Adjacent ranges are copied in one go. The file is written next to path and moved into place, so path can be
+    the source file itself
+    '''
+    with replacing(path) as tmp_path, open(source_path, 'rb') as src, open(tmp_path, 'wb', buffering=0) as dst:
+        pending = None   # (offset, length) of the copy range being extended
+        for piece in pieces:
+            if piece[0] == 'copy':
+                _, offset, length = piece
+                if pending and pending[0] + pending[1] == offset:
+                    pending = (pending[0], pending[1] + length)
+                    continue
+                if pending:
+                    copy_range(src, dst, *pending)
+                pending = (offset, length)
+            else:
+                if pending:
+                    copy_range(src, dst, *pending)
+                    pending = None
+                data = piece[1].encode(encoding)
+                view = memoryview(data)
+                while view:
+                    view = view[dst.write(view):]
+        if pending:
+            copy_range(src, dst, *pending)
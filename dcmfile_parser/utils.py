@@ -0,0 +1,14 @@
+from contextlib import contextmanager
+import gc
+
+
+@contextmanager
+def gc_paused():
+    ## the collector would run many times while a large number of objects is created at once, none of them is garbage
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
@@ -1,13 +1,19 @@
 from setuptools import find_packages, setup
 
-with open("README.md", "r") as f:
+with open("README.MD", "r") as f:
     long_description = f.read()
 
+## the version is defined once, in the package
+version = {}
+with open("dcmfile_parser/version.py", "r") as f:
+    exec(f.read(), version)
+
 setup(
     name="dcmfile-parser",
-    version="0.0.2",
+    version=version["__version__"],
     description="parser for dcm files",
-    packages=find_packages(where="app"),
+    packages=find_packages(exclude=["tests", "benchmarks"]),
+    package_data={"dcmfile_parser": ["templates/*.jinja2"]},
     long_description=long_description,
     long_description_content_type="text/markdown",
     url="https://github.com/y-menace/dcmfile-parser",
@@ -19,9 +25,13 @@ setup(
         "Programming Language :: Python :: 3.10",
         "Operating System :: OS Independent",
     ],
-    install_requires=["jinja2"],
+    install_requires=["numpy"],
     extras_require={
         "dev": ["pytest", "twine"],
+        "templates": ["jinja2"],
+    },
+    entry_points={
+        "console_scripts": ["dcmfile-parser=dcmfile_parser.cli:main"],
     },
     python_requires=">=3.8",
 )
\ No newline at end of file
@@ -18,9 +18,9 @@ def sample_dcm_file(tmp_path):
     return dcm_obj
 
 @pytest.mark.parametrize("export_file", ["test.dcm"])
-def test_export(sample_dcm_file, export_file):
+def test_export(sample_dcm_file, export_file, tmp_path):
     dcm_obj = sample_dcm_file
-    dcm_obj.write(export_file)
+    dcm_obj.write(str(tmp_path / export_file))
 
 
 @pytest.mark.parametrize("attribute_type,attribute_name,expected_wert", [
@@ -57,3 +57,648 @@ def test_attribute_wert_read(sample_dcm_file, attribute_type, attribute_name, ex
     # Depending on attribute_type, access the relevant WERT value or values
     assert attribute_object.wert == expected_wert
 
+
+@pytest.mark.parametrize("dcm_file", ["tests/sample1.dcm", "tests/sample2.dcm"])
+def test_single_pass_chunks_match_per_type_chunks(dcm_file):
+    dcmfile_parser = DCMParser(dcm_file)
+    _, _, rest_data = dcmfile_parser.get_comments_and_spec_version()
+    chunks = dcmfile_parser.create_chunks(rest_data)
+    for keyword in dcmfile_parser.block_start_keywords:
+        assert chunks[keyword.strip()] == dcmfile_parser.chunks_for_type(rest_data, keyword)
+
+
+def test_iter_parameters_yields_same_objects(sample_dcm_file):
+    dcmfile_parser = DCMParser('tests/sample1.dcm')
+    streamed = list(dcmfile_parser.iter_parameters())
+    functions = [item for item in streamed if type(item).__name__ == 'FUNKTIONEN']
+    params = {item.name: item for item in streamed if hasattr(item, 'name')}
+
+    assert functions == sample_dcm_file.functions
+    assert dcmfile_parser.comments == sample_dcm_file.comments
+    assert dcmfile_parser.format_spec_version == sample_dcm_file.format_spec_version
+    assert params.keys() == sample_dcm_file._param_name_dict.keys()
+    for name, item in params.items():
+        assert str(item) == str(sample_dcm_file._param_name_dict[name][0])
+
+
+def test_lazy_dcm_object(sample_dcm_file):
+    dcmfile_parser = DCMParser('tests/sample1.dcm', lazy=True)
+    lazy_obj = dcmfile_parser.create_dcm_object()
+
+    assert lazy_obj._param_name_dict.keys() == sample_dcm_file._param_name_dict.keys()
+    assert dcmfile_parser.block_index['map'][0] == 'KENNFELD'
+    item, _ = lazy_obj._param_name_dict['map']
+    assert not item.is_loaded
+    assert item.wert == sample_dcm_file._param_name_dict['map'][0].wert
+    assert item.is_loaded
+    assert not lazy_obj._param_name_dict['matrix'][0].is_loaded
+
+    assert lazy_obj.remove_parameter_by_name('matrix')
+    sample_dcm_file.remove_parameter_by_name('matrix')
+    assert str(lazy_obj) == str(sample_dcm_file)
+
+
+def test_lazy_dcm_object_writes_to_its_own_file(tmp_path, sample_dcm_file):
+    dcm_file = tmp_path / 'sample1.dcm'
+    dcm_file.write_bytes(open('tests/sample1.dcm', 'rb').read())
+    lazy_obj = DCMParser(str(dcm_file), lazy=True).create_dcm_object()
+
+    lazy_obj.write()
+    sample_dcm_file.write(str(tmp_path / 'eager.dcm'))
+    assert dcm_file.read_bytes() == (tmp_path / 'eager.dcm').read_bytes()
+    assert sorted(os.listdir(tmp_path)) == ['eager.dcm', 'sample1.dcm']
+
+
+def test_write_encodes_iso_8859_1(tmp_path, sample_dcm_file):
+    sample_dcm_file.set_parameter_attribute('parameter', 'einheit_w', '"\u00b0C"')
+    sample_dcm_file.write(str(tmp_path / 'out.dcm'))
+    content = (tmp_path / 'out.dcm').read_bytes()
+    assert b'"\xb0C"' in content and b'\xc2' not in content
+    assert content.decode('ISO-8859-1') == str(sample_dcm_file)
+
+
+@pytest.mark.parametrize("dcm_file", ["tests/sample1.dcm", "tests/sample2.dcm"])
+def test_mmap_parse_matches_text_parse(dcm_file):
+    mmap_obj = DCMParser(dcm_file, use_mmap=True).create_dcm_object()
+    text_obj = DCMParser(dcm_file).create_dcm_object()
+
+    assert mmap_obj.comments == text_obj.comments
+    assert mmap_obj.format_spec_version == text_obj.format_spec_version
+    assert mmap_obj.functions == text_obj.functions
+    assert str(mmap_obj) == str(text_obj)
+
+
+@pytest.mark.parametrize("dcm_file", ["tests/sample1.dcm", "tests/sample2.dcm"])
+def test_array_mode(dcm_file):
+    array_obj = DCMParser(dcm_file, array_mode=True).create_dcm_object()
+    list_obj = DCMParser(dcm_file).create_dcm_object()
+    assert str(array_obj) == str(list_obj)
+
+    for name, (item, _) in array_obj._param_name_dict.items():
+        if getattr(item, 'size', None) and len(item.size) == 2 and type(item).__name__.endswith('KENNFELD'):
+            assert item.wert.shape == (item.size[1], item.size[0])
+            assert item.wert.ravel().tolist() == list_obj._param_name_dict[name][0].wert
+
+    array_obj.update_from(list_obj)
+    assert str(array_obj) == str(list_obj)
+
+
+def test_parameters_are_slotted(sample_dcm_file):
+    for item, _ in sample_dcm_file._param_name_dict.values():
+        assert not hasattr(item, '__dict__')
+        assert item.token_string == type(item).token_string
+    assert not hasattr(sample_dcm_file.functions[0], '__dict__')
+
+
+@pytest.mark.parametrize("dcm_file", ["tests/sample1.dcm", "tests/sample2.dcm"])
+def test_compiled_emitters_match_templates(dcm_file):
+    pytest.importorskip('jinja2')
+    dcm_obj = DCMParser(dcm_file).create_dcm_object()
+    assert dcm_obj.to_string() == dcm_obj.to_string(backend='jinja2')
+
+
+@pytest.mark.parametrize("buffer_size", [1, 1 << 16])
+def test_write_to_streams(sample_dcm_file, buffer_size):
+    import gzip
+    import io
+
+    text_stream = io.StringIO()
+    sample_dcm_file.write_to(text_stream, buffer_size=buffer_size)
+    assert text_stream.getvalue() == str(sample_dcm_file)
+
+    binary_stream = io.BytesIO()
+    with gzip.GzipFile(fileobj=binary_stream, mode='wb') as gz:
+        sample_dcm_file.write_to(gz, buffer_size=buffer_size)
+    assert gzip.decompress(binary_stream.getvalue()).decode('ISO-8859-1') == str(sample_dcm_file)
+
+
+def test_update_from_change_set(sample_dcm_file):
+    other = DCMParser('tests/sample1.dcm').create_dcm_object()
+    other._param_name_dict['map'][0].wert[3] = 1.505   # within the tolerance
+    other._param_name_dict['map'][0].wert[4] = 5.0
+    other._param_name_dict['line_curve'][0].st_x = [1.0, 2.0]
+    other.remove_parameter_by_name('parameter')
+
+    diff = sample_dcm_file.diff_report(other)
+    assert [change.as_dict() for change in diff.changes if change.name == 'map'] == [
+        {'name': 'map', 'attribute': 'wert', 'indices': [4], 'old': [1.9], 'new': [5.0]}]
+    assert diff.by_name()['line_curve']['st_x'].indices is None
+    assert sample_dcm_file._param_name_dict['map'][0].wert[4] == 1.9
+    assert diff.missing_names == ['parameter']
+
+    change_set = sample_dcm_file.update_from(other)
+    assert change_set.updated_names == ['line_curve', 'map']
+    assert sample_dcm_file._param_name_dict['map'][0].wert[3:5] == [1.5, 5.0]
+    assert sample_dcm_file._param_name_dict['line_curve'][0].st_x == [1.0, 2.0]
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_parse_many(workers):
+    from dcmfile_parser import parse_many
+    results = parse_many(['tests/sample1.dcm', 'tests/missing.dcm', 'tests/sample2.dcm'], workers=workers)
+
+    assert [result.path for result in results] == ['tests/sample1.dcm', 'tests/missing.dcm', 'tests/sample2.dcm']
+    assert [result.ok for result in results] == [True, False, True]
+    assert isinstance(results[1].error, FileNotFoundError)
+    for result in results[::2]:
+        assert str(result.dcm_object) == str(DCMParser(result.path).create_dcm_object())
+
+
+@pytest.mark.parametrize("dcm_file", ["tests/sample1.dcm", "tests/sample2.dcm"])
+@pytest.mark.parametrize("array_mode", [False, True])
+def test_parallel_parse_matches_serial_parse(dcm_file, array_mode):
+    parallel_obj = DCMParser(dcm_file, array_mode=array_mode, workers=2).create_dcm_object()
+    serial_obj = DCMParser(dcm_file, array_mode=array_mode).create_dcm_object()
+
+    assert parallel_obj.comments == serial_obj.comments
+    assert parallel_obj.functions == serial_obj.functions
+    assert list(parallel_obj._param_name_dict) == list(serial_obj._param_name_dict)
+    assert str(parallel_obj) == str(serial_obj)
+    for item, _ in parallel_obj._param_name_dict.values():
+        assert item.name is sys.intern(item.name)
+        assert item.funktion is sys.intern(item.funktion)
+
+
+def test_parallel_parse_without_parameters(tmp_path):
+    dcm_file = tmp_path / 'functions.dcm'
+    dcm_file.write_text('KONSERVIERUNG_FORMAT 2.0\n\nFUNKTIONEN\n  FKT MapFunction "4.1" "Function for map functions"\nEND\n')
+    parallel_obj = DCMParser(str(dcm_file), workers=2).create_dcm_object()
+
+    assert parallel_obj._param_name_dict == {}
+    assert parallel_obj.functions == DCMParser(str(dcm_file)).create_dcm_object().functions
+    assert len(parallel_obj.functions) == 1
+
+
+def test_parse_cache(tmp_path, monkeypatch):
+    import shutil
+    from dcmfile_parser import ParseCache, cache as cache_module
+    dcm_file = tmp_path / 'sample1.dcm'
+    shutil.copy('tests/sample1.dcm', dcm_file)
+    cache = ParseCache(tmp_path / 'cache')
+    expected = str(DCMParser(dcm_file).create_dcm_object())
+
+    assert str(DCMParser(dcm_file, cache=cache).create_dcm_object()) == expected
+    assert len(cache.entries()) == 1
+    with monkeypatch.context() as m:
+        m.setattr(DCMParser, 'parse_dcm_object', lambda self: pytest.fail('warm hit parsed the file'))
+        assert str(DCMParser(dcm_file, cache=cache).create_dcm_object()) == expected
+    assert DCMParser(dcm_file, array_mode=True, cache=cache).create_dcm_object()
+    assert len(cache.entries()) == 2
+
+    ## a new library version or field layout does not use the old entries
+    parser = DCMParser(dcm_file, cache=cache)
+    key = cache.key(dcm_file, parser.cache_options())
+    for entry_format in [('other', cache_module.layout_hash), (cache_module.__version__, 'other')]:
+        with monkeypatch.context() as m:
+            m.setattr(cache_module, 'entry_format', entry_format)
+            assert cache.key(dcm_file, parser.cache_options()) != key
+            assert cache.load(key, cache_module.content_hash(dcm_file)) is None
+
+    cache.max_bytes = 0
+    cache.evict()
+    assert cache.entries() == []
+
+
+@pytest.mark.parametrize("dcm_file", ["tests/sample1.dcm", "tests/sample2.dcm"])
+@pytest.mark.parametrize("array_mode", [False, True])
+def test_binary_format_round_trip(tmp_path, dcm_file, array_mode):
+    from dcmfile_parser import read_binary
+    text_obj = DCMParser(dcm_file).create_dcm_object()
+    text_obj.write_binary(tmp_path / 'sample.dcmb')
+
+    binary_obj = read_binary(tmp_path / 'sample.dcmb', array_mode=array_mode)
+    assert binary_obj.comments == text_obj.comments
+    assert binary_obj.functions == text_obj.functions
+    assert str(binary_obj) == str(text_obj)
+
+    parsed_obj = DCMParser(dcm_file, array_mode=array_mode).create_dcm_object()
+    for name, (item, _) in binary_obj._param_name_dict.items():
+        expected = parsed_obj._param_name_dict[name][0]
+        for attr in ('wert', 'st_x', 'st_y'):
+            if hasattr(item, attr):
+                assert type(getattr(item, attr)) is type(getattr(expected, attr))
+        if array_mode and len(getattr(item, 'wert', [])) > 1:
+            assert item.wert.shape == expected.wert.shape
+            assert not item.wert.flags.owndata   # a view into the memory mapped file
+
+
+def test_binary_format_rejects_text_files():
+    from dcmfile_parser import read_binary, BinaryFormatError
+    with pytest.raises(BinaryFormatError):
+        read_binary('tests/sample1.dcm')
+
+
+def test_merge_layers(sample_dcm_file):
+    from dcmfile_parser import merge_layers, MergePolicy, MergeConflictError
+    overlay = DCMParser('tests/sample1.dcm').create_dcm_object()
+    overlay.remove_parameter_by_name('matrix')
+    overlay.remove_parameter_by_name('map')
+    overlay._param_name_dict['parameter'][0].wert = [42]
+
+    result = merge_layers([sample_dcm_file, overlay, 'tests/sample2.dcm'])
+    merged = result.dcm_object
+    assert result.provenance['matrix'] == 0
+    assert result.provenance['parameter'] == 1
+    assert result.provenance['One_D'] == 2
+    assert result.source_of('One_D') == 'tests/sample2.dcm'
+    assert merged._param_name_dict['parameter'][0].wert is overlay._param_name_dict['parameter'][0].wert
+    assert merged._param_name_dict['map'][0].wert is sample_dcm_file._param_name_dict['map'][0].wert
+    merged.get_parameter('map').langname = 'changed'
+    assert sample_dcm_file.get_parameter('map').langname != 'changed'
+    assert len(merged._param_name_dict) == 23
+
+    result = merge_layers([sample_dcm_file, overlay], MergePolicy(delete_missing=True, delete_names=['line_curve']))
+    assert sorted(result.deleted_names) == ['line_curve', 'map', 'matrix']
+    assert 'map' not in result.dcm_object._param_name_dict
+    assert result.dcm_object.parameter_block == []
+
+    ## the same label as another parameter type
+    conflict = DCMParser('tests/sample1.dcm').create_dcm_object()
+    item, _ = conflict._param_name_dict['map']
+    conflict.remove_parameter_by_name('map')
+    conflict.characteristic_map_fixed.append(item)
+    conflict._param_name_dict['map'] = (item, 'characteristic_map_fixed')
+    assert merge_layers([sample_dcm_file, conflict], MergePolicy(on_type_conflict='keep')).provenance['map'] == 0
+    with pytest.raises(MergeConflictError):
+        merge_layers([sample_dcm_file, conflict], MergePolicy(on_type_conflict='error'))
+
+
+def test_incremental_reparse(tmp_path):
+    dcm_file = tmp_path / 'sample1.dcm'
+    content = open('tests/sample1.dcm', encoding='ISO-8859-1').read()
+    dcm_file.write_text(content, encoding='ISO-8859-1')
+    dcmfile_parser = DCMParser(dcm_file, incremental=True)
+    first = dcmfile_parser.create_dcm_object()
+
+    content = content.replace('  WERT  30.0', '  WERT  31.0')
+    content = content.replace('FESTWERT parameterText', 'FESTWERT renamedText')
+    dcm_file.write_text(content, encoding='ISO-8859-1')
+    result = dcmfile_parser.reparse()
+
+    assert result.added_names == ['renamedText']
+    assert result.changed_names == ['parameter']
+    assert result.removed_names == ['parameterText']
+    assert result.dcm_object._param_name_dict['parameter'][0].wert == [31]
+    assert result.dcm_object._param_name_dict['map'][0].wert is first._param_name_dict['map'][0].wert
+    assert str(result.dcm_object) == str(DCMParser(dcm_file).create_dcm_object())
+
+    ## changes of a result are not taken over by the next one
+    other = DCMParser(dcm_file).create_dcm_object()
+    other.get_parameter('map', writable=True).wert[4] = 99.0
+    result.dcm_object.update_from(other)
+    result.dcm_object.get_parameter('matrix').langname = 'changed'
+    result.dcm_object.get_parameter('line_curve', writable=True).wert[0] = -1.0
+    unchanged = dcmfile_parser.reparse()
+    assert unchanged.added_names == unchanged.changed_names == unchanged.removed_names == []
+    assert unchanged.dcm_object.get_parameter('map').wert[4] == 1.9
+    assert unchanged.dcm_object.get_parameter('matrix').langname != 'changed'
+    assert unchanged.dcm_object.get_parameter('line_curve').wert[0] == 5
+    assert first.get_parameter('map').wert[4] == 1.9
+
+
+def test_query(sample_dcm_file):
+    dcm_obj = sample_dcm_file
+    assert [item.name for item in dcm_obj.query(name='group_*')] == ['group_line_curve', 'group_map']
+    assert dcm_obj.query_names(name='*map') == ['group_map', 'map', 'static_map']
+    assert dcm_obj.query_names(start='m', end='p') == ['map', 'matrix']
+    assert dcm_obj.query_names(funktion='AdvancedParameterFunction') == ['parameter', 'parameterText']
+    assert dcm_obj.query_names(funktion='"MapFunction"', param_type='KENNFELD') == ['map']
+    assert dcm_obj.query_names(param_type=['FESTKENNFELD', 'GRUPPENKENNFELD']) == ['group_map', 'static_map']
+    assert dcm_obj.query_names(unit='K', name='*line*') == ['fixed_line_curve', 'group_line_curve', 'line_curve']
+
+    ## the indexes follow the changes of the object
+    dcm_obj.remove_parameter_by_name('map')
+    assert dcm_obj.query_names(name='*map') == ['group_map', 'static_map']
+    dcm_obj.add_new_parameters_from(DCMParser('tests/sample1.dcm').create_dcm_object())
+    assert dcm_obj.query_names(funktion='MapFunction') == ['map']
+    other = DCMParser('tests/sample1.dcm').create_dcm_object()
+    other.remove_parameter_by_name('matrix')
+    dcm_obj.update_from(other, delete_list=['parameter'])
+    assert dcm_obj.query_names(start='m', end='q') == ['map', 'parameterText']
+    dcm_obj.set_parameter_attribute('map', 'funktion', '"RevisedMapFunction"')
+    assert dcm_obj.query_names(funktion='RevisedMapFunction') == ['map']
+    assert dcm_obj.query_names(funktion='MapFunction') == []
+    dcm_obj.get_parameter('static_map', writable=True).einheit_w = '"bar"'
+    assert dcm_obj.query_names(unit='bar') == ['static_map']
+    dcm_obj.get_parameter('map', writable=True)
+    assert dcm_obj.query_names(name='*line*') == ['fixed_line_curve', 'group_line_curve', 'line_curve']
+    dcm_obj.mark_dirty('parameterText')
+    assert dcm_obj.query_names(param_type='KENNLINIE') == ['line_curve']
+    dcm_obj.cleanup_parameters()
+    assert dcm_obj.query_names() == []
+
+
+def test_query_lazy_dcm_object(sample_dcm_file):
+    lazy_obj = DCMParser('tests/sample1.dcm', lazy=True).create_dcm_object()
+    assert lazy_obj.query_names(param_type='KENNFELD') == ['map']
+    assert lazy_obj.query_names(name='*map', param_type=['FESTKENNFELD', 'GRUPPENKENNFELD']) == ['group_map', 'static_map']
+    assert not any(item.is_loaded for item, _ in lazy_obj._param_name_dict.values())
+
+    for criteria in [dict(funktion='MapFunction', param_type='KENNFELD'), dict(unit='K', name='*line*')]:
+        assert lazy_obj.query_names(**criteria) == sample_dcm_file.query_names(**criteria)
+    assert lazy_obj.query_names(param_type='KENNFELD') == ['map']
+
+
+def test_param_store():
+    import random
+    from dcmfile_parser.param_store import ParamStore
+    from dcmfile_parser import FESTWERT
+    rng = random.Random(0)
+    store = ParamStore()
+    expected = {}
+    for step in range(5000):
+        name = f'p{rng.randrange(3000)}'
+        if rng.random() < 0.6:
+            item = FESTWERT(name=name, wert=[step])
+            store.add(item)
+            expected[name] = item
+        else:
+            assert (store.pop(name, None) is not None) == (expected.pop(name, None) is not None)
+    assert store.names() == sorted(expected)
+    assert [item.wert for item in store] == [expected[name].wert for name in sorted(expected)]
+    assert store[-1] is expected[max(expected)]
+    assert store.index(store[100]) == 100
+
+    removed = store.remove_names(sorted(expected)[::2] + ['missing'])
+    assert removed == sorted(expected)[::2]
+    assert store.names() == sorted(expected)[1::2]
+    assert store == [expected[name] for name in sorted(expected)[1::2]]
+
+
+def test_dcm_object_keeps_parameters_sorted(sample_dcm_file):
+    from dcmfile_parser.param_store import ParamStore
+    other = DCMParser('tests/sample2.dcm').create_dcm_object()
+    sample_dcm_file.add_new_parameters_from(other)
+    for attr in sample_dcm_file._param_attributes:
+        items = getattr(sample_dcm_file, attr)
+        assert isinstance(items, ParamStore)
+        assert [item.name for item in items] == sorted(item.name for item in items)
+
+    deleted = sample_dcm_file._delete_elements_if_in_list(list(other._param_name_dict) + ['map', 'map'], None)
+    assert deleted == list(other._param_name_dict) + ['map']
+    reference = DCMParser('tests/sample1.dcm').create_dcm_object()
+    reference.remove_parameter_by_name('map')
+    assert str(sample_dcm_file) == str(reference)
+
+
+def test_fork_copies_on_write(sample_dcm_file):
+    baseline = sample_dcm_file
+    variant = baseline.fork()
+    original_map = baseline.get_parameter('map')
+    assert variant.get_parameter('map') is not original_map
+    assert variant.get_parameter('map').wert is original_map.wert
+
+    other = DCMParser('tests/sample1.dcm').create_dcm_object()
+    other._param_name_dict['map'][0].wert[4] = 5.0
+    variant.update_from(other)
+    assert variant.get_parameter('map').wert[4] == 5.0
+    assert baseline.get_parameter('map') is original_map
+    assert original_map.wert[4] == 1.9
+    assert variant.get_parameter('matrix').wert is baseline.get_parameter('matrix').wert
+
+    variant.set_parameter_attribute('matrix', 'langname', 'changed')
+    variant.get_parameter('parameter').langname = 'changed'
+    assert baseline.get_parameter('matrix').langname != 'changed'
+    assert baseline.get_parameter('parameter').langname != 'changed'
+    writable = baseline.get_parameter('line_curve', writable=True)
+    writable.wert[0] = -1.0
+    assert variant.get_parameter('line_curve').wert[0] != -1.0
+    assert str(variant.get_parameter('map')) != str(baseline.get_parameter('map'))
+
+    changed_curve = DCMParser('tests/sample1.dcm').create_dcm_object().get_parameter('fixed_line_curve')
+    changed_curve.wert[0] = -1.0
+    original_curve = baseline.get_parameter('fixed_line_curve')
+    assert variant.update_parameter_and_report_changes('fixed_line_curve', changed_curve) == {'wert': ([50], [-1.0])}
+    assert variant.get_parameter('fixed_line_curve').wert[0] == -1.0
+    assert baseline.get_parameter('fixed_line_curve') is original_curve and original_curve.wert[0] == 50
+    changed_curve.wert[1] = -2.0
+    baseline.get_parameter('fixed_line_curve').update_from_and_report_changes(changed_curve)
+    assert baseline.get_parameter('fixed_line_curve').wert[:2] == [-1.0, -2.0]
+    assert variant.get_parameter('fixed_line_curve').wert[:2] == [-1.0, 95]
+
+    lazy_obj = DCMParser('tests/sample1.dcm', lazy=True).create_dcm_object()
+    lazy_variant = lazy_obj.fork()
+    assert not lazy_variant.get_parameter('map').is_loaded
+    assert lazy_variant.get_parameter('map').wert == original_map.wert
+
+
+def test_add_new_parameters_from_copies(sample_dcm_file):
+    other = DCMParser('tests/sample2.dcm').create_dcm_object()
+    sample_dcm_file.add_new_parameters_from(other, share=False)
+    added = sample_dcm_file.get_parameter('One_D')
+    assert added is not other.get_parameter('One_D')
+    added.langname = 'changed'
+    added.wert[0] = -1.0
+    assert other.get_parameter('One_D').langname != 'changed'
+    assert other.get_parameter('One_D').wert[0] != -1.0
+
+
+def test_add_new_parameters_from_shares(sample_dcm_file):
+    other = DCMParser('tests/sample2.dcm').create_dcm_object()
+    sample_dcm_file.add_new_parameters_from(other)
+    added = sample_dcm_file.get_parameter('One_D')
+    assert added.wert is other.get_parameter('One_D').wert
+    added.langname = 'changed'
+    sample_dcm_file.set_parameter_attribute('One_D', 'funktion', '"changed"')
+    assert other.get_parameter('One_D').langname != 'changed'
+    assert other.get_parameter('One_D').funktion != '"changed"'
+    sample_dcm_file.get_parameter('One_D', writable=True).wert[0] = -1.0
+    assert other.get_parameter('One_D').wert[0] != -1.0
+    assert sample_dcm_file.get_parameter('One_D').wert[0] == -1.0
+
+
+def test_write_preserves_unchanged_blocks(tmp_path):
+    dcm_file = tmp_path / 'sample1.dcm'
+    dcm_file.write_bytes(open('tests/sample1.dcm', 'rb').read())
+    dcm_obj = DCMParser(str(dcm_file), keep_source=True).create_dcm_object()
+    dcm_obj.write(str(tmp_path / 'unchanged.dcm'), preserve_source=True)
+    assert (tmp_path / 'unchanged.dcm').read_bytes() == dcm_file.read_bytes()
+
+    dcm_obj.get_parameter('map', writable=True).wert[4] = 5.0
+    dcm_obj.remove_parameter_by_name('matrix')
+    dcm_obj.add_new_parameters_from(DCMParser('tests/sample2.dcm').create_dcm_object())
+    dcm_obj.write(str(tmp_path / 'changed.dcm'), preserve_source=True)
+    written = DCMParser(str(tmp_path / 'changed.dcm')).create_dcm_object()
+    assert sorted(written._param_name_dict) == sorted(dcm_obj._param_name_dict)
+    assert written.get_parameter('map').wert[4] == 5.0
+    source = dcm_obj._source
+    content = (tmp_path / 'changed.dcm').read_bytes()
+    assert dcm_obj.get_parameter('One_D').render().encode('ISO-8859-1') in content
+    for name, offset, length in source.blocks:
+        if name not in ('map', 'matrix'):
+            assert dcm_file.read_bytes()[offset:offset + length] in content
+
+    dcm_obj.get_parameter('static_map').wert[0] = 9.0   # not marked dirty
+    dcm_obj.write(str(tmp_path / 'rendered.dcm'))
+    assert (tmp_path / 'rendered.dcm').read_bytes() == str(dcm_obj).encode('ISO-8859-1')
+
+    dcm_file.write_text('changed')
+    with pytest.raises(ValueError):
+        dcm_obj.write(str(tmp_path / 'stale.dcm'), preserve_source=True)
+
+
+def test_lazy_write_preserving_over_the_source(tmp_path, sample_dcm_file):
+    dcm_file = tmp_path / 'sample1.dcm'
+    dcm_file.write_bytes(open('tests/sample1.dcm', 'rb').read())
+    lazy_obj = DCMParser(str(dcm_file), lazy=True, keep_source=True).create_dcm_object()
+    stale = DCMParser(str(dcm_file), lazy=True).create_dcm_object()
+    lazy_obj.get_parameter('parameter', writable=True).wert = [31]
+    lazy_obj.write(str(dcm_file), preserve_source=True)
+
+    assert lazy_obj.get_parameter('map').wert == sample_dcm_file.get_parameter('map').wert
+    assert DCMParser(str(dcm_file)).create_dcm_object().get_parameter('parameter').wert == [31]
+    with pytest.raises(ValueError):
+        stale.get_parameter('map').wert
+
+
+def test_parse_stats(tmp_path):
+    from dcmfile_parser import ParseStats
+    operations = []
+    stats = ParseStats(callback=lambda operation, stats: operations.append(operation))
+    dcm_obj = DCMParser('tests/sample1.dcm', stats=stats).create_dcm_object()
+    dcm_obj.write(str(tmp_path / 'out.dcm'))
+    assert operations == ['parse', 'write']
+    assert stats.phases['parse'].objects == len(dcm_obj._param_name_dict)
+    assert stats.phases['construction'].objects == len(dcm_obj._param_name_dict)
+    assert stats.by_type['construction']['FESTWERT'].calls == 2
+    assert stats.phases['render'].calls == len(dcm_obj._param_name_dict)
+    assert stats.phases['write'].bytes == len(str(dcm_obj))
+    assert 'process_wert' in stats.as_dict()['phases']
+    assert DCMParser('tests/sample1.dcm').create_dcm_object().stats is None
+
+
+@pytest.mark.parametrize("array_mode", [False, True])
+def test_evaluate_curves_and_maps(array_mode):
+    import numpy as np
+    dcm_obj = DCMParser('tests/sample1.dcm', array_mode=array_mode).create_dcm_object()
+    curve = dcm_obj.get_parameter('line_curve')
+    assert list(curve.evaluate([0.0, 1.0, 7.5, 100.0])) == [5.0, 45.0, 345.0, 345.0]
+
+    static_map = dcm_obj.get_parameter('static_map')
+    assert static_map.evaluate(1.5, 0.5) == 0.5
+    assert np.allclose(static_map.evaluate([2.0, 100.0], [1.0, -1.0]), [1.35, 2.3])
+    points = np.random.default_rng(0).uniform(0, 8, (3, 20000))
+    values = static_map.evaluate(points, 1.0)
+    assert values.shape == points.shape and values.min() >= 0.5 and values.max() <= 4.5
+
+    group_curve = dcm_obj.get_parameter('group_line_curve')
+    assert group_curve.evaluate(2.0) == -72.5
+    assert group_curve.evaluate(2.0, axis_x=dcm_obj.get_parameter('distribution')) == -72.5
+
+    writable = dcm_obj.get_parameter('line_curve', writable=True)
+    writable.wert[0] = 85.0
+    assert curve.evaluate(0.0) == 85.0
+    with pytest.raises(ValueError):
+        dcm_obj.get_parameter('map').evaluate(1.0, 1.0, axis_x=[1.0, 2.0])
+
+
+def test_evaluate_cache_is_not_a_field(sample_dcm_file):
+    import json
+    from dataclasses import asdict
+    curve = sample_dcm_file.get_parameter('fixed_line_curve')
+    curve.evaluate(1.0)
+    assert '_grid' not in asdict(curve)
+    json.dumps(asdict(curve))
+    assert curve == DCMParser('tests/sample1.dcm').create_dcm_object().get_parameter('fixed_line_curve')
+
+    lazy_obj = DCMParser('tests/sample1.dcm', lazy=True).create_dcm_object()
+    curve = lazy_obj.get_parameter('line_curve')
+    assert curve.evaluate(0.0) == 5.0
+    curve.wert[0] = 85.0
+    lazy_obj.mark_dirty('line_curve')
+    assert curve.evaluate(0.0) == 85.0
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_diff_matrix(tmp_path, workers):
+    from dcmfile_parser import diff_matrix
+    baseline = DCMParser('tests/sample1.dcm').create_dcm_object()
+    variant = baseline.fork()
+    variant.set_parameter_attribute('map', 'wert', [0.5, 0.9, 0.7, 1.5, 1.9, 2.3, 1.5, 2.5, 3.5, 2.5, 3.5, 9.5])
+    variant.set_parameter_attribute('line_curve', 'wert', [5.0, 85.0, 125.0, 185.0, 225.0, 265.0, 305.0])
+    variant.set_parameter_attribute('matrix', 'wert', [1.0, 0.0, 0.5, 2.0005])
+    variant.remove_parameter_by_name('parameter')
+    variant.write(str(tmp_path / 'variant.dcm'))
+
+    matrix = diff_matrix('tests/sample1.dcm', [str(tmp_path / 'variant.dcm'), 'tests/sample1.dcm',
+                                               str(tmp_path / 'missing.dcm')], workers=workers)
+    assert matrix.status.shape == (len(baseline._param_name_dict), 3)
+    assert sorted(matrix.changed_labels(0)) == ['line_curve', 'map', 'parameter']
+    assert matrix.changed_labels(1) == []
+    assert isinstance(matrix.errors[2], FileNotFoundError)
+
+    change_set = baseline.diff_report(DCMParser(str(tmp_path / 'variant.dcm')).create_dcm_object())
+    assert sorted(change_set.updated_names + change_set.missing_names) == sorted(matrix.changed_labels(0))
+    stats = {label_stats.name: label_stats for label_stats in matrix.label_stats()}
+    assert stats['map'].changed == 1 and stats['map'].max_deviation == pytest.approx(5.0)
+    assert stats['line_curve'].structural == 1
+    assert stats['parameter'].missing == 2
+    assert stats['matrix'].changed == 0
+
+
+@pytest.mark.parametrize("compression", ["gzip", "lzma", "bz2"])
+def test_compressed_input(tmp_path, compression):
+    import importlib, io
+    module = importlib.import_module(compression)
+    content = open('tests/sample1.dcm', 'rb').read()
+    compressed = tmp_path / 'sample1.dcm.compressed'
+    compressed.write_bytes(module.compress(content))
+    expected = str(DCMParser('tests/sample1.dcm').create_dcm_object())
+
+    assert str(DCMParser(str(compressed)).create_dcm_object()) == expected
+    assert len(list(DCMParser(str(compressed)).iter_parameters())) == 19
+    stream = io.BytesIO(module.compress(content))
+    assert str(DCMParser(stream).create_dcm_object()) == expected
+    assert not stream.closed
+    with pytest.raises(ValueError):
+        DCMParser(str(compressed), use_mmap=True)
+
+
+def test_uncompressed_stream():
+    with open('tests/sample1.dcm', 'rb') as f:
+        dcm_obj = DCMParser(f).create_dcm_object()
+    assert dcm_obj.filePath == 'tests/sample1.dcm'
+    assert str(dcm_obj) == str(DCMParser('tests/sample1.dcm').create_dcm_object())
+
+
+def test_command_line(tmp_path, capsys):
+    import json
+    from dcmfile_parser.cli import main
+    manifest = tmp_path / 'manifest.txt'
+    manifest.write_text('# layers\n' + os.path.abspath('tests/sample2.dcm') + '\n')
+
+    assert main(['validate', 'tests/sample*.dcm', '--jobs', '1']) == 0
+    summary = json.loads(capsys.readouterr().out)
+    assert [record['path'] for record in summary['files']] == ['tests/sample1.dcm', 'tests/sample2.dcm']
+    assert all(record['ok'] and record['elapsed'] >= 0 for record in summary['files'])
+    assert main(['validate', str(tmp_path / 'missing.dcm'), '-j', '1']) == 1
+    capsys.readouterr()
+
+    assert main(['diff', 'tests/sample1.dcm', 'tests/sample1.dcm', '--manifest', str(manifest), '-j', '1',
+                 '--labels', '--summary', str(tmp_path / 'diff.json')]) == 0
+    files = json.loads((tmp_path / 'diff.json').read_text())['files']
+    assert files[0]['changed'] == files[0]['missing'] == 0
+    assert files[1]['missing'] == 10 and len(files[1]['labels']['added']) == 13
+
+    merged = tmp_path / 'merged.dcm'
+    assert main(['merge', 'tests/sample1.dcm', 'tests/sample2.dcm', '-o', str(merged), '-j', '1']) == 0
+    summary = json.loads(capsys.readouterr().out)
+    assert [record['labels_taken'] for record in summary['files']] == [10, 13]
+    assert len(DCMParser(str(merged)).create_dcm_object()._param_name_dict) == 23
+
+    broken = tmp_path / 'broken.dcm'
+    broken.write_text('FESTWERT parameter\n  WERT 1\nEND\n')
+    assert main(['diff', str(broken), 'tests/sample1.dcm', '-j', '1']) == 1
+    summary = json.loads(capsys.readouterr().out)
+    assert summary['error'].startswith('ValueError') and summary['files'] == []
+    assert main(['merge', 'tests/sample1.dcm', str(broken), '-o', str(tmp_path / 'broken_merge.dcm'), '-j', '1']) == 1
+    summary = json.loads(capsys.readouterr().out)
+    assert [record['ok'] for record in summary['files']] == [True, False]
+    assert not (tmp_path / 'broken_merge.dcm').exists()
+
+    out = tmp_path / 'out'
+    assert main(['normalise', 'tests/sample1.dcm', '--output-dir', str(out), '-j', '1']) == 0
+    normalised = DCMParser(str(out / 'sample1.dcm')).create_dcm_object()
+    original = DCMParser('tests/sample1.dcm').create_dcm_object()
+    assert sorted(normalised._param_name_dict) == sorted(original._param_name_dict)
+    assert normalised.get_parameter('parameter').wert == original.get_parameter('parameter').wert